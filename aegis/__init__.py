@@ -0,0 +1,14 @@
+from aegis.engine import compute_underwriting, calc_age, calc_bmi, fmt_inr, fmt_pts
+from aegis.memo import compute_underwriting_cached
+
+# numpy and the Gemini SDK are only imported when these are first used
+_LAZY = {
+    "compute_underwriting_batch": "aegis.batch", "batch_row": "aegis.batch", "proposals_to_columns": "aegis.batch",
+    "extract_from_pdf": "aegis.extract",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError(f"module 'aegis' has no attribute {name!r}")
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import urllib.request
+from pathlib import Path
+from typing import NamedTuple
+
+# ─── STATIC ASSETS ──────────────────────────────────────────────
+# CSS and fonts are served by Streamlit's static file route (server.enableStaticServing
+# in .streamlit/config.toml), so the page never depends on an external host.
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+STATIC_URL = "app/static"
+
+# Variable-weight WOFF2 files (SIL OFL) from the @fontsource-variable npm packages.
+# fonts.lock.json pins each file to an exact package version and its sha256;
+# `python -m aegis fonts` downloads exactly those and rejects any other bytes.
+# Only the files present are declared as @font-face rules, so until they are
+# fetched and deployed the page uses the system font stack without 404s.
+class Font(NamedTuple):
+    family: str
+    weight: str         # variable weight range
+    package: str        # @fontsource-variable/<package>
+
+FONTS = {
+    "syne.woff2": Font("Syne", "400 800", "syne"),
+    "epilogue.woff2": Font("Epilogue", "100 900", "epilogue"),
+    "jetbrains-mono.woff2": Font("JetBrains Mono", "100 800", "jetbrains-mono"),
+}
+FONT_DIR = STATIC_DIR / "fonts"
+FONT_LOCK = "fonts.lock.json"
+
+def font_url(f: Font, version: str) -> str:
+    return f"https://cdn.jsdelivr.net/npm/@fontsource-variable/{f.package}@{version}/files/{f.package}-latin-wght-normal.woff2"
+
+def asset_version(name: str) -> str:
+    return hashlib.sha256((STATIC_DIR / name).read_bytes()).hexdigest()[:12]
+
+def asset_url(name: str) -> str:
+    # Content hash in the query string: browsers may cache the file for the whole
+    # session, and an edited file gets a new URL
+    return f"{STATIC_URL}/{name}?v={asset_version(name)}"
+
+def font_faces_css() -> str:
+    # @font-face rules for the font files that are present
+    return "".join(f'@font-face {{ font-family: "{f.family}"; font-weight: {f.weight}; font-display: swap; '
+                   f'src: url("{asset_url(f"fonts/{name}")}") format("woff2"); }}\n'
+                   for name, f in FONTS.items() if (FONT_DIR / name).exists())
+
+def _latest(f: Font) -> str:
+    url = f"https://data.jsdelivr.com/v1/packages/npm/@fontsource-variable/{f.package}/resolved"
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return json.load(resp)["version"]
+
+def _sha256(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+def fetch_fonts(dest: Path = FONT_DIR, force: bool = False, update: bool = False, log=print) -> list:
+    # One-off step on a connected machine; the files and fonts.lock.json are then deployed with static/.
+    # update resolves the newest package versions and rewrites the lock.
+    dest.mkdir(parents=True, exist_ok=True)
+    lock_path = dest / FONT_LOCK
+    lock = json.loads(lock_path.read_text()) if lock_path.exists() else {}
+    fetched = []
+    for name, f in FONTS.items():
+        pinned = None if update else lock.get(name)
+        if pinned is None and not update:
+            raise ValueError(f"{name} is not in {lock_path}; run with --update to pin the current version")
+        path = dest / name
+        if path.exists() and not force and not update:
+            if _sha256(path.read_bytes()) != pinned["sha256"]:
+                raise ValueError(f"{path} does not match the sha256 in {FONT_LOCK}; re-fetch with --force")
+            continue
+        version = pinned["version"] if pinned else _latest(f)
+        url = font_url(f, version)
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            body = resp.read()
+        if body[:4] != b"wOF2":
+            raise ValueError(f"{url} did not return a WOFF2 font")
+        if pinned and _sha256(body) != pinned["sha256"]:
+            raise ValueError(f"{url} does not match the sha256 in {FONT_LOCK}")
+        path.write_bytes(body)
+        lock[name] = {"version": version, "sha256": _sha256(body)}
+        fetched.append(name)
+        log(f"{name}: @fontsource-variable/{f.package}@{version}, {len(body) / 1024:.0f} KB")
+    if update:
+        lock_path.write_text(json.dumps(lock, indent=2) + "\n")
+    return fetched
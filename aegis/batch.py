@@ -0,0 +1,235 @@
+import numpy as np
+from datetime import date
+from typing import Optional
+
+from aegis import engine
+from aegis.rating import BandIndex
+from aegis.tables import RatingTables
+
+# ─── BATCH ENGINE ───────────────────────────────────────────────
+# Columnar counterpart of compute_underwriting for re-rating whole books.
+# Input is any mapping of column -> array (dict of arrays or a DataFrame):
+#   age | dob, bmi | height_cm + weight_kg, parent_health_status,
+#   sev_<condition> (0-4), hab_<habit> (none|occasionally|moderate|high),
+#   occ_<occupation> (bool), base_cover, cir_cover, accident_cover, yearly_income
+# Missing columns take the same defaults as the scalar engine. Each call rates
+# with one table set (engine.TABLES when it starts, or `tables`), recorded in
+# the result under "tables". Flags are engine.FLAG_RULES evaluated on the
+# columns: f_<rule> masks, with the facts they were evaluated on kept in the
+# result so batch_row can render them.
+
+def proposals_to_columns(proposals: list) -> dict:
+    cols = {k: [] for k in ["dob", "height_cm", "weight_kg", "parent_health_status",
+                            "base_cover", "cir_cover", "accident_cover", "yearly_income"]}
+    cols.update({f"sev_{c}": [] for c in engine.H_E})
+    cols.update({f"hab_{h}": [] for h in engine.HAB_E})
+    cols.update({f"occ_{o}": [] for o in engine.OCC_E})
+    for d in proposals:
+        dob = d["dob"]
+        cols["dob"].append(dob if isinstance(dob, str) else dob.strftime("%Y-%m-%d"))
+        for k in ["height_cm", "weight_kg", "base_cover", "cir_cover", "accident_cover", "yearly_income"]:
+            cols[k].append(d.get(k, 0))
+        cols["parent_health_status"].append(d.get("parent_health_status", ""))
+        conds = d.get("health_conditions") or {}
+        habs = d.get("habits") or {}
+        occs = d.get("risky_occupations") or []
+        for c in engine.H_E:
+            cols[f"sev_{c}"].append(int(conds.get(c, 0)))
+        for h in engine.HAB_E:
+            cols[f"hab_{h}"].append(habs.get(h) or "none")
+        for o in engine.OCC_E:
+            cols[f"occ_{o}"].append(o in occs)
+    return {k: np.asarray(v) for k, v in cols.items()}
+
+def _col(cols, key, n, default):
+    return np.asarray(cols[key]) if key in cols else np.full(n, default)
+
+def _band_index(x, bi: BandIndex):
+    # Vectorized BandIndex.index: band i covers [lo[i], hi[i]], -1 between bands or outside the table
+    idx = np.searchsorted(np.asarray(bi.his, dtype=np.float64), x, side="left").astype(np.int64)
+    idx[x > bi.hi] = 0
+    idx[(x < np.asarray(bi.los, dtype=np.float64)[idx]) | (x > bi.hi)] = -1
+    return idx
+
+def _pick(values, idx, default, dtype=None):
+    # values[idx] with idx == -1 mapping to default
+    return np.asarray(list(values) + [default], dtype=dtype)[idx]
+
+def _ages_from_dob(dob, as_of: date):
+    d = np.asarray(dob, dtype="datetime64[D]")
+    y = d.astype("datetime64[Y]").astype(np.int64) + 1970
+    m = d.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    dd = (d - d.astype("datetime64[M]")).astype(np.int64) + 1
+    before = (m > as_of.month) | ((m == as_of.month) & (dd > as_of.day))
+    return as_of.year - y - before
+
+def _round1(x):
+    # np.round is only off from round(x, 1) on near-ties; settle those with Python's rounding
+    r = np.round(x, 1)
+    t = x * 10
+    tie = np.abs(t - np.floor(t) - 0.5) < 1e-6
+    if tie.any():
+        r[tie] = [round(float(v), 1) for v in x[tie]]
+    return r
+
+def compute_underwriting_batch(cols, as_of: Optional[date] = None, tables: Optional[RatingTables] = None) -> dict:
+    t = tables or engine.TABLES
+    BMI_T, FAM_E, H_E, CO_M, HAB_E, HAB_C = t.BMI_T, t.FAM_E, t.H_E, t.CO_M, t.HAB_E, t.HAB_C
+    OCC_E, L_RAT, C_RAT, P_RAT, FIN_T = t.OCC_E, t.L_RAT, t.C_RAT, t.P_RAT, t.FIN_T
+    n = len(cols[next(iter(cols))])
+    if "age" in cols:
+        A = np.asarray(cols["age"], dtype=np.int64)
+    else:
+        A = _ages_from_dob(cols["dob"], as_of or date.today())
+    if "bmi" in cols:
+        B = np.asarray(cols["bmi"], dtype=np.float64)
+    else:
+        h = np.asarray(cols["height_cm"], dtype=np.float64)
+        B = _round1(np.asarray(cols["weight_kg"], dtype=np.float64) / ((h / 100) ** 2))
+
+    e_bmi = _pick([b[2] for b in BMI_T], _band_index(B, t.BMI_IDX), 20, np.float64)
+    fam = _col(cols, "parent_health_status", n, "")
+    e_fam = np.zeros(n)
+    for k, v in FAM_E.items():
+        e_fam[fam == k] = v
+
+    # Health conditions
+    h_brk = {}
+    sev = {}
+    n_conds = np.zeros(n, dtype=np.int64)
+    for c, pts in H_E.items():
+        s = _col(cols, f"sev_{c}", n, 0).astype(np.int64)
+        if (s > len(pts)).any():
+            raise ValueError(f"sev_{c} has severities above {len(pts)}")
+        active = s > 0
+        h_brk[c] = np.where(active, np.asarray([0.0] + pts)[np.clip(s, 0, None)], 0.0)
+        sev[c] = s
+        n_conds += active
+    co_m = np.where(n_conds >= 2, _pick([CO_M[2], CO_M[3]], np.minimum(n_conds, 3) - 2, 0, np.float64), 0.0)
+    e_health = np.zeros(n)
+    for c in H_E:
+        e_health = e_health + h_brk[c]
+    e_health = e_health + co_m
+
+    # Habits
+    hab_brk = {}
+    n_habs = np.zeros(n, dtype=np.int64)
+    for hb, levels in HAB_E.items():
+        f = _col(cols, f"hab_{hb}", n, "none")
+        pts = np.zeros(n)
+        for lvl, p in levels.items():
+            pts[f == lvl] = p
+        hab_brk[hb] = pts
+        n_habs += pts > 0
+    hab_c = np.where(n_habs >= 2, _pick([HAB_C[2], HAB_C[3]], np.minimum(n_habs, 3) - 2, 0, np.float64), 0.0)
+    e_hab = np.zeros(n)
+    for hb in HAB_E:
+        e_hab = e_hab + hab_brk[hb]
+    e_hab = e_hab + hab_c
+
+    EMR = e_bmi + e_fam + e_health + e_hab
+    li = _band_index(EMR, t.L_IDX)
+    ci = _band_index(EMR, t.C_IDX)
+    l_fac = _pick([b[3] for b in L_RAT], li, 0, np.float64)
+    c_fac = _pick([b[3] for b in C_RAT], ci, 0, np.float64)
+
+    # Verdict
+    declined = (A < 18) | (A > 65) | (EMR > 550)
+    dcl = np.where(declined, "decline", np.where(EMR < 20, "standard", "loading")).astype(object)
+
+    base = _col(cols, "base_cover", n, 0).astype(np.float64)
+    cir = _col(cols, "cir_cover", n, 0).astype(np.float64)
+    acc = _col(cols, "accident_cover", n, 0).astype(np.float64)
+    income = _col(cols, "yearly_income", n, 0).astype(np.float64)
+    occ = {o: _col(cols, f"occ_{o}", n, False).astype(bool) for o in OCC_E}
+    n_occs = np.zeros(n, dtype=np.int64)
+    occ_pm = np.zeros(n)
+    for o, extra in OCC_E.items():
+        n_occs += occ[o]
+        occ_pm = occ_pm + np.where(occ[o], extra, 0)
+
+    # Flags
+    fin_mult = _pick([b[2] for b in FIN_T], _band_index(A, t.FIN_IDX), 10, np.float64)
+    fin_limit = income * fin_mult
+    facts = {"A": A, "B": B, "EMR": EMR, "n_active_conds": n_conds, **{f"sev_{c}": sev[c] for c in H_E},
+             "cir_cover": cir, "base_cover": base, "yearly_income": income, "fin_mult": fin_mult,
+             "fin_limit": fin_limit, "n_occs": n_occs}
+    flags = engine.FLAG_RULES.evaluate(**facts)
+    n_flags = sum(m.astype(np.int64) for m in flags.values())
+
+    # Premiums
+    pi = _band_index(A, t.P_IDX)
+    priced = (pi >= 0) & (A >= 18) & (A <= 65)       # as priced_card: rated ages only
+    lr = _pick([b[2] for b in P_RAT], pi, 0, np.float64)
+    ar = _pick([b[3] for b in P_RAT], pi, 0, np.float64)
+    cr = _pick([b[4] or 0 for b in P_RAT], pi, 0, np.float64)
+
+    lb = np.where(priced, (lr * base) / 1000, 0.0)
+    ll = np.where(priced, 0.25 * l_fac * lb, 0.0)
+    lo = np.where(priced, (occ_pm * base) / 1000, 0.0)
+    l_T = lb + ll + lo
+    ab = np.where(priced, (ar * acc) / 1000, 0.0)
+    ao = np.where(priced, (occ_pm * acc) / 1000, 0.0)
+    a_T = ab + ao
+    c_declined = priced & ((A > 60) | (EMR > 100) | (cr == 0))
+    c_ok = priced & ~c_declined
+    cb = np.where(c_ok, (cr * cir) / 1000, 0.0)
+    cl = np.where(c_ok, 0.30 * c_fac * cb, 0.0)
+    c_T = cb + cl
+
+    return {
+        "A": A, "B": B, "EMR": EMR,
+        "life_cls": _pick([b[2] for b in L_RAT], li, None, object), "life_fac": l_fac,
+        "cir_cls": _pick([b[2] for b in C_RAT], ci, None, object), "cir_fac": c_fac,
+        "life_idx": li, "cir_idx": ci, "dcl": dcl,
+        "e_bmi": e_bmi, "e_fam": e_fam, "co_m": co_m, "e_health": e_health,
+        "hab_c": hab_c, "e_hab": e_hab, "n_active_conds": n_conds,
+        **{f"h_{c}": h_brk[c] for c in H_E}, **{f"hab_{hb}": hab_brk[hb] for hb in HAB_E},
+        "base_cover": base, "cir_cover": cir, "accident_cover": acc, "yearly_income": income,
+        "fin_mult": fin_mult, "fin_limit": fin_limit, **{f"sev_{c}": sev[c] for c in H_E}, "n_occs": n_occs,
+        "priced": priced, "l_rate": lr, "a_rate": ar, "c_rate": cr,
+        "l_base": lb, "l_load": ll, "l_occ": lo, "l_total": l_T,
+        "a_base": ab, "a_occ": ao, "a_total": a_T,
+        "c_declined": c_declined, "c_base": cb, "c_load": cl, "c_total": c_T,
+        "grand": l_T + a_T + c_T,
+        **{f"f_{k}": v for k, v in flags.items()}, "n_flags": n_flags, "tables": t,
+    }
+
+def batch_row(res: dict, i: int) -> dict:
+    # Rebuild the compute_underwriting dict for row i of a batch result
+    t = res["tables"]
+    L_RAT, C_RAT, H_E, HAB_E = t.L_RAT, t.C_RAT, t.H_E, t.HAB_E
+    A, B, EMR = int(res["A"][i]), float(res["B"][i]), float(res["EMR"][i])
+    li, ci = int(res["life_idx"][i]), int(res["cir_idx"][i])
+    LR = {"cls": L_RAT[li][2], "fac": L_RAT[li][3]} if li >= 0 else None
+    CR = {"cls": C_RAT[ci][2], "fac": C_RAT[ci][3]} if ci >= 0 else None
+    n_conds = int(res["n_active_conds"][i])
+    flags = engine.FLAG_RULES.row(res, i)
+    dcl = res["dcl"][i]
+    verdict = {"decline": "Policy Declined", "standard": "Standard Acceptance", "loading": "Acceptance with Loading"}[dcl]
+
+    l_B = a_B = c_B = {}
+    if res["priced"][i]:
+        l_B = {"base": float(res["l_base"][i]), "fac": LR["fac"] if LR else 0, "load": float(res["l_load"][i]),
+               "occ": float(res["l_occ"][i]), "total": float(res["l_total"][i]),
+               "cls": LR["cls"] if LR else None, "rate": float(res["l_rate"][i])}
+        a_B = {"base": float(res["a_base"][i]), "occ": float(res["a_occ"][i]),
+               "total": float(res["a_total"][i]), "rate": float(res["a_rate"][i])}
+        if res["c_declined"][i]:
+            c_B = {"declined": True, "reason": "CIR not available above age 60" if A > 60 else f"EMR {EMR:.1f} exceeds CIR max of 100"}
+        else:
+            c_B = {"base": float(res["c_base"][i]), "fac": CR["fac"] if CR else 0, "load": float(res["c_load"][i]),
+                   "total": float(res["c_total"][i]), "cls": CR["cls"] if CR else None, "rate": float(res["c_rate"][i])}
+
+    return {
+        "A": A, "B": B, "EMR": EMR, "LR": LR, "CR": CR,
+        "verdict": verdict, "dcl": dcl, "flags": flags,
+        "e_bmi": float(res["e_bmi"][i]), "e_fam": float(res["e_fam"][i]),
+        "h_brk": {c: float(res[f"h_{c}"][i]) for c in H_E}, "co_m": float(res["co_m"][i]),
+        "e_health": float(res["e_health"][i]),
+        "hab_brk": {hb: float(res[f"hab_{hb}"][i]) for hb in HAB_E},
+        "hab_c": float(res["hab_c"][i]), "e_hab": float(res["e_hab"][i]),
+        "l_B": l_B, "a_B": a_B, "c_B": c_B,
+        "grand": float(res["grand"][i]),
+        "n_active_conds": n_conds
+    }
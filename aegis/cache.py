@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# ─── EXTRACTION CACHE ───────────────────────────────────────────
+# Content-addressed store for extract_from_pdf results, keyed on
+# SHA-256(pdf bytes + prompt + model). Backed by one SQLite file so it is
+# safe to share between Streamlit sessions and CLI worker processes. A second
+# table holds the fields read from each page, keyed on the page's own hash
+# (aegis/pages.py), so revised PDFs can re-read only their changed pages.
+DEFAULT_DIR = os.environ.get("AEGIS_CACHE_DIR", ".aegis_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 30 * 24 * 3600
+
+def cache_key(pdf, prompt: str, model: str) -> str:
+    # pdf: the PDF bytes, or a SpooledPDF whose SHA-256 was taken while spooling
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        h = hashlib.sha256(pdf)
+    else:
+        h = pdf.sha256.copy()
+    for part in (prompt, model):
+        h.update(b"\0")
+        h.update(part.encode())
+    return h.hexdigest()
+
+class ExtractionCache:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.path = Path(directory) / "extract.sqlite"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = self.misses = self.expired = self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages(accessed)")
+            self._db = db
+        return self._db
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.expired += 1
+                self.misses += 1
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        blob = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+            self._evict(db)
+
+    def get_pages(self, keys: list) -> dict:
+        # page key -> fields read from that page, for the keys that are cached and fresh
+        now = time.time()
+        found = {}
+        with self._lock:
+            db = self._conn()
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = db.execute(f"SELECT key, value, created FROM pages WHERE key IN ({', '.join('?' * len(part))})",
+                                  part).fetchall()
+                for key, value, created in rows:
+                    if not self.ttl or now - created <= self.ttl:
+                        found[key] = value
+            if found:
+                db.executemany("UPDATE pages SET accessed = ? WHERE key = ?", [(now, k) for k in found])
+        return {k: json.loads(v) for k, v in found.items()}
+
+    def put_pages(self, pages: dict):
+        now = time.time()
+        rows = [(k, blob, len(blob), now, now) for k, blob in ((k, json.dumps(v)) for k, v in pages.items())]
+        with self._lock:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection):
+        # Drop least recently used documents and pages until the store is back under max_bytes
+        total = db.execute("SELECT (SELECT COALESCE(SUM(size), 0) FROM entries) + "
+                           "(SELECT COALESCE(SUM(size), 0) FROM pages)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = db.execute("SELECT 'entries', key, size, accessed FROM entries UNION ALL "
+                          "SELECT 'pages', key, size, accessed FROM pages ORDER BY accessed").fetchall()
+        for table, key, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            db.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn().execute("DELETE FROM entries")
+            self._conn().execute("DELETE FROM pages")
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            pages, page_size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "evictions": self.evictions, "entries": n, "pages": pages, "bytes": size + page_size}
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from aegis.cache import DEFAULT_DIR, ExtractionCache
+from aegis.engine import compute_underwriting
+from aegis.extract import get_client
+from aegis.pipeline import ExtractionPipeline, PipelineConfig
+from aegis.spool import SpooledPDF
+
+# ─── INPUTS ─────────────────────────────────────────────────────
+# A source is either a directory (every *.pdf / *.json in it, recursively)
+# or a manifest: a text file listing one proposal path per line.
+INPUT_EXT = {".pdf", ".json"}
+
+def collect_inputs(source: Path) -> list:
+    if source.is_dir():
+        files = [p for p in source.rglob("*") if p.suffix.lower() in INPUT_EXT]
+    else:
+        files = []
+        for line in source.read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                p = Path(line)
+                files.append(p if p.is_absolute() else source.parent / p)
+    return sorted(str(p.resolve()) for p in files)
+
+# ─── WORKER ─────────────────────────────────────────────────────
+def underwrite_data(path: str, data: dict) -> dict:
+    rec = {"file": path}
+    try:
+        rec.update(status="ok", data=data, result=compute_underwriting(data))
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    return rec
+
+def underwrite_file(path: str) -> dict:
+    # Pre-extracted JSON proposals; PDFs go through the async extraction pipeline
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception as e:
+        return {"file": path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+    return underwrite_data(path, data)
+
+def _open_pdf(path: str):
+    # Hashed in chunks and parsed from disk; the bytes are only read if sent inline
+    return lambda: SpooledPDF.from_path(path)
+
+# ─── OUTPUT ─────────────────────────────────────────────────────
+CSV_COLS = ["file", "status", "error", "name", "dob", "age", "bmi", "emr", "life_class", "cir_class",
+            "verdict", "life_premium", "accident_premium", "cir_premium", "grand_total", "flags"]
+
+def csv_row(rec: dict) -> dict:
+    row = {"file": rec["file"], "status": rec["status"], "error": rec.get("error", "")}
+    r = rec.get("result")
+    if r:
+        d = rec["data"]
+        row.update(
+            name=d.get("name", ""), dob=d.get("dob", ""), age=r["A"], bmi=r["B"], emr=r["EMR"],
+            life_class=r["LR"]["cls"] if r["LR"] else "", cir_class="declined" if r["c_B"].get("declined") else (r["CR"]["cls"] if r["CR"] else ""),
+            verdict=r["verdict"], life_premium=r["l_B"].get("total", 0), accident_premium=r["a_B"].get("total", 0),
+            cir_premium=r["c_B"].get("total", 0), grand_total=r["grand"],
+            flags=" | ".join(f"{f['s']}: {f['m']}" for f in r["flags"]),
+        )
+    return row
+
+class ResultWriter:
+    # Appends one record per finished file and flushes, so a crash loses at most the in-flight files
+    def __init__(self, path: Path, fmt: str):
+        self.fmt = fmt
+        fresh = not path.exists() or path.stat().st_size == 0
+        self.f = open(path, "a", newline="")
+        if fmt == "csv":
+            self.w = csv.DictWriter(self.f, fieldnames=CSV_COLS)
+            if fresh:
+                self.w.writeheader()
+
+    def write(self, rec: dict):
+        if self.fmt == "csv":
+            self.w.writerow(csv_row(rec))
+        else:
+            self.f.write(json.dumps(rec, default=str) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def finished_files(path: Path, fmt: str) -> set:
+    # Files already underwritten successfully in a previous (possibly interrupted) run
+    if not path.exists():
+        return set()
+    done = set()
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                if row.get("status") == "ok":
+                    done.add(row["file"])
+        else:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                if rec.get("status") == "ok":
+                    done.add(rec["file"])
+    return done
+
+# ─── BATCH RUN ──────────────────────────────────────────────────
+class Progress:
+    def __init__(self, total: int, log):
+        self.total, self.log = total, log
+        self.n = 0
+        self.t0 = time.perf_counter()
+        self.stats = {"ok": 0, "error": 0}
+
+    def record(self, writer: ResultWriter, rec: dict):
+        writer.write(rec)
+        self.n += 1
+        self.stats[rec["status"]] += 1
+        if rec["status"] == "error":
+            print(f"  ✗ {rec['file']}: {rec['error']}", file=self.log)
+        if self.n % 100 == 0 or self.n == self.total:
+            print(f"  {self.n}/{self.total} done · {self.n / (time.perf_counter() - self.t0):.1f} proposals/s", file=self.log)
+
+async def _extract_pdfs(pdfs: list, writer: ResultWriter, progress: Progress, pipeline: ExtractionPipeline):
+    async for path, data, err in pipeline.run((p, _open_pdf(p)) for p in pdfs):
+        if err is not None:
+            rec = {"file": path, "status": "error", "error": f"{type(err).__name__}: {err}"}
+        else:
+            rec = underwrite_data(path, data)
+        progress.record(writer, rec)
+
+def run_batch(source: Path, out: Path, fmt: str, workers: int, api_key: str, cache_dir: str = None,
+              cfg: PipelineConfig = None, client=None, log=sys.stderr, triage: bool = True,
+              templates: bool = True) -> dict:
+    files = collect_inputs(source)
+    done = finished_files(out, fmt)
+    todo = [p for p in files if p not in done]
+    jsons = [p for p in todo if p.lower().endswith(".json")]
+    pdfs = [p for p in todo if not p.lower().endswith(".json")]
+    print(f"{len(files)} proposals, {len(files) - len(todo)} already done, "
+          f"{len(jsons)} JSON on {workers} workers, {len(pdfs)} PDF to extract", file=log)
+
+    progress = Progress(len(todo), log)
+    writer = ResultWriter(out, fmt)
+    pipeline = None
+    try:
+        if jsons:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futs = [pool.submit(underwrite_file, p) for p in jsons]
+                for fut in as_completed(futs):
+                    progress.record(writer, fut.result())
+        if pdfs:
+            cache = ExtractionCache(cache_dir) if cache_dir else None
+            pipeline = ExtractionPipeline(client or get_client(api_key), cfg, cache, triage, templates)
+            asyncio.run(_extract_pdfs(pdfs, writer, progress, pipeline))
+    finally:
+        writer.close()
+
+    stats = dict(progress.stats, skipped=len(files) - len(todo))
+    stats["seconds"] = time.perf_counter() - progress.t0
+    stats["per_sec"] = progress.n / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"ok={stats['ok']} error={stats['error']} skipped={stats['skipped']} "
+          f"in {stats['seconds']:.1f}s ({stats['per_sec']:.1f} proposals/s)", file=log)
+    if pipeline is not None:
+        stats.update(pipeline.stats())
+        cs = pipeline.cache.stats() if pipeline.cache else {"hits": 0, "misses": 0}
+        print(f"model calls={stats['calls']} retries={stats['retries']} failures={stats['failures']} "
+              f"follow-ups={stats['follow_ups']} "
+              f"· {stats['local']} read from form templates "
+              f"· cache {cs['hits']} hits / {cs['misses']} misses", file=log)
+        if stats["bytes_in"]:
+            print(f"uploaded {stats['bytes_out'] / 2**20:.1f} MB of {stats['bytes_in'] / 2**20:.1f} MB "
+                  f"after page triage", file=log)
+    return stats
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m aegis", description="Aegis AI headless underwriting")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("batch", help="underwrite a directory or manifest of proposal PDFs / JSON files")
+    b.add_argument("source", type=Path, help="directory of *.pdf / *.json, or a manifest listing one path per line")
+    b.add_argument("-o", "--out", type=Path, required=True, help="results file (.csv or .jsonl); re-running resumes it")
+    b.add_argument("-f", "--format", choices=["csv", "jsonl"], help="output format (default: from --out suffix)")
+    b.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    b.add_argument("--cache-dir", default=DEFAULT_DIR, help=f"extraction cache directory (default: {DEFAULT_DIR})")
+    b.add_argument("--no-cache", action="store_true", help="always call the model, ignoring the extraction cache")
+    b.add_argument("-c", "--concurrency", type=int, default=8, help="concurrent extraction requests (default: 8)")
+    b.add_argument("--rpm", type=float, default=60.0, help="model requests per minute allowed by the API quota (default: 60)")
+    b.add_argument("--timeout", type=float, default=120.0, help="per-request extraction timeout in seconds (default: 120)")
+    b.add_argument("--retries", type=int, default=4, help="retries on 429 / 5xx / timeout (default: 4)")
+    b.add_argument("--no-templates", action="store_true", help="send every PDF to the model, even known form layouts")
+    b.add_argument("--no-triage", action="store_true", help="send whole PDFs instead of only the pages with proposal fields")
+    s = sub.add_parser("serve", help="run the HTTP quoting API")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8080)
+    s.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="compute pool size (default: all cores)")
+    s.add_argument("--pool", choices=["thread", "process"], default="thread", help="compute pool type (default: thread)")
+    s.add_argument("--extract-stub", type=Path, help="answer /extract with this JSON proposal instead of calling Gemini")
+    q = sub.add_parser("quotes", help="look up stored quotes (newest first, one JSON object per line)")
+    q.add_argument("quote_no", nargs="?", help="a quote number; omit to search with the filters below")
+    q.add_argument("--name", help="applicant name (case-insensitive, whole name)")
+    q.add_argument("--dob", help="applicant date of birth, YYYY-MM-DD")
+    q.add_argument("--since", help="quoted on or after this date / ISO time")
+    q.add_argument("--until", help="quoted up to this date (inclusive) / before this ISO time")
+    q.add_argument("-n", "--limit", type=int, default=100, help="most quotes to list (default: 100)")
+    q.add_argument("--db", default=None, help="quote store file (default: AEGIS_QUOTE_DB or .aegis_cache/quotes.sqlite)")
+    t = sub.add_parser("tables", help="validate rating table files and show what each changes against the active set")
+    t.add_argument("files", nargs="*", type=Path, help="table files to check (default: every file in the table directories)")
+    r = sub.add_parser("rerate", help="re-rate stored quotes affected by a rating table revision")
+    r.add_argument("--dry-run", action="store_true", help="count the quotes that would change without saving them")
+    r.add_argument("--db", default=None, help="quote store file (default: AEGIS_QUOTE_DB or .aegis_cache/quotes.sqlite)")
+    f = sub.add_parser("fonts", help="download the self-hosted web fonts into static/fonts")
+    f.add_argument("--force", action="store_true", help="re-download fonts that are already present")
+    f.add_argument("--update", action="store_true", help="pin the newest font versions in static/fonts/fonts.lock.json")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "fonts":
+        from aegis.assets import fetch_fonts
+        fetch_fonts(force=args.force, update=args.update, log=lambda m: print(m, file=sys.stderr))
+        return 0
+
+    if args.cmd == "quotes":
+        from aegis.quotes import DEFAULT_PATH, QuoteStore
+        store = QuoteStore(args.db or DEFAULT_PATH)
+        if args.quote_no:
+            rows = [r for r in [store.get(args.quote_no)] if r]
+        else:
+            rows = store.find(args.name, args.dob, args.since, args.until, args.limit)
+        for r in rows:
+            print(json.dumps(r, default=str))
+        return 0 if rows else 1
+
+    if args.cmd == "tables":
+        from aegis import engine
+        from aegis.tables import LOAD_ERRORS, RatingTables, diff_tables, table_files
+        bad = 0
+        for p in args.files or table_files():
+            try:
+                t = RatingTables.from_file(p, like=engine.TABLES)
+            except LOAD_ERRORS as e:
+                bad += 1
+                print(f"{p}: invalid: {type(e).__name__}: {e}")
+                continue
+            active = " (active)" if t.version == engine.TABLES_VERSION else ""
+            print(f"{p}: {t.label} {t.version}{active}")
+            for c in diff_tables(engine.TABLES, t):
+                print(f"  {c.describe()}")
+        return 1 if bad else 0
+
+    if args.cmd == "rerate":
+        from aegis.quotes import DEFAULT_PATH, QuoteStore
+        from aegis.rerate import rerate
+        report = rerate(QuoteStore(args.db or DEFAULT_PATH), dry_run=args.dry_run,
+                        log=lambda m: print(m, file=sys.stderr))
+        print(json.dumps(report, indent=2))
+        return 0
+
+    if args.cmd == "serve":
+        from aegis.server import serve, stub_extractor
+        serve(args.host, args.port, max(1, args.workers), args.pool,
+              extractor=stub_extractor(args.extract_stub) if args.extract_stub else None)
+        return 0
+
+    fmt = args.format or ("csv" if args.out.suffix.lower() == ".csv" else "jsonl")
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+    cfg = PipelineConfig(workers=max(1, args.concurrency), rpm=args.rpm, timeout=args.timeout,
+                         max_attempts=max(0, args.retries) + 1)
+    stats = run_batch(args.source, args.out, fmt, max(1, args.workers), api_key,
+                      cache_dir=None if args.no_cache else args.cache_dir, cfg=cfg,
+                      triage=not args.no_triage, templates=not args.no_templates)
+    return 1 if stats["error"] else 0
@@ -0,0 +1,216 @@
+from datetime import date, datetime
+
+from aegis.flags import Rule, RuleSet
+from aegis.tables import RatingTables, load_active
+
+# ─── UNDERWRITING TABLES ────────────────────────────────────────
+# Loaded from the active rating table file (aegis/tables.py) and exposed as
+# module globals: BMI_T, FAM_E, H_E, CO_M, HAB_E, HAB_C, OCC_E, L_RAT, C_RAT,
+# P_RAT, FIN_T, their compiled indexes (BMI_IDX, L_IDX, C_IDX, P_IDX,
+# FIN_IDX), RATE_CARD, TABLES and TABLES_VERSION. install_tables() swaps all
+# of them in one step. Code that must see a single consistent set across
+# several lookups (the batch engine) should take engine.TABLES once.
+CL = {"thyroid":"Thyroid","asthma":"Asthma","hypertension":"Hypertension","diabetes":"Diabetes Mellitus","gut_disorder":"Gut Disorder"}
+HL = {"smoking":"Smoking","alcohol":"Alcohol","tobacco":"Tobacco"}
+OL = {"pilot":"Commercial Pilot","athlete":"Professional Athlete","driver":"Public Carrier Driver","merchant_navy":"Merchant Navy","oil_gas":"Oil & Gas Onshore"}
+
+def install_tables(t: RatingTables):
+    globals().update(t.names())
+
+install_tables(load_active())
+
+# ─── HELPER FUNCTIONS ───────────────────────────────────────────
+def calc_age(dob: date) -> int:
+    today = date.today()
+    age = today.year - dob.year
+    if (today.month, today.day) < (dob.month, dob.day):
+        age -= 1
+    return age
+
+def calc_bmi(weight_kg: float, height_cm: float) -> float:
+    return round(weight_kg / ((height_cm / 100) ** 2), 1)
+
+def lookup_bmi_points(b: float) -> float:
+    v = BMI_IDX.values(b)
+    return v[0] if v else 20
+
+def lookup_life_rating(emr: float):
+    v = L_IDX.values(emr)
+    return {"cls": v[0], "fac": v[1]} if v else None
+
+def lookup_cir_rating(emr: float):
+    v = C_IDX.values(emr)
+    return {"cls": v[0], "fac": v[1]} if v else None
+
+def lookup_premium_rates(age: int):
+    v = P_IDX.values(age)
+    return list(v) if v else None
+
+def lookup_financial_multiple(age: int) -> int:
+    v = FIN_IDX.values(age)
+    return v[0] if v else 10
+
+def fmt_inr(amount: float) -> str:
+    return f"₹ {int(round(amount)):,}"
+
+def fmt_pts(pts: float) -> str:
+    return f"+{pts:.1f}" if pts >= 0 else f"{pts:.1f}"
+
+# ─── UNDERWRITING ENGINE ────────────────────────────────────────
+# Components of compute_underwriting, shared with the incremental preview (aegis/preview.py)
+def proposal_age(dob) -> int:
+    dob = datetime.strptime(dob, "%Y-%m-%d").date() if isinstance(dob, str) else dob
+    return calc_age(dob)
+
+def health_component(conds: dict):
+    h_brk = {}
+    active_conds = []
+    for c, sev in (conds or {}).items():
+        sev = int(sev)
+        if sev > 0 and c in H_E:
+            h_brk[c] = H_E[c][sev - 1]
+            active_conds.append(c)
+        else:
+            h_brk[c] = 0
+
+    n_conds = len(active_conds)
+    co_m = CO_M.get(min(n_conds, 3), 0) if n_conds >= 2 else 0
+    return h_brk, co_m, sum(h_brk.values()) + co_m, n_conds
+
+def habit_component(habits: dict):
+    hab_brk = {}
+    active_habs = []
+    for h, freq in (habits or {}).items():
+        if freq and freq != "none":
+            pts = (HAB_E.get(h) or {}).get(freq, 0)
+            hab_brk[h] = pts
+            if pts > 0:
+                active_habs.append(h)
+        else:
+            hab_brk[h] = 0
+
+    n_habs = len(active_habs)
+    hab_c = HAB_C.get(min(n_habs, 3), 0) if n_habs >= 2 else 0
+    return hab_brk, hab_c, sum(hab_brk.values()) + hab_c
+
+def rating_classes(EMR: float):
+    li, ci = L_IDX.index(EMR), C_IDX.index(EMR)
+    LR = {"cls": L_RAT[li][2], "fac": L_RAT[li][3]} if li >= 0 else None
+    CR = {"cls": C_RAT[ci][2], "fac": C_RAT[ci][3]} if ci >= 0 else None
+    return li, ci, LR, CR
+
+def verdict_for(A: int, EMR: float):
+    if A < 18 or A > 65 or EMR > 550:
+        return "Policy Declined", "decline"
+    elif EMR < 20:
+        return "Standard Acceptance", "standard"
+    return "Acceptance with Loading", "loading"
+
+# ─── FLAG RULES ─────────────────────────────────────────────────
+# Compiled once (aegis/flags.py) and evaluated by compute_underwriting on one
+# proposal and by compute_underwriting_batch on whole columns.
+# Flags are raised in rule order; the severity-4 rules follow CL, not the
+# order a proposal happens to list its conditions in.
+FLAG_FACTS = {"A": int, "B": float, "EMR": float, "n_active_conds": int, **{f"sev_{c}": int for c in CL},
+              "cir_cover": float, "base_cover": float, "yearly_income": float, "fin_mult": int, "fin_limit": float,
+              "n_occs": int}
+FLAG_RULES = RuleSet([
+    Rule("age_low", "DECLINE", "A < 18", "Age {A} below minimum insurable age of 18."),
+    Rule("age_high", "DECLINE", "A > 65", "Age {A} exceeds maximum insurable age of 65."),
+    Rule("cir_age", "WARNING", "(A > 60) & (A <= 65)", "CIR unavailable above age 60 — CIR will be declined."),
+    Rule("bmi_low", "MANUAL_UW", "B < 18", "BMI {B} below 18 (underweight) — manual medical review required."),
+    Rule("bmi_high", "MANUAL_UW", "B > 38", "BMI {B} above 38 — not in standard table, manual review needed."),
+    Rule("many_conds", "MANUAL_UW", "n_active_conds >= 4",
+         "{n_active_conds} conditions found. Table covers max 3 — manual UW required."),
+    *[Rule(f"sev4_{c}", "MANUAL_UW", f"sev_{c} == 4", f"{label} at Severity Level 4 — medical officer review required.")
+      for c, label in CL.items()],
+    Rule("emr_max", "DECLINE", "EMR > 550", "Total EMR {EMR:.1f} exceeds ratable maximum of 550."),
+    Rule("cir_emr", "WARNING", "(EMR > 100) & (cir_cover > 0)",
+         "EMR {EMR:.1f} exceeds CIR ceiling of 100 — CIR will be declined."),
+    Rule("fin_limit", "MANUAL_UW", "base_cover > yearly_income * fin_mult",
+         "Life cover {base_cover:inr} exceeds financial UW limit ({fin_mult}× income = {fin_limit:inr})."),
+    Rule("multi_occ", "MANUAL_UW", "n_occs > 1", "Multiple risky occupations declared — manual review required."),
+], FLAG_FACTS, {"inr": fmt_inr})
+
+def occupation_extra(occs: list) -> float:
+    return sum(OCC_E.get(o, 0) for o in (occs or []))
+
+def priced_card(A: int, li: int, ci: int):
+    card = RATE_CARD.get(A, li, ci)
+    return card if card and 18 <= A <= 65 else None
+
+def life_line(card, base_cover: float, occ_pm: float) -> dict:
+    if not card:
+        return {}
+    lr = card.life
+    lb = (lr * base_cover) / 1000
+    lf = card.life_fac
+    ll = 0.25 * lf * lb
+    lo = (occ_pm * base_cover) / 1000
+    return {"base": lb, "fac": lf, "load": ll, "occ": lo, "total": lb + ll + lo, "cls": card.life_cls, "rate": lr}
+
+def accident_line(card, accident_cover: float, occ_pm: float) -> dict:
+    if not card:
+        return {}
+    ar = card.acc
+    ab = (ar * accident_cover) / 1000
+    ao = (occ_pm * accident_cover) / 1000
+    return {"base": ab, "occ": ao, "total": ab + ao, "rate": ar}
+
+def cir_line(card, A: int, EMR: float, cir_cover: float) -> dict:
+    if not card:
+        return {}
+    cr = card.cir
+    if A > 60 or EMR > 100 or not cr:
+        return {"declined": True, "reason": "CIR not available above age 60" if A > 60 else f"EMR {EMR:.1f} exceeds CIR max of 100"}
+    cb = (cr * cir_cover) / 1000
+    cf = card.cir_fac
+    cl = 0.30 * cf * cb
+    return {"base": cb, "fac": cf, "load": cl, "total": cb + cl, "cls": card.cir_cls, "rate": cr}
+
+def compute_underwriting(d: dict) -> dict:
+    # Rated again if install_tables() ran mid-call, so a result never mixes two table sets
+    while True:
+        t = TABLES
+        r = _rate(d)
+        if TABLES is t:
+            return r
+
+def _rate(d: dict) -> dict:
+    A = proposal_age(d["dob"])
+    B = calc_bmi(d["weight_kg"], d["height_cm"])
+
+    e_bmi = lookup_bmi_points(B)
+    e_fam = FAM_E.get(d.get("parent_health_status", ""), 0)
+    h_brk, co_m, e_health, n_conds = health_component(d.get("health_conditions"))
+    hab_brk, hab_c, e_hab = habit_component(d.get("habits"))
+
+    EMR = e_bmi + e_fam + e_health + e_hab
+    li, ci, LR, CR = rating_classes(EMR)
+    verdict, dcl = verdict_for(A, EMR)
+
+    # Flags
+    conds = d.get("health_conditions") or {}
+    income = d.get("yearly_income", 0)
+    fin_mult = lookup_financial_multiple(A)
+    # Positional, in FLAG_FACTS order: keyword facts cost more than the rules themselves
+    flags = FLAG_RULES.flags(A, B, EMR, n_conds, *[int(conds.get(c, 0)) for c in CL], d.get("cir_cover", 0),
+                             d.get("base_cover", 0), income, fin_mult, income * fin_mult,
+                             len(d.get("risky_occupations", [])))
+
+    # Premiums
+    card = priced_card(A, li, ci)
+    occ_pm = occupation_extra(d.get("risky_occupations"))
+    l_B = life_line(card, d.get("base_cover", 0), occ_pm)
+    a_B = accident_line(card, d.get("accident_cover", 0), occ_pm)
+    c_B = cir_line(card, A, EMR, d.get("cir_cover", 0))
+
+    return {
+        "A": A, "B": B, "EMR": EMR, "LR": LR, "CR": CR,
+        "verdict": verdict, "dcl": dcl, "flags": flags,
+        "e_bmi": e_bmi, "e_fam": e_fam, "h_brk": h_brk, "co_m": co_m,
+        "e_health": e_health, "hab_brk": hab_brk, "hab_c": hab_c, "e_hab": e_hab,
+        "l_B": l_B, "a_B": a_B, "c_B": c_B,
+        "grand": l_B.get("total", 0.0) + a_B.get("total", 0.0) + c_B.get("total", 0.0),
+        "n_active_conds": n_conds
+    }
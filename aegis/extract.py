@@ -0,0 +1,524 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Iterator, NamedTuple, Optional
+
+from aegis.cache import ExtractionCache, cache_key
+from aegis.metrics import count, record_stage, span, timed_iter
+from aegis.pages import PagePlan, fields_by_page, page_subset, plan_pages
+from aegis.schema import FIELDS, PAGE_FIELDS, PAGES_SCHEMA, RESPONSE_SCHEMA, field_prompt, response_schema, validate
+from aegis.spool import BUDGET, PDF, SpooledPDF, pdf_bytes
+from aegis.templates import FastPathResult, get_registry
+from aegis.triage import triage_pdf
+
+# ─── AI EXTRACTION ──────────────────────────────────────────────
+# The model answers in JSON mode against RESPONSE_SCHEMA (aegis/schema.py).
+# Every answer is validated field by field. Fields that are missing or invalid
+# are asked for again in a short follow-up request; the whole document is only
+# re-extracted when most of the answer is unusable.
+MODEL_NAME = "gemini-2.0-flash"
+FILE_API_MIN = 4 * 1024 * 1024   # smaller payloads are cheaper to send inline
+FIELD_RETRIES = 2                # follow-up requests for missing / invalid fields
+FULL_RETRY_SHARE = 0.5           # re-extract everything when more than this share of fields is unusable
+
+PROMPT = """You are an expert insurance underwriter. Extract ALL fields from this life insurance proposal form PDF.
+
+Return a JSON object with EXACTLY these keys:
+
+{
+  "name": "string",
+  "gender": "Male or Female",
+  "dob": "YYYY-MM-DD",
+  "height_cm": number,
+  "weight_kg": number,
+  "yearly_income": number,
+  "source_of_income": "salary|business|profession|other",
+  "base_cover": number,
+  "cir_cover": number,
+  "accident_cover": number,
+  "parent_health_status": "both_above_65|one_above_65|both_below_65",
+  "health_conditions": {
+    "thyroid": 0,
+    "asthma": 0,
+    "hypertension": 0,
+    "diabetes": 0,
+    "gut_disorder": 0
+  },
+  "habits": {
+    "smoking": "none",
+    "alcohol": "none",
+    "tobacco": "none"
+  },
+  "risky_occupations": [],
+  "extraction_notes": "",
+  "sources": [{"field": "name", "page": 1}]
+}
+
+Rules:
+- health_conditions severity: 0=not present, 1=sev1, 2=sev2, 3=sev3, 4=sev4
+- habits: none|occasionally|moderate|high
+- risky_occupations: array with values from: pilot, athlete, driver, merchant_navy, oil_gas
+- sources: one entry per field above (except extraction_notes) with the page it was read from, 1 = first page of this PDF
+- Use null for a field the form does not answer; never guess."""
+
+PAGES_PROMPT = """You are an expert insurance underwriter. These are the revised pages of a life insurance proposal form
+whose other pages were already read. Extract the proposal fields that appear on THESE pages, with the same keys and
+rules as for the full form. Use null for every field these pages do not show; never guess.
+In "sources", give the page each field you returned was read from, 1 = first page of this PDF."""
+# Cache entries are keyed on the prompt and schema together, so changing either re-extracts
+PROMPT_KEY = PROMPT + "\n" + json.dumps(RESPONSE_SCHEMA, sort_keys=True)
+PAGE_SALT = "\n".join([PROMPT_KEY, PAGES_PROMPT, MODEL_NAME])
+
+# ─── MODEL CLIENT ───────────────────────────────────────────────
+# genai.configure is process-global, so clients are built once per
+# (api_key, endpoint) and reused. `endpoint` points the REST transport at
+# another host, e.g. a local fake server in tests.
+class ModelClient:
+    def __init__(self, api_key: str, model_name: str = MODEL_NAME, endpoint: Optional[str] = None):
+        import google.generativeai as genai  # heavy; only loaded once extraction is actually used
+
+        opts = {"transport": "rest", "client_options": {"api_endpoint": endpoint}} if endpoint else {}
+        genai.configure(api_key=api_key, **opts)
+        self.genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.files = endpoint is None  # the File API is only on the real backend
+
+    # Spooled PDFs above FILE_API_MIN are uploaded from disk and referenced,
+    # rather than read into memory and base64-inlined into the request
+    @contextmanager
+    def _pdf_part(self, pdf: PDF):
+        if not (self.files and isinstance(pdf, SpooledPDF) and pdf.size >= FILE_API_MIN):
+            yield {"mime_type": "application/pdf", "data": pdf_bytes(pdf)}
+            return
+        f = self.genai.upload_file(pdf.path, mime_type="application/pdf")
+        try:
+            deadline = time.monotonic() + 60
+            while f.state.name == "PROCESSING" and time.monotonic() < deadline:
+                time.sleep(0.5)
+                f = self.genai.get_file(f.name)
+            if f.state.name != "ACTIVE":
+                raise ValueError(f"uploaded file {f.name} is {f.state.name}")
+            yield f
+        finally:
+            try:
+                self.genai.delete_file(f.name)
+            except Exception:
+                pass  # files expire server-side after 48 h anyway
+
+    # JSON mode: the response is constrained to `schema` (the full extraction schema by default)
+    @staticmethod
+    def _config(schema: Optional[dict]) -> dict:
+        return {"response_mime_type": "application/json", "response_schema": schema or RESPONSE_SCHEMA}
+
+    def generate(self, pdf: PDF, prompt: str = PROMPT, schema: Optional[dict] = None) -> str:
+        with self._pdf_part(pdf) as part:
+            return self.model.generate_content([part, prompt], generation_config=self._config(schema)).text
+
+    async def generate_async(self, pdf: PDF, prompt: str = PROMPT, schema: Optional[dict] = None) -> str:
+        if isinstance(pdf, SpooledPDF) and self.files and pdf.size >= FILE_API_MIN:
+            return await asyncio.to_thread(self.generate, pdf, prompt, schema)  # upload / poll are blocking calls
+        with self._pdf_part(pdf) as part:
+            return (await self.model.generate_content_async([part, prompt], generation_config=self._config(schema))).text
+
+    def generate_stream(self, pdf: PDF, prompt: str = PROMPT, schema: Optional[dict] = None) -> Iterator[str]:
+        with self._pdf_part(pdf) as part:
+            for chunk in self.model.generate_content([part, prompt], generation_config=self._config(schema), stream=True):
+                yield chunk.text
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: Optional[str] = None, endpoint: Optional[str] = None) -> ModelClient:
+    api_key = api_key if api_key is not None else os.environ.get("GEMINI_API_KEY", "")
+    endpoint = endpoint or os.environ.get("GEMINI_API_ENDPOINT") or None
+    with _clients_lock:
+        client = _clients.get((api_key, endpoint))
+        if client is None:
+            client = _clients[(api_key, endpoint)] = ModelClient(api_key, endpoint=endpoint)
+    return client
+
+def parse_response(raw: str) -> dict:
+    with span("parse"):
+        if raw.lstrip().startswith("`"):
+            raw = re.sub(r"```json|```", "", raw).strip()  # JSON mode answers are bare; stubs may still fence them
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            count("aegis_parse_errors_total", "Model responses that were not valid JSON")
+            raise
+
+def salvage(raw: str) -> dict:
+    # The proposal fields a response holds: all of them if it parses, else the
+    # top-level fields that were complete before it broke off
+    try:
+        data = parse_response(raw)
+        return data if isinstance(data, dict) else {}
+    except json.JSONDecodeError:
+        return dict(FieldScanner().feed(re.sub(r"```json|```", "", raw)))
+
+def _model_failed():
+    count("aegis_extraction_failures_total", "Extractions whose model call failed")
+
+# ─── FIELD REPAIR ───────────────────────────────────────────────
+def _get(d: dict, key: str):
+    for p in key.split("."):
+        d = d.get(p) if isinstance(d, dict) else None
+    return d
+
+def _put(d: dict, key: str, v):
+    *parents, last = key.split(".")
+    for p in parents:
+        if not isinstance(d.get(p), dict):
+            d[p] = {}
+        d = d[p]
+    d[last] = v
+
+class Request(NamedTuple):
+    kind: str           # full (whole document), pages (changed pages only) or fields (follow-up)
+    load: Callable      # () -> what to send; may triage or cut pages, so async callers run it in a thread
+    prompt: str
+    schema: dict
+    fields: list        # field names asked for
+
+    @property
+    def args(self) -> tuple:
+        # Client arguments after the payload; the default full extraction needs none
+        return () if self.prompt is PROMPT else (self.prompt, self.schema)
+
+class Document:
+    # The PDF as sent for whole-document requests, triaged on first use
+    def __init__(self, pdf: PDF, triage: bool = True):
+        self.pdf = pdf
+        self.triage = triage
+        self.report = None
+        self._payload = None
+
+    def payload(self) -> PDF:
+        if self._payload is None:
+            if self.triage:
+                with span("extract.triage"):
+                    self._payload, self.report = triage_pdf(self.pdf)
+            else:
+                self._payload = self.pdf
+        return self._payload
+
+    def page_map(self, n: int) -> list:
+        # Pages of the PDF in the order they were sent
+        return list(self.report.pages) if self.report is not None and self.report.pages else list(range(n))
+
+def repair(data: dict, doc: Document) -> Iterator[Request]:
+    # Follow-up requests for one answer: yields Requests, is sent each reply's
+    # raw text, and returns (validated proposal, errors left, sources). sources
+    # is the whole-document retry's page attribution when the answer was
+    # replaced by one, else None. Fields still invalid after FIELD_RETRIES are
+    # cleared to None, so the review form shows its default, and listed in
+    # extraction_notes for the reviewer.
+    sources = None
+    with span("validate"):
+        data, errors = validate(data)
+    if len(errors) > FULL_RETRY_SHARE * len(FIELDS):
+        count("aegis_extraction_full_retries_total", "Whole-document re-extractions after an unusable answer")
+        part = salvage((yield Request("full", doc.payload, PROMPT, RESPONSE_SCHEMA, list(FIELDS))))
+        sources = part.pop("sources", None) or []
+        with span("validate"):
+            data, errors = validate(part)
+        if len(errors) == len([f for f in FIELDS.values() if f.required]):
+            raise ValueError("the model returned no usable proposal fields")
+    for _ in range(FIELD_RETRIES):
+        if not errors:
+            break
+        count("aegis_extraction_field_retries_total", "Follow-up requests for missing or invalid fields")
+        count("aegis_extraction_fields_retried_total", "Fields asked for again", len(errors))
+        part = salvage((yield Request("fields", doc.payload, field_prompt(errors), response_schema(list(errors)),
+                                      list(errors))))
+        for k in errors:
+            v = _get(part, k)
+            if v is not None:
+                _put(data, k, v)
+        with span("validate"):
+            data, errors = validate(data)
+    if errors:
+        count("aegis_extraction_invalid_fields_total", "Fields left for the reviewer after follow-ups", len(errors))
+        note = "Check on the form (not read reliably): " + "; ".join(f"{k}: {e}" for k, e in errors.items())
+        for k in errors:
+            _put(data, k, None)
+        data["extraction_notes"] = " ".join(filter(None, [data.get("extraction_notes"), note]))
+    return data, errors, sources
+
+def _merge_pages(data: dict, part: dict):
+    # Non-null fields read from changed pages replace the cached ones
+    for k, v in part.items():
+        if v is None:
+            continue
+        if isinstance(v, dict) and isinstance(data.get(k), dict):
+            data[k] = {**data[k], **{a: b for a, b in v.items() if b is not None}}
+        else:
+            data[k] = v
+
+def extraction(doc: Document, plan: Optional[PagePlan] = None) -> Iterator[Request]:
+    # Every model request for one PDF, shared by the sync, streaming and async
+    # callers: yields Requests, is sent each reply's raw text, and returns
+    # (proposal, {page index: fields read from that page}) for the page cache.
+    # With a page plan that is mostly cached, only the changed pages are sent.
+    if plan is not None and plan.incremental:
+        count("aegis_extraction_pages_total", "Pages of extracted PDFs", len(plan.known), source="cache")
+        count("aegis_extraction_pages_total", "Pages of extracted PDFs", len(plan.changed), source="model")
+        data, sources = plan.cached_fields(), []
+        if plan.changed:
+            part = salvage((yield Request("pages", partial(page_subset, doc.pdf, plan.changed), PAGES_PROMPT,
+                                          PAGES_SCHEMA, PAGE_FIELDS)))
+            sources = part.pop("sources", None)
+            _merge_pages(data, part)
+        data, errors, retried = yield from repair(data, doc)
+        page_map = plan.changed
+    else:
+        part = salvage((yield Request("full", doc.payload, PROMPT, RESPONSE_SCHEMA, list(FIELDS))))
+        sources = part.pop("sources", None)
+        data, errors, retried = yield from repair(part, doc)
+    if plan is None:
+        return data, {}
+    whole = retried is not None or not plan.incremental
+    if retried is not None:
+        # The answer was replaced by a whole-document retry: attribute pages from that
+        sources = retried
+    if whole:
+        page_map = doc.page_map(len(plan.keys))
+    found = fields_by_page(data, sources, page_map, skip={k.split(".")[0] for k in errors})
+    # Pages that gave no fields are cached too, so the next revision knows them
+    sent = range(len(plan.keys)) if whole else plan.changed
+    return data, {i: found.get(i, {}) for i in sent}
+
+def run_extraction(steps: Iterator[Request], call: Callable) -> tuple:
+    # extraction() driven by call(Request) -> raw text
+    try:
+        req = next(steps)
+        while True:
+            req = steps.send(call(req))
+    except StopIteration as done:
+        return done.value
+
+def template_data(fast: FastPathResult) -> Optional[dict]:
+    # A template read passes the same validator as a model answer; if any field fails, the model reads the PDF
+    if fast.data is None:
+        return None
+    with span("validate"):
+        data, errors = validate(fast.data)
+    if errors:
+        count("aegis_template_rejects_total", "Template reads sent to the model after failing validation")
+        return None
+    return data
+
+def remember_pages(cache: Optional[ExtractionCache], plan: Optional[PagePlan], found: dict):
+    if cache is not None and plan is not None and found:
+        cache.put_pages({plan.keys[i]: fields for i, fields in found.items()})
+
+# `pdf` is the PDF bytes or a SpooledPDF. Results are cached under the original
+# PDF, so a cache hit skips triage too. Forms matching a known template
+# (aegis.templates) are read locally without a model call. A revised PDF whose
+# pages are mostly cached sends only its changed pages (aegis.pages).
+# Everything after the cache lookup runs inside the process memory budget.
+def extract_from_pdf(pdf: PDF, api_key: Optional[str] = None, cache: Optional[ExtractionCache] = None,
+                     client: Optional[ModelClient] = None, triage: bool = True, templates: bool = True,
+                     pages: bool = True) -> dict:
+    if cache is not None:
+        with span("extract.cache"):
+            key = cache_key(pdf, PROMPT_KEY, MODEL_NAME)
+            hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    with BUDGET.reserve(pdf) as waited:
+        record_stage("extract.queue", waited)
+        if templates:
+            with span("extract.template"):
+                fast = get_registry().extract(pdf)
+            data = template_data(fast)
+            if data is not None:
+                return data
+
+        plan = None
+        if cache is not None and pages:
+            with span("extract.pages"):
+                plan = plan_pages(pdf, cache, PAGE_SALT)
+        client = client or get_client(api_key)
+
+        def call(req: Request) -> str:
+            payload = req.load()
+            try:
+                with span("extract.model"):
+                    return client.generate(payload, *req.args)
+            except Exception:
+                _model_failed()
+                raise
+
+        data, found = run_extraction(extraction(Document(pdf, triage), plan), call)
+    if cache is not None:
+        cache.put(key, data)
+        remember_pages(cache, plan, found)
+    return data
+
+# ─── STREAMING EXTRACTION ───────────────────────────────────────
+# Field groups reported to the UI as soon as all of their keys have
+# arrived in the model's streamed JSON.
+FIELD_GROUPS = {
+    "personal": ["name", "gender", "dob", "height_cm", "weight_kg"],
+    "covers": ["yearly_income", "source_of_income", "base_cover", "cir_cover", "accident_cover"],
+    "health": ["parent_health_status", "health_conditions"],
+    "habits": ["habits"],
+    "occupations": ["risky_occupations"],
+}
+
+class FieldScanner:
+    # Incremental scanner over a streamed JSON object: feed() text chunks and
+    # get back the top-level (key, value) pairs whose values are complete.
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_str = self.esc = False
+        self.key = None
+        self.key_start = self.val_start = None
+        self.closed = False
+
+    def feed(self, text: str) -> list:
+        self.buf += text
+        out = []
+        buf = self.buf
+        for i in range(self.pos, len(buf)):
+            ch = buf[i]
+            if self.closed:
+                break
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+                    if self.depth == 1 and self.key_start is not None:
+                        self.key = json.loads(buf[self.key_start:i + 1])
+                        self.key_start = None
+                continue
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                continue
+            if ch == '"':
+                self.in_str = True
+                if self.depth == 1 and self.key is None:
+                    self.key_start = i
+            elif ch == ":" and self.depth == 1 and self.key is not None and self.val_start is None:
+                self.val_start = i + 1
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 1:
+                    self._finish(buf[self.val_start:i] if self.val_start is not None else None, out)
+                    self.closed = True
+                self.depth -= 1
+            elif ch == "," and self.depth == 1:
+                self._finish(buf[self.val_start:i] if self.val_start is not None else None, out)
+        self.pos = len(buf)
+        return out
+
+    def _finish(self, raw, out: list):
+        if self.key is not None and raw is not None and raw.strip():
+            try:
+                out.append((self.key, json.loads(raw)))
+            except json.JSONDecodeError:
+                pass  # left to validation, which reports the field as missing
+        self.key = self.val_start = None
+
+def stream_extract(pdf: PDF, api_key: Optional[str] = None, cache: Optional[ExtractionCache] = None,
+                   client: Optional[ModelClient] = None, triage: bool = True,
+                   templates: bool = True, pages: bool = True) -> Iterator[tuple]:
+    # Yields ("queued", None, seconds) if the memory budget made it wait,
+    # ("template", name, FastPathResult) when a form template was tried,
+    # ("pages", None, PagePlan) when only changed pages are re-read,
+    # ("triage", None, TriageReport) before a whole-document model call,
+    # ("group", name, fields) as each FIELD_GROUPS entry completes,
+    # ("repair", None, field names) before each follow-up request, then
+    # ("done", None, data)
+    key = None
+    data = None
+    if cache is not None:
+        with span("extract.cache"):
+            key = cache_key(pdf, PROMPT_KEY, MODEL_NAME)
+            data = cache.get(key)
+
+    pending = dict(FIELD_GROUPS)
+    if data is None:
+        with BUDGET.reserve(pdf) as waited:
+            record_stage("extract.queue", waited)
+            if waited > 0.01:
+                yield "queued", None, waited
+            if templates:
+                with span("extract.template"):
+                    fast = get_registry().extract(pdf)
+                data = template_data(fast)
+                if fast.data is not None and data is None:
+                    fast = fast._replace(data=None, reason="failed validation")
+                if fast.template is not None:
+                    yield "template", fast.template, fast
+
+            if data is None:
+                client = client or get_client(api_key)
+                plan = None
+                if cache is not None and pages:
+                    with span("extract.pages"):
+                        plan = plan_pages(pdf, cache, PAGE_SALT)
+                    if plan is not None and plan.incremental:
+                        yield "pages", None, plan
+                doc = Document(pdf, triage)
+                steps = extraction(doc, plan)
+                reported = followup = False
+                try:
+                    req = next(steps)
+                    while True:
+                        payload = req.load()
+                        if doc.report is not None and not reported:
+                            yield "triage", None, doc.report
+                            reported = True
+                        if followup:
+                            yield "repair", None, req.fields
+                        followup = True
+                        if req.kind != "full":
+                            try:
+                                with span("extract.model"):
+                                    raw = client.generate(payload, *req.args)
+                            except Exception:
+                                _model_failed()
+                                raise
+                            req = steps.send(raw)
+                            continue
+                        # Whole-document answers are streamed, reporting field groups as they complete
+                        scanner = FieldScanner()
+                        seen = {}
+                        chunks = []
+                        try:
+                            for text in timed_iter(client.generate_stream(payload, *req.args), "extract.model"):
+                                chunks.append(text)
+                                seen.update(scanner.feed(text))
+                                for g, keys in list(pending.items()):
+                                    if all(k in seen for k in keys):
+                                        del pending[g]
+                                        yield "group", g, {k: seen[k] for k in keys}
+                        except Exception:
+                            _model_failed()
+                            raise
+                        req = steps.send("".join(chunks))
+                except StopIteration as done:
+                    data, found = done.value
+                if cache is not None:
+                    cache.put(key, data)
+                    remember_pages(cache, plan, found)
+
+    for g, keys in pending.items():
+        yield "group", g, {k: data[k] for k in keys if k in data}
+    yield "done", None, data
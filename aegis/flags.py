@@ -0,0 +1,84 @@
+import string
+from typing import Callable, NamedTuple, Optional
+
+# ─── FLAG RULES ─────────────────────────────────────────────────
+# Underwriting flags are declared as data: a severity, a predicate over named
+# facts (age, BMI, EMR, covers, ...) and a message template. A RuleSet
+# compiles a rule set into two generated functions: one returns a mask per
+# rule for NumPy columns (the batch engine), the other builds the raised flags
+# for one proposal (compute_underwriting, and batch_row for a batch row).
+# Both run the same predicate expressions, so both paths raise the same flags.
+# Predicates combine with & | ~ rather than and / or / not so that they also
+# work element-wise on arrays. Each raised flag carries a trace: the rule,
+# its predicate and the facts it was evaluated on.
+SEVERITIES = ("DECLINE", "MANUAL_UW", "WARNING")
+
+class Rule(NamedTuple):
+    key: str
+    severity: str
+    when: str           # predicate over the facts, e.g. "(A > 60) & (A <= 65)"
+    message: str        # str.format template over the facts; {x:inr} formats rupees
+
+def _show(v):
+    return round(v, 2) if isinstance(v, float) else v
+
+class RuleSet:
+    def __init__(self, rules: list, facts: dict, formats: Optional[dict] = None):
+        # facts: name -> type each value is cast to when a flag is rendered
+        self.rules = tuple(rules)
+        self.keys = [r.key for r in self.rules]
+        self.facts = dict(facts)
+        formats = formats or {}
+        if len(set(self.keys)) != len(self.keys):
+            raise ValueError("flag rules: duplicate keys")
+        ns = {"_show": _show, **{f"_t_{k}": t for k, t in self.facts.items()},
+              **{f"_f_{k}": f for k, f in formats.items()}}
+        args = ", ".join(self.facts)
+        body = []
+        for r in self.rules:
+            if r.severity not in SEVERITIES:
+                raise ValueError(f"flag rule {r.key}: unknown severity {r.severity!r}")
+            names = compile(r.when, r.key, "eval").co_names
+            unknown = [n for n in names if n not in self.facts]
+            if unknown:
+                raise ValueError(f"flag rule {r.key}: unknown facts {', '.join(unknown)}")
+            facts = ", ".join(f"{k!r}: _show(_t_{k}({k}))" for k in self.facts if k in names)
+            body.append(f"    if {r.when}:\n"
+                        f"        out.append({{'s': {r.severity!r}, 'm': {self._message(r, formats)}, "
+                        f"'trace': {{'rule': {r.key!r}, 'when': {r.when!r}, 'facts': {{{facts}}}}}}})\n")
+        src = (f"def flag_masks({args}):\n    return ({''.join(f'({r.when}), ' for r in self.rules)})\n"
+               f"def flag_list({args}):\n    out = []\n{''.join(body)}    return out\n")
+        exec(compile(src, "<flag rules>", "exec"), ns)
+        self._masks: Callable = ns["flag_masks"]
+        self._flags: Callable = ns["flag_list"]
+
+    def _message(self, r: Rule, formats: dict) -> str:
+        # The message template as an expression over the facts
+        parts = []
+        for literal, field, spec, conv in string.Formatter().parse(r.message):
+            if literal:
+                parts.append(repr(literal))
+            if field is None:
+                continue
+            if field not in self.facts or conv:
+                raise ValueError(f"flag rule {r.key}: bad message field {{{field}}}")
+            v = f"_t_{field}({field})"
+            parts.append(f"_f_{spec}({v})" if spec in formats else f"format({v}, {spec or ''!r})")
+        return " + ".join(parts) or "''"
+
+    def evaluate(self, **facts) -> dict:
+        # key -> hit, a bool for scalar facts or a boolean mask for columns
+        return dict(zip(self.keys, self._masks(**facts)))
+
+    def flags(self, *args, **facts) -> list:
+        # Raised flags, in rule order, for one proposal; positional facts go in `facts` order
+        return self._flags(*args, **facts)
+
+    def row(self, res: dict, i: int) -> list:
+        # flags() for row i of a batch result holding the facts
+        return self._flags(**{k: res[k][i] for k in self.facts})
+
+def trace_text(trace: dict) -> str:
+    facts = ", ".join(f"{k} = {v:,}" if isinstance(v, (int, float)) and abs(v) >= 1e4 else f"{k} = {v}"
+                      for k, v in trace["facts"].items())
+    return f"{trace['rule']}: {trace['when']} with {facts}"
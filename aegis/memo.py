@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from aegis import engine
+from aegis.metrics import count, span
+
+# ─── MEMOIZED UNDERWRITING ──────────────────────────────────────
+# Process-wide LRU of compute_underwriting results, shared by every session.
+# Keys cover only the fields the engine reads, plus today's date (age is
+# computed against it) and the rating-table version, so a table change
+# never serves a stale result. Cached results are shared: treat them as read-only.
+RATED_FIELDS = ["dob", "height_cm", "weight_kg", "parent_health_status", "health_conditions", "habits",
+                "risky_occupations", "base_cover", "cir_cover", "accident_cover", "yearly_income"]
+
+def _canon(v):
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, dict):
+        return [[k, _canon(x)] for k, x in v.items()]  # order kept: it drives h_brk order
+    if isinstance(v, (list, tuple)):
+        return [_canon(x) for x in v]
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+def proposal_key(d: dict, version: str = None, today: date = None) -> str:
+    payload = [version or engine.TABLES_VERSION, (today or date.today()).isoformat(),
+               [_canon(d.get(k)) for k in RATED_FIELDS]]
+    return hashlib.sha256(json.dumps(payload, separators=(",", ":"), default=str).encode()).hexdigest()
+
+class UnderwritingMemo:
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.version = engine.TABLES_VERSION
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(self, d: dict) -> dict:
+        version = engine.TABLES_VERSION
+        key = proposal_key(d, version)
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+            r = self._data.get(key)
+            if r is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return r
+            self.misses += 1
+        with span("underwrite"):
+            r = engine.compute_underwriting(d)
+        with self._lock:
+            if version == self.version:
+                self._data[key] = r
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return r
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                    "maxsize": self.maxsize, "tables": self.version}
+
+MEMO = UnderwritingMemo()
+
+def compute_underwriting_cached(d: dict) -> dict:
+    r = MEMO.compute(d)
+    count("aegis_decisions_total", "Underwriting decisions by outcome", decision=r["dcl"])
+    return r
@@ -0,0 +1,255 @@
+import bisect
+import contextvars
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# ─── METRICS ────────────────────────────────────────────────────
+# Fixed-bucket latency histograms (seconds), cheap enough to observe on every request.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, total, s = list(self.counts), self.count, self.sum
+        cum, run = {}, 0
+        for le, c in zip([*self.buckets, "+Inf"], counts):
+            run += c
+            cum[str(le)] = run
+        return {"count": total, "sum": s, "mean": s / total if total else 0.0,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99), "buckets": cum}
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0):
+        with self._lock:
+            self.value += n
+
+# ─── REGISTRY ───────────────────────────────────────────────────
+# Process-wide metric families keyed by (name, labels), exported as JSON or
+# in the Prometheus text format (version 0.0.4).
+class Registry:
+    def __init__(self):
+        self._families = {}     # name -> [kind, help, {labels: metric}]
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, help: str, labels: dict, make):
+        key = tuple(sorted(labels.items()))
+        fam = self._families.get(name)
+        m = fam[2].get(key) if fam is not None else None
+        if m is None:
+            with self._lock:
+                fam = self._families.setdefault(name, [kind, help, {}])
+                if fam[0] != kind:
+                    raise ValueError(f"metric {name} is a {fam[0]}, not a {kind}")
+                m = fam[2].get(key)
+                if m is None:
+                    m = fam[2][key] = make()
+        return m
+
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    def family(self, name: str) -> dict:
+        with self._lock:
+            fam = self._families.get(name)
+            return dict(fam[2]) if fam else {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            fams = {n: (f[0], dict(f[2])) for n, f in self._families.items()}
+        out = {}
+        for name, (kind, metrics) in sorted(fams.items()):
+            out[name] = {",".join(f"{k}={v}" for k, v in key) or "_": (m.snapshot() if kind == "histogram" else m.value)
+                         for key, m in metrics.items()}
+        return out
+
+    def prometheus(self) -> str:
+        with self._lock:
+            fams = [(n, f[0], f[1], dict(f[2])) for n, f in sorted(self._families.items())]
+        lines = []
+        for name, kind, help, metrics in fams:
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, m in sorted(metrics.items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(key)} {_num(m.value)}")
+                    continue
+                with m._lock:
+                    counts, total, s = list(m.counts), m.count, m.sum
+                run = 0
+                for le, c in zip([*m.buckets, "+Inf"], counts):
+                    run += c
+                    lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {run}")
+                lines.append(f"{name}_sum{_labels(key)} {_num(s)}")
+                lines.append(f"{name}_count{_labels(key)} {total}")
+        return "\n".join(lines) + "\n"
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in key) + "}"
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+REGISTRY = Registry()
+
+# ─── TRACING ────────────────────────────────────────────────────
+# span(stage) times one pipeline stage into aegis_stage_seconds{stage} and
+# counts exceptions in aegis_stage_errors_total{stage}. Inside request_trace()
+# the spans are also collected per request. With AEGIS_PROFILE_SLOW set (in
+# seconds), each request runs under cProfile, and requests slower than that are
+# dumped to AEGIS_PROFILE_DIR as <name>-<time>.prof with a .json span list.
+PROFILE_SLOW = float(os.environ.get("AEGIS_PROFILE_SLOW") or 0)
+PROFILE_DIR = os.environ.get("AEGIS_PROFILE_DIR", ".aegis_profiles")
+
+_trace = contextvars.ContextVar("aegis_trace", default=None)
+
+_stage_hists = {}      # stage -> Histogram, skips the registry lookup on hot paths
+
+def record_stage(stage: str, seconds: float, t0: Optional[float] = None):
+    h = _stage_hists.get(stage)
+    if h is None:
+        h = _stage_hists[stage] = REGISTRY.histogram("aegis_stage_seconds", "Time spent per pipeline stage", stage=stage)
+    h.observe(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append({"stage": stage, "start": time.perf_counter() - seconds if t0 is None else t0, "seconds": seconds})
+
+class span:
+    # A class rather than @contextmanager: it wraps per-call work such as parse_response
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, KeyboardInterrupt)):
+            REGISTRY.counter("aegis_stage_errors_total", "Exceptions raised per pipeline stage", stage=self.stage).inc()
+        record_stage(self.stage, time.perf_counter() - self.t0, self.t0)
+        return False
+
+def timed_iter(it, stage: str):
+    # Like span() for a stream: counts only the time spent waiting on the
+    # iterator, not the consumer's work between items
+    total, t_start = 0.0, time.perf_counter()
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                total += time.perf_counter() - t0
+                return
+            except Exception:
+                REGISTRY.counter("aegis_stage_errors_total", "Exceptions raised per pipeline stage", stage=stage).inc()
+                raise
+            total += time.perf_counter() - t0
+            yield item
+    finally:
+        record_stage(stage, total, t_start)
+
+def count(name: str, help: str = "", n: float = 1.0, **labels):
+    REGISTRY.counter(name, help, **labels).inc(n)
+
+@contextmanager
+def request_trace(name: str, slow: Optional[float] = None):
+    slow = PROFILE_SLOW if slow is None else slow
+    trace = []
+    token = _trace.set(trace)
+    prof = None
+    if slow > 0:
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            prof = None  # another profiler is already active on this thread
+    t0 = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        dt = time.perf_counter() - t0
+        if prof is not None:
+            prof.disable()
+        _trace.reset(token)
+        REGISTRY.histogram("aegis_request_seconds", "End-to-end time per request kind", kind=name).observe(dt)
+        if prof is not None and dt >= slow:
+            _dump_profile(name, dt, prof, trace, t0)
+
+def _dump_profile(name: str, seconds: float, prof, trace: list, t0: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1000)}ms")
+    prof.dump_stats(base + ".prof")
+    with open(base + ".json", "w") as f:
+        json.dump({"request": name, "seconds": seconds,
+                   "spans": [dict(s, start=s["start"] - t0) for s in trace]}, f, indent=2)
+    count("aegis_profiles_dumped_total", "Slow requests dumped with a cProfile trace", kind=name)
+
+# ─── LOCAL ENDPOINT ─────────────────────────────────────────────
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    # GET /metrics in Prometheus text format from a daemon thread, for processes
+    # (the Streamlit app) that have no HTTP server of their own
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            body = REGISTRY.prometheus().encode() if self.path.split("?")[0] == "/metrics" else b""
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    srv = ThreadingHTTPServer((host, port), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True, name="aegis-metrics").start()
+    return srv
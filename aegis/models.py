@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Optional
+
+from aegis.engine import CL, HL
+
+# ─── TYPED MODELS ───────────────────────────────────────────────
+# Compact, immutable forms of the proposal and underwriting result dicts, for
+# holding per session. Slotted frozen dataclasses, with condition severities
+# and habit frequencies coded as small ints. They are hashable, so they can key
+# render caches directly. The engine, batch, API and CLI keep their dict
+# shapes: from_dict() / to_dict() convert at the boundary.
+class Severity(IntEnum):
+    INFO = 0
+    WARNING = 1
+    MANUAL_UW = 2
+    DECLINE = 3
+
+class Habit(IntEnum):
+    none = 0
+    occasionally = 1
+    moderate = 2
+    high = 3
+
+    @classmethod
+    def parse(cls, v) -> "Habit":
+        return cls.__members__.get(v or "none", cls.none)  # unknown frequencies rate as none
+
+COND_KEYS = tuple(CL)
+HABIT_KEYS = tuple(HL)
+
+# Fields missing from the dict stay None (the review form then shows its defaults);
+# conditions and habits code a missing entry as 0 / Habit.none, the values the form shows.
+@dataclass(frozen=True, slots=True)
+class Proposal:
+    name: Optional[str]
+    gender: Optional[str]
+    dob: Optional[str]
+    height_cm: Optional[float]
+    weight_kg: Optional[float]
+    yearly_income: Optional[float]
+    source_of_income: Optional[str]
+    base_cover: Optional[float]
+    cir_cover: Optional[float]
+    accident_cover: Optional[float]
+    parent_health_status: Optional[str]
+    conditions: tuple        # severity 0-4 per COND_KEYS
+    habits: tuple            # Habit per HABIT_KEYS
+    occupations: tuple
+    notes: str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Proposal":
+        hc = d.get("health_conditions") or {}
+        hb = d.get("habits") or {}
+        return cls(d.get("name"), d.get("gender"), d.get("dob"),
+                   d.get("height_cm"), d.get("weight_kg"), d.get("yearly_income"),
+                   d.get("source_of_income"), d.get("base_cover"), d.get("cir_cover"),
+                   d.get("accident_cover"), d.get("parent_health_status"),
+                   tuple(int(hc.get(c) or 0) for c in COND_KEYS),
+                   tuple(Habit.parse(hb.get(h)) for h in HABIT_KEYS),
+                   tuple(d.get("risky_occupations") or ()), d.get("extraction_notes") or "")
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "gender": self.gender, "dob": self.dob,
+            "height_cm": self.height_cm, "weight_kg": self.weight_kg,
+            "yearly_income": self.yearly_income, "source_of_income": self.source_of_income,
+            "base_cover": self.base_cover, "cir_cover": self.cir_cover, "accident_cover": self.accident_cover,
+            "parent_health_status": self.parent_health_status,
+            "health_conditions": dict(zip(COND_KEYS, self.conditions)),
+            "habits": {h: v.name for h, v in zip(HABIT_KEYS, self.habits)},
+            "risky_occupations": list(self.occupations), "extraction_notes": self.notes,
+        }
+
+@dataclass(frozen=True, slots=True)
+class Flag:
+    severity: Severity
+    message: str
+    rule: str = ""           # trace of the flag rule that raised it (aegis/flags.py)
+    when: str = ""
+    facts: tuple = ()        # (fact, value) the predicate was evaluated on
+
+    @classmethod
+    def from_dict(cls, f: dict) -> "Flag":
+        t = f.get("trace")
+        if not t:
+            return cls(Severity[f["s"]], f["m"])
+        return cls(Severity[f["s"]], f["m"], t["rule"], t["when"], tuple(t["facts"].items()))
+
+    def to_dict(self) -> dict:
+        if not self.rule:
+            return {"s": self.severity.name, "m": self.message}
+        return {"s": self.severity.name, "m": self.message,
+                "trace": {"rule": self.rule, "when": self.when, "facts": dict(self.facts)}}
+
+@dataclass(frozen=True, slots=True)
+class RateClass:
+    cls: str
+    fac: float
+
+# Keys each kind of premium line carries, as built by engine.life_line / accident_line / cir_line
+LINE_KEYS = {
+    "none": (),
+    "life": ("base", "fac", "load", "occ", "total", "cls", "rate"),
+    "accident": ("base", "occ", "total", "rate"),
+    "cir": ("base", "fac", "load", "total", "cls", "rate"),
+    "cir_declined": ("declined", "reason"),
+}
+_LINE_KIND = {frozenset(keys): kind for kind, keys in LINE_KEYS.items()}
+
+@dataclass(frozen=True, slots=True)
+class PremiumLine:
+    kind: str
+    base: float = 0.0
+    fac: float = 0.0
+    load: float = 0.0
+    occ: float = 0.0
+    total: float = 0.0
+    cls: Optional[str] = None
+    rate: float = 0.0
+    declined: bool = False
+    reason: str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PremiumLine":
+        kind = _LINE_KIND.get(frozenset(d))
+        if kind is None:
+            raise ValueError(f"unrecognised premium line keys: {sorted(d)}")
+        return cls(kind, **d)
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in LINE_KEYS[self.kind]}
+
+@dataclass(frozen=True, slots=True)
+class EMRBreakdown:
+    e_bmi: float
+    e_fam: float
+    health: tuple            # (condition, points) in declaration order
+    co_m: float
+    e_health: float
+    habits: tuple            # (habit, points)
+    hab_c: float
+    e_hab: float
+
+@dataclass(frozen=True, slots=True)
+class UnderwritingResult:
+    A: int
+    B: float
+    EMR: float
+    LR: Optional[RateClass]
+    CR: Optional[RateClass]
+    verdict: str
+    dcl: str
+    flags: tuple
+    emr: EMRBreakdown
+    life: PremiumLine
+    accident: PremiumLine
+    cir: PremiumLine
+    grand: float
+    n_active_conds: int
+
+    @classmethod
+    def from_dict(cls, r: dict) -> "UnderwritingResult":
+        rc = lambda c: RateClass(c["cls"], c["fac"]) if c else None
+        emr = EMRBreakdown(r["e_bmi"], r["e_fam"], tuple(r["h_brk"].items()), r["co_m"], r["e_health"],
+                           tuple(r["hab_brk"].items()), r["hab_c"], r["e_hab"])
+        return cls(r["A"], r["B"], r["EMR"], rc(r["LR"]), rc(r["CR"]), r["verdict"], r["dcl"],
+                   tuple(Flag.from_dict(f) for f in r["flags"]), emr, PremiumLine.from_dict(r["l_B"]),
+                   PremiumLine.from_dict(r["a_B"]), PremiumLine.from_dict(r["c_B"]), r["grand"], r["n_active_conds"])
+
+    def to_dict(self) -> dict:
+        rc = lambda c: {"cls": c.cls, "fac": c.fac} if c else None
+        e = self.emr
+        return {
+            "A": self.A, "B": self.B, "EMR": self.EMR, "LR": rc(self.LR), "CR": rc(self.CR),
+            "verdict": self.verdict, "dcl": self.dcl, "flags": [f.to_dict() for f in self.flags],
+            "e_bmi": e.e_bmi, "e_fam": e.e_fam, "h_brk": dict(e.health), "co_m": e.co_m,
+            "e_health": e.e_health, "hab_brk": dict(e.habits), "hab_c": e.hab_c, "e_hab": e.e_hab,
+            "l_B": self.life.to_dict(), "a_B": self.accident.to_dict(), "c_B": self.cir.to_dict(),
+            "grand": self.grand, "n_active_conds": self.n_active_conds,
+        }
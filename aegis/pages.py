@@ -0,0 +1,98 @@
+import hashlib
+import io
+from typing import NamedTuple, Optional
+
+from aegis.spool import PDF, pdf_stream
+
+# ─── PAGE-LEVEL RE-EXTRACTION ───────────────────────────────────
+# A revised proposal usually differs from the one already extracted by a page
+# or two. Each page is hashed on what it shows: its content stream, the images
+# it draws and its form field values. The model reports the page each field
+# was read from, and the extraction cache keeps those fields per page hash.
+# When a PDF misses the whole-document cache but most of its pages are known,
+# only the changed pages are sent. Their answer is merged over the fields
+# cached for the unchanged pages. pypdf is optional; without it, or for a PDF
+# it cannot read, every extraction covers the whole document.
+CHANGED_MAX = 0.5      # above this share of changed pages, the whole document is re-extracted
+
+def _digest(page) -> bytes:
+    h = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        h.update(contents.get_data())
+    res = page.get("/Resources")
+    xobjects = res.get_object().get("/XObject") if res is not None else None
+    for name, ref in sorted((xobjects.get_object() if xobjects is not None else {}).items()):
+        h.update(b"\0" + name.encode() + b"\0")
+        h.update(ref.get_object().get_data())
+    for annot in page.get("/Annots") or []:
+        a = annot.get_object()
+        parent = a.get("/Parent")
+        v = a.get("/V", parent.get_object().get("/V") if parent is not None else None)
+        h.update(repr((a.get("/T"), v, a.get("/AS"))).encode())
+    return h.digest()
+
+def page_keys(pdf: PDF, salt: str) -> list:
+    # One key per page: SHA-256 of the page content plus `salt` (the prompt, schema and model).
+    # [] when the PDF cannot be read page by page.
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(pdf_stream(pdf))
+        if reader.is_encrypted:
+            return []
+        digests = [_digest(p) for p in reader.pages]
+    except Exception:
+        return []
+    return [hashlib.sha256(d + b"\0" + salt.encode()).hexdigest() for d in digests]
+
+def page_subset(pdf: PDF, pages: list) -> bytes:
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_stream(pdf))
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+class PagePlan(NamedTuple):
+    keys: list          # cache key per page of the PDF
+    known: dict         # page index -> fields cached for that page
+    changed: list       # indexes of pages with nothing cached
+
+    @property
+    def incremental(self) -> bool:
+        return bool(self.known) and len(self.changed) <= CHANGED_MAX * len(self.keys)
+
+    def cached_fields(self) -> dict:
+        # Fields of the unchanged pages, in page order
+        out = {}
+        for i in sorted(self.known):
+            out.update(self.known[i])
+        return out
+
+    def summary(self) -> str:
+        return f"{len(self.changed)} of {len(self.keys)} pages changed"
+
+def plan_pages(pdf: PDF, cache, salt: str) -> Optional[PagePlan]:
+    keys = page_keys(pdf, salt)
+    if not keys:
+        return None
+    known = cache.get_pages(keys)
+    return PagePlan(keys, {i: known[k] for i, k in enumerate(keys) if k in known},
+                    [i for i, k in enumerate(keys) if k not in known])
+
+def fields_by_page(data: dict, sources: list, page_map: list, skip=()) -> dict:
+    # page index -> {field: value} from the model's [{"field", "page"}] attribution.
+    # page_map maps the 1-based pages of what was sent to pages of the PDF.
+    out = {}
+    for s in sources if isinstance(sources, list) else []:
+        try:
+            field, page = s["field"], int(s["page"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if field in data and field not in skip and 1 <= page <= len(page_map):
+            out.setdefault(page_map[page - 1], {})[field] = data[field]
+    return out
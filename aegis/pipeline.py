@@ -0,0 +1,194 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional
+
+from aegis.cache import ExtractionCache, cache_key
+from aegis.extract import (MODEL_NAME, PAGE_SALT, PROMPT_KEY, Document, extraction, get_client, remember_pages,
+                           template_data)
+from aegis.pages import plan_pages
+from aegis.metrics import count, record_stage, span
+from aegis.spool import BUDGET, PDF, MemoryBudget, SpooledPDF
+from aegis.templates import get_registry
+
+# ─── ASYNC EXTRACTION PIPELINE ──────────────────────────────────
+# Bulk extraction with a bounded number of in-flight requests, a token
+# bucket matched to the API quota, per-attempt timeouts and exponential
+# backoff on 429 / 5xx. The client is anything with
+# `async generate_async(pdf, prompt=..., schema=...) -> str`, so a stub can
+# stand in for Gemini. Follow-up requests for missing or invalid fields, and
+# changed-page requests for revised PDFs (extract.extraction), go through the
+# same rate limit and retries.
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+@dataclass
+class PipelineConfig:
+    workers: int = 8
+    rpm: float = 60.0            # requests per minute allowed by the API quota
+    burst: int = 4               # token bucket capacity
+    timeout: float = 120.0       # per attempt, seconds
+    max_attempts: int = 5
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: int):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)
+    if callable(code):
+        return False
+    return code in RETRYABLE_CODES
+
+def backoff_delay(attempt: int, cfg: PipelineConfig) -> float:
+    # Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]
+    return random.uniform(0, min(cfg.backoff_max, cfg.backoff_base * 2 ** attempt))
+
+class ExtractionPipeline:
+    def __init__(self, client=None, cfg: Optional[PipelineConfig] = None, cache: Optional[ExtractionCache] = None,
+                 triage: bool = True, templates: bool = True, budget: Optional[MemoryBudget] = None,
+                 pages: bool = True):
+        self.client = client or get_client()
+        self.cfg = cfg or PipelineConfig()
+        self.cache = cache
+        self.triage = triage
+        self.templates = templates
+        self.pages = pages
+        self.budget = budget or BUDGET
+        self.bucket = TokenBucket(self.cfg.rpm / 60.0, self.cfg.burst)
+        self.calls = self.retries = self.failures = self.local = self.follow_ups = 0
+        self.bytes_in = self.bytes_out = 0
+
+    async def extract(self, pdf: PDF) -> dict:
+        key = None
+        if self.cache is not None:
+            with span("extract.cache"):
+                key = cache_key(pdf, PROMPT_KEY, MODEL_NAME)
+                hit = await asyncio.to_thread(self.cache.get, key)
+            if hit is not None:
+                return hit
+
+        n = self.budget.cost(pdf)
+        record_stage("extract.queue", await self.budget.acquire_async(n))
+        try:
+            data, plan, found = await self._extract(pdf)
+        finally:
+            self.budget.release(n)
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, data)
+            await asyncio.to_thread(remember_pages, self.cache, plan, found)
+        return data
+
+    async def _extract(self, pdf: PDF) -> tuple:
+        # (proposal, page plan, fields per page) for one cache miss
+        if self.templates:
+            with span("extract.template"):
+                fast = await asyncio.to_thread(get_registry().extract, pdf)
+            data = template_data(fast)
+            if data is not None:
+                self.local += 1
+                return data, None, {}
+
+        plan = None
+        if self.cache is not None and self.pages:
+            with span("extract.pages"):
+                plan = await asyncio.to_thread(plan_pages, pdf, self.cache, PAGE_SALT)
+        self.bytes_in += len(pdf)
+        steps = extraction(Document(pdf, self.triage), plan)
+        first = True
+        try:
+            req = next(steps)
+            while True:
+                payload = await asyncio.to_thread(req.load)
+                if first:
+                    self.bytes_out += len(payload)      # the document or changed pages sent for the main request
+                else:
+                    self.follow_ups += 1
+                first = False
+                req = steps.send(await self._call(payload, *req.args))
+        except StopIteration as done:
+            data, found = done.value
+        return data, plan, found
+
+    async def _call(self, payload, *request) -> str:
+        # One model request (the full extraction, or a (prompt, schema) follow-up) with rate limit and retries
+        for attempt in range(self.cfg.max_attempts):
+            with span("extract.ratelimit"):
+                await self.bucket.acquire()
+            self.calls += 1
+            try:
+                with span("extract.model"):
+                    return await asyncio.wait_for(self.client.generate_async(payload, *request), self.cfg.timeout)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.cfg.max_attempts - 1:
+                    self.failures += 1
+                    count("aegis_extraction_failures_total", "Extractions whose model call failed")
+                    raise
+                self.retries += 1
+                count("aegis_extraction_retries_total", "Model calls retried after a transient error")
+                await asyncio.sleep(backoff_delay(attempt, self.cfg))
+
+    async def run(self, items: Iterable) -> AsyncIterator:
+        # items: (id, pdf | loader) pairs, pdf being bytes or a SpooledPDF (closed when done);
+        # yields (id, data, error) as each finishes
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+        done = asyncio.Queue()
+
+        async def worker():
+            while True:
+                try:
+                    item_id, payload = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                pdf = None
+                try:
+                    pdf = await asyncio.to_thread(payload) if callable(payload) else payload
+                    await done.put((item_id, await self.extract(pdf), None))
+                except Exception as e:
+                    await done.put((item_id, None, e))
+                finally:
+                    if isinstance(pdf, SpooledPDF):
+                        pdf.close()
+
+        remaining = queue.qsize()
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, self.cfg.workers))]
+        try:
+            for _ in range(remaining):
+                yield await done.get()
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "failures": self.failures, "local": self.local,
+                "follow_ups": self.follow_ups,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+async def extract_all(items: Iterable, client=None, cfg: Optional[PipelineConfig] = None,
+                      cache: Optional[ExtractionCache] = None, triage: bool = True,
+                      templates: bool = True) -> list:
+    pipeline = ExtractionPipeline(client, cfg, cache, triage, templates)
+    return [r async for r in pipeline.run(items)]
@@ -0,0 +1,81 @@
+from datetime import date
+
+from aegis import engine
+from aegis.engine import (calc_bmi, lookup_bmi_points, proposal_age, health_component, habit_component,
+                          rating_classes, verdict_for, occupation_extra, priced_card, life_line, accident_line, cir_line)
+
+# ─── INCREMENTAL PREVIEW ────────────────────────────────────────
+# compute_underwriting as a dependency graph over the same components, so a
+# field edit only re-evaluates the nodes downstream of it. Propagation stops
+# early when a node's value comes out unchanged (e.g. a weight edit that
+# keeps BMI in the same band leaves EMR and every premium line untouched).
+# "tables" is the rating table version: a table swap re-evaluates every lookup.
+INPUTS = ["today", "tables", "dob", "height_cm", "weight_kg", "parent_health_status", "health_conditions", "habits",
+          "risky_occupations", "base_cover", "cir_cover", "accident_cover"]
+
+# (node, dependencies, fn(*dependency values)) in topological order
+NODES = [
+    ("A", ["dob", "today"], lambda dob, today: proposal_age(dob)),
+    ("B", ["height_cm", "weight_kg"], lambda h, w: calc_bmi(w, h)),
+    ("e_bmi", ["B", "tables"], lambda b, _: lookup_bmi_points(b)),
+    ("e_fam", ["parent_health_status", "tables"], lambda s, _: engine.FAM_E.get(s or "", 0)),
+    ("health", ["health_conditions", "tables"], lambda c, _: health_component(c)),
+    ("habit", ["habits", "tables"], lambda h, _: habit_component(h)),
+    ("EMR", ["e_bmi", "e_fam", "health", "habit"], lambda b, f, h, hb: b + f + h[2] + hb[2]),
+    ("classes", ["EMR", "tables"], lambda e, _: rating_classes(e)),
+    ("verdict", ["A", "EMR"], verdict_for),
+    ("occ_pm", ["risky_occupations", "tables"], lambda o, _: occupation_extra(o)),
+    ("card", ["A", "classes", "tables"], lambda A, c, _: priced_card(A, c[0], c[1])),
+    ("l_B", ["card", "base_cover", "occ_pm"], lambda card, cover, occ: life_line(card, cover or 0, occ)),
+    ("a_B", ["card", "accident_cover", "occ_pm"], lambda card, cover, occ: accident_line(card, cover or 0, occ)),
+    ("c_B", ["card", "A", "EMR", "cir_cover"], lambda card, A, EMR, cover: cir_line(card, A, EMR, cover or 0)),
+    ("grand", ["l_B", "a_B", "c_B"], lambda l, a, c: l.get("total", 0.0) + a.get("total", 0.0) + c.get("total", 0.0)),
+]
+
+_MISSING = object()
+
+def _freeze(v):
+    # Inputs are snapshotted so later mutation of the caller's dicts can't leak in
+    if isinstance(v, dict):
+        return dict(v)
+    if isinstance(v, list):
+        return list(v)
+    return v
+
+class IncrementalRater:
+    def __init__(self):
+        self.values = {}
+        self.evaluated = []
+
+    def update(self, d: dict, today: date = None) -> set:
+        changed = set()
+        inputs = dict(d, today=today or date.today(), tables=engine.TABLES_VERSION)
+        for k in INPUTS:
+            v = inputs.get(k)
+            if self.values.get(k, _MISSING) != v:
+                self.values[k] = _freeze(v)
+                changed.add(k)
+
+        self.evaluated = []
+        for name, deps, fn in NODES:
+            if name in self.values and not changed.intersection(deps):
+                continue
+            new = fn(*[self.values[x] for x in deps])
+            self.evaluated.append(name)
+            if self.values.get(name, _MISSING) != new:
+                self.values[name] = new
+                changed.add(name)
+        return changed
+
+    def snapshot(self) -> dict:
+        v = self.values
+        h_brk, co_m, e_health, n_conds = v["health"]
+        hab_brk, hab_c, e_hab = v["habit"]
+        _, _, LR, CR = v["classes"]
+        verdict, dcl = v["verdict"]
+        return {
+            "A": v["A"], "B": v["B"], "EMR": v["EMR"], "LR": LR, "CR": CR, "verdict": verdict, "dcl": dcl,
+            "e_bmi": v["e_bmi"], "e_fam": v["e_fam"], "h_brk": h_brk, "co_m": co_m, "e_health": e_health,
+            "hab_brk": hab_brk, "hab_c": hab_c, "e_hab": e_hab,
+            "l_B": v["l_B"], "a_B": v["a_B"], "c_B": v["c_B"], "grand": v["grand"], "n_active_conds": n_conds,
+        }
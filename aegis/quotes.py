@@ -0,0 +1,271 @@
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from aegis.cache import DEFAULT_DIR
+from aegis.metrics import count, record_stage
+
+# ─── QUOTE NUMBERS ──────────────────────────────────────────────
+# PQ-<year>-<12 chars>: milliseconds since 2024 (40 bits) then 20 random bits,
+# in Crockford base32. Numbers sort by issue time and need no central counter,
+# so separate processes can issue them without coordinating. Within a process,
+# numbers issued in the same millisecond step the random part instead of
+# redrawing it, so they cannot collide.
+_B32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_EPOCH_MS = 1704067200000      # 2024-01-01T00:00:00Z
+_last = [0]
+_last_lock = threading.Lock()
+
+def new_quote_no(now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    n = ((int(now * 1000) - _EPOCH_MS) & (2 ** 40 - 1)) << 20 | secrets.randbits(20)
+    with _last_lock:
+        if n >> 20 <= _last[0] >> 20:
+            n = _last[0] + 1
+        _last[0] = n
+    body = "".join(_B32[(n >> s) & 31] for s in range(55, -1, -5))
+    return f"PQ-{datetime.fromtimestamp(now).year}-{body}"
+
+def name_key(name: str) -> str:
+    # Lookup form of an applicant name: case and spacing ignored
+    return " ".join((name or "").lower().split())
+
+# ─── QUOTE STORE ────────────────────────────────────────────────
+# Append-only SQLite table (WAL mode) of every computed quote: the proposal,
+# the result and the rating-table version used. save() only queues the row. A
+# background thread writes queued rows in batches of up to `batch`, one
+# transaction each, so callers never wait on disk. Rows can be read once the
+# writer has flushed them; flush() waits for that. Triggers reject UPDATE and
+# DELETE, so a stored quote is never rewritten: re-rating under revised tables
+# appends a new quote that names the one it supersedes. If the writer cannot
+# open the store or dies on an unexpected error, it records the error, drops
+# what is queued, and save() / flush() raise RuntimeError from then on rather
+# than queueing or waiting forever.
+DEFAULT_PATH = os.environ.get("AEGIS_QUOTE_DB") or str(Path(DEFAULT_DIR) / "quotes.sqlite")
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS quotes (quote_no TEXT PRIMARY KEY, created REAL NOT NULL, "
+    "name TEXT NOT NULL, name_key TEXT NOT NULL, dob TEXT NOT NULL, decision TEXT NOT NULL, "
+    "grand REAL NOT NULL, tables TEXT NOT NULL, source TEXT NOT NULL, proposal TEXT NOT NULL, result TEXT NOT NULL, "
+    "supersedes TEXT)",
+    "CREATE INDEX IF NOT EXISTS quotes_applicant ON quotes(name_key, dob, created)",
+    "CREATE INDEX IF NOT EXISTS quotes_created ON quotes(created)",
+    "CREATE INDEX IF NOT EXISTS quotes_supersedes ON quotes(supersedes)",
+    # Re-rating selects by table version and the rated age / BMI / EMR (aegis/rerate.py)
+    "CREATE INDEX IF NOT EXISTS quotes_age ON quotes(tables, json_extract(result, '$.A'))",
+    "CREATE INDEX IF NOT EXISTS quotes_bmi ON quotes(tables, json_extract(result, '$.B'))",
+    "CREATE INDEX IF NOT EXISTS quotes_emr ON quotes(tables, json_extract(result, '$.EMR'))",
+    "CREATE TRIGGER IF NOT EXISTS quotes_no_update BEFORE UPDATE ON quotes "
+    "BEGIN SELECT RAISE(ABORT, 'quotes are append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS quotes_no_delete BEFORE DELETE ON quotes "
+    "BEGIN SELECT RAISE(ABORT, 'quotes are append-only'); END",
+]
+COLUMNS = ["quote_no", "created", "name", "dob", "decision", "grand", "tables", "source", "proposal", "result",
+           "supersedes"]
+# Columns added since the first schema, for stores created before them
+MIGRATIONS = {"supersedes": "ALTER TABLE quotes ADD COLUMN supersedes TEXT"}
+
+def _ts(v, end: bool = False) -> Optional[float]:
+    # date / datetime / ISO string / epoch seconds -> epoch seconds. A bare date
+    # as an end bound covers that whole day.
+    if v is None or isinstance(v, (int, float)):
+        return v
+    if isinstance(v, str):
+        v = datetime.fromisoformat(v) if len(v) > 10 else date.fromisoformat(v)
+    if not isinstance(v, datetime):
+        v = datetime(v.year, v.month, v.day) + timedelta(days=1 if end else 0)
+    return v.timestamp()
+
+class QuoteStore:
+    def __init__(self, path=DEFAULT_PATH, batch: int = 256, linger: float = 0.05):
+        self.path = Path(path)
+        self.batch = batch
+        self.linger = linger            # seconds to wait for more rows before writing a batch
+        self.written = self.batches = self.errors = 0
+        self.failed: Optional[BaseException] = None     # why the writer stopped
+        self._q = queue.Queue()
+        self._lock = threading.Lock()   # guards the read connection
+        self._db = None
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(SCHEMA[0])
+        have = {r[1] for r in db.execute("PRAGMA table_info(quotes)")}
+        for col, stmt in MIGRATIONS.items():
+            if col not in have:
+                db.execute(stmt)
+        for stmt in SCHEMA[1:]:
+            db.execute(stmt)
+        return db
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    # ── writing ──
+    def save(self, quote_no: str, proposal: dict, result: dict, source: str = "app",
+             tables: Optional[str] = None, created: Optional[float] = None, supersedes: Optional[str] = None):
+        if tables is None:
+            from aegis.engine import TABLES_VERSION
+            tables = TABLES_VERSION
+        # The dicts are serialised on the writer thread: do not mutate them after saving
+        self._check()
+        self._start()
+        self._q.put((quote_no, time.time() if created is None else created, tables, source, proposal, result, supersedes))
+
+    def _start(self):
+        if self._writer is None:
+            with self._start_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._loop, daemon=True, name="quote-writer")
+                    self._writer.start()
+
+    def _check(self):
+        if self.failed is not None:
+            self._drain()
+            raise RuntimeError(f"quote store {self.path} is not writable: {self.failed!r}")
+
+    def _drain(self):
+        # Queued quotes the stopped writer will never take
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                return
+            self.errors += 1
+            self._q.task_done()
+
+    def _loop(self):
+        try:
+            self._run(self._connect())
+        except Exception as e:
+            self.failed = e
+            count("aegis_quote_writer_failures_total", "Quote store writers stopped by an error")
+            self._drain()
+
+    def _run(self, db: sqlite3.Connection):
+        while True:
+            items = [self._q.get()]
+            deadline = time.monotonic() + self.linger
+            while len(items) < self.batch:
+                left = deadline - time.monotonic()
+                try:
+                    items.append(self._q.get(timeout=left) if left > 0 else self._q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                rows = []
+                for it in items:
+                    try:
+                        rows.append(self._row(*it))
+                    except Exception:
+                        self.errors += 1      # unserialisable quote: skipped, the writer keeps running
+                if rows:
+                    self._write(db, rows)
+            except Exception:
+                self.errors += len(items)
+                raise
+            finally:
+                for _ in items:
+                    self._q.task_done()
+
+    @staticmethod
+    def _row(quote_no, created, tables, source, proposal: dict, result: dict, supersedes=None) -> tuple:
+        return (quote_no, created, proposal.get("name") or "", name_key(proposal.get("name")),
+                str(proposal.get("dob") or ""), result["dcl"], result["grand"], tables, source,
+                json.dumps(proposal, default=str), json.dumps(result, default=str), supersedes)
+
+    def _write(self, db: sqlite3.Connection, rows: list):
+        t0 = time.perf_counter()
+        try:
+            db.execute("BEGIN")
+            n = db.executemany("INSERT OR IGNORE INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+            db.execute("COMMIT")
+            self.written += n
+            self.errors += len(rows) - n      # quote number already stored
+            self.batches += 1
+            count("aegis_quotes_written_total", "Quotes persisted to the quote store", n)
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            self.errors += len(rows)
+            count("aegis_quote_write_errors_total", "Quotes the store failed to persist", len(rows))
+        record_stage("quotes.write", time.perf_counter() - t0)
+
+    def flush(self, timeout: Optional[float] = None):
+        # Blocks until every queued quote has been written. Raises RuntimeError if the
+        # writer has stopped, TimeoutError if `timeout` seconds pass first.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = self._q.all_tasks_done
+        with done:
+            while self._q.unfinished_tasks and self.failed is None:
+                left = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+                if left <= 0:
+                    raise TimeoutError(f"{self._q.unfinished_tasks} quotes still queued after {timeout}s")
+                done.wait(left)
+        self._check()
+
+    # ── reading ──
+    def _select(self, where: str, args: tuple, limit: Optional[int] = None) -> list:
+        sql = f"SELECT {', '.join(COLUMNS)} FROM quotes WHERE {where} ORDER BY created DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn().execute(sql, args).fetchall()
+        out = []
+        for r in rows:
+            q = dict(zip(COLUMNS, r))
+            q["proposal"], q["result"] = json.loads(q["proposal"]), json.loads(q["result"])
+            out.append(q)
+        return out
+
+    def get(self, quote_no: str) -> Optional[dict]:
+        rows = self._select("quote_no = ?", (quote_no,))
+        return rows[0] if rows else None
+
+    def find(self, name: Optional[str] = None, dob=None, since=None, until=None, limit: int = 100) -> list:
+        # Newest first. name matches whole names (case-insensitive); since / until bound the quote time,
+        # until being exclusive except for a bare date
+        where, args = [], []
+        if name is not None:
+            where.append("name_key = ?")
+            args.append(name_key(name))
+        if dob is not None:
+            where.append("dob = ?")
+            args.append(dob.isoformat() if isinstance(dob, date) else str(dob))
+        if since is not None:
+            where.append("created >= ?")
+            args.append(_ts(since))
+        if until is not None:
+            where.append("created < ?")
+            args.append(_ts(until, end=True))
+        return self._select(" AND ".join(where) or "1", tuple(args), limit)
+
+    def select(self, where: str, args: tuple = (), limit: Optional[int] = None) -> list:
+        # Quotes matching an SQL condition over the quotes columns, newest first
+        return self._select(where, args, limit)
+
+    def versions(self) -> dict:
+        # rating table version -> number of quotes rated with it
+        with self._lock:
+            return dict(self._conn().execute("SELECT tables, COUNT(*) FROM quotes GROUP BY tables").fetchall())
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self._conn().execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+        return {"quotes": n, "pending": self._q.qsize(), "written": self.written,
+                "batches": self.batches, "errors": self.errors,
+                **({"failed": repr(self.failed)} if self.failed is not None else {})}
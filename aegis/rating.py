@@ -0,0 +1,78 @@
+from bisect import bisect_left
+from typing import NamedTuple, Optional
+
+# ─── COMPILED RATING TABLES ─────────────────────────────────────
+# Rating tables are written as inclusive bands (lo, hi, *values) laid out on
+# a fixed grid (`step`): BMI and ages in 1s, life EMR in 5s. A value matches
+# band i when lo[i] <= x <= hi[i], exactly as the linear scans did; a value
+# between two bands (BMI 18.5, EMR 37.5, or integer EMR 36-39 on the L_RAT
+# grid) or outside the table matches none and takes the lookup's default.
+# Compiling raises on a real gap, where a band does not start one grid step
+# after the previous one ends, and on overlaps.
+class BandIndex:
+    def __init__(self, name: str, rows: list, step: float = 1, dense: bool = False):
+        if not rows:
+            raise ValueError(f"{name}: table is empty")
+        for i, row in enumerate(rows):
+            lo, hi = row[0], row[1]
+            if lo > hi:
+                raise ValueError(f"{name}: band {row} has lo > hi")
+            if i:
+                prev = rows[i - 1]
+                if lo <= prev[1]:
+                    raise ValueError(f"{name}: band {row} overlaps {prev}")
+                if lo != prev[1] + step:
+                    raise ValueError(f"{name}: gap between {prev} and {row} (expected next band to start at {prev[1] + step})")
+        self.name = name
+        self.rows = [tuple(r) for r in rows]
+        self.los = [r[0] for r in rows]
+        self.his = [r[1] for r in rows]
+        self.lo, self.hi = self.los[0], self.his[-1]
+        # Integer-keyed tables (ages) also get a direct array index
+        self._dense = [self._bisect(x) for x in range(self.lo, self.hi + 1)] if dense else None
+
+    def _bisect(self, x) -> int:
+        if x < self.lo or x > self.hi:
+            return -1
+        i = bisect_left(self.his, x)
+        return i if self.los[i] <= x else -1
+
+    def index(self, x) -> int:
+        if self._dense is not None and isinstance(x, int):
+            return self._dense[x - self.lo] if self.lo <= x <= self.hi else -1
+        return self._bisect(x)
+
+    def values(self, x) -> Optional[tuple]:
+        i = self.index(x)
+        return self.rows[i][2:] if i >= 0 else None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+class Rates(NamedTuple):
+    life: float
+    life_fac: float
+    life_cls: Optional[str]
+    acc: float
+    cir: Optional[float]
+    cir_fac: float
+    cir_cls: Optional[str]
+
+class RateCard:
+    # Every insurable age × life class × CIR class, precomputed so a
+    # premium is one list lookup. Class index -1 (no class) is slot 0.
+    def __init__(self, premiums: BandIndex, life: BandIndex, cir: BandIndex):
+        if not isinstance(premiums.lo, int) or not isinstance(premiums.hi, int):
+            raise ValueError(f"{premiums.name}: rate card needs integer ages")
+        self.age_min, self.age_max = premiums.lo, premiums.hi
+        life_cls = [(None, 0)] + [(r[2], r[3]) for r in life.rows]
+        cir_cls = [(None, 0)] + [(r[2], r[3]) for r in cir.rows]
+        self.cells = []
+        for age in range(self.age_min, self.age_max + 1):
+            lr, ar, cr = premiums.values(age)
+            self.cells.append([[Rates(lr, lf, lc, ar, cr, cf, cc) for cc, cf in cir_cls] for lc, lf in life_cls])
+
+    def get(self, age: int, life_idx: int, cir_idx: int) -> Optional[Rates]:
+        if not self.age_min <= age <= self.age_max:
+            return None
+        return self.cells[age - self.age_min][life_idx + 1][cir_idx + 1]
@@ -0,0 +1,166 @@
+import html
+from datetime import date
+from functools import lru_cache
+
+from aegis.engine import CL, HL, fmt_inr, fmt_pts
+from aegis.flags import trace_text
+from aegis.models import Proposal, UnderwritingResult
+
+# ─── RESULTS HTML ───────────────────────────────────────────────
+# HTML for the step 4 results page, built once per distinct result and
+# cached. Each panel is a single payload so the page needs a handful of
+# st.markdown calls instead of one per row, card and flag.
+ICO = {"standard": "✅", "loading": "⚡", "decline": "🚫"}
+DCL_COLOR = {"standard": "#1a9455", "loading": "#cc7a00", "decline": "#d93251"}
+FLAG_ICO = {"DECLINE": "🔴", "MANUAL_UW": "🟠", "WARNING": "🟡", "INFO": "🔵"}
+FLAG_COLOR = {"DECLINE": "#d93251", "MANUAL_UW": "#cc7a00", "WARNING": "#c88a00", "INFO": "#2b76cc"}
+MONO = "font-family:'JetBrains Mono',monospace;color:#c88a00;"
+
+def panel_title(text: str) -> str:
+    return f'<div style="font-weight:600;font-size:14px;margin-bottom:10px;color:#1a2236;">{text}</div>'
+
+def summary_html(r: dict, name: str) -> str:
+    dcl_color = DCL_COLOR[r["dcl"]]
+    emr_color = "#d93251" if r["EMR"] > 175 else "#cc7a00" if r["EMR"] > 85 else "#1a9455"
+    flags_color = "#cc7a00" if r["flags"] else "#1a9455"
+    has_decline = any(f["s"] == "DECLINE" for f in r["flags"])
+    flag_sub = "Includes DECLINE" if has_decline else (f"{len(r['flags'])} issues" if r["flags"] else "All clear")
+    lr, cr, cB = r["LR"], r["CR"], r["c_B"]
+    metrics = [
+        ("Total EMR", f"{r['EMR']:.1f}", "Mortality Points", emr_color),
+        ("Life Class", f"Class {lr['cls']}" if lr else "Std", f"Factor × {lr['fac'] if lr else '—'}", "#1a2236"),
+        ("CIR Class", "N/A" if cB.get("declined") else (f"Class {cr['cls']}" if cr else "Std"), "Declined" if cB.get("declined") else f"Factor × {cr['fac'] if cr else '—'}", "#1a2236"),
+        ("Active Conditions", str(r["n_active_conds"]), "of 5 declared", "#d93251" if r["n_active_conds"] >= 3 else "#1a2236"),
+        ("UW Flags", str(len(r["flags"])), flag_sub, flags_color),
+    ]
+    cards = "".join(f'<div class="metric-card"><div class="metric-label">{label}</div><div class="metric-value" style="color:{color};">{val}</div><div class="metric-sub">{sub}</div></div>'
+                    for label, val, sub, color in metrics)
+    return f"""
+    <div class="decision-card {r['dcl']}">
+      <div style="font-size:52px;">{ICO[r['dcl']]}</div>
+      <div>
+        <div style="font-family:'Syne',sans-serif;font-size:28px;font-weight:800;color:{dcl_color};">{r['verdict']}</div>
+        <div style="font-size:14px;color:#1a2236;opacity:.8;margin-top:4px;">
+          {name} &nbsp;·&nbsp; Age {r['A']} &nbsp;·&nbsp; BMI {r['B']} &nbsp;·&nbsp;
+          Total EMR: <strong>{r['EMR']:.1f} pts</strong>
+        </div>
+      </div>
+    </div>
+    <div style="display:grid;grid-template-columns:repeat(5,1fr);gap:16px;margin-bottom:24px;">{cards}</div>
+    """
+
+def emr_html(r: dict) -> str:
+    rows_html = ""
+    bmi_color = "pos-pt" if r["e_bmi"] > 0 else "neg-pt" if r["e_bmi"] < 0 else "neu-pt"
+    rows_html += f'<div class="emr-row"><span>BMI Loading ({r["B"]})</span><span class="ep {bmi_color}">{fmt_pts(r["e_bmi"])}</span></div>'
+
+    fam_color = "pos-pt" if r["e_fam"] > 0 else "neg-pt" if r["e_fam"] < 0 else "neu-pt"
+    rows_html += f'<div class="emr-row"><span>Family History</span><span class="ep {fam_color}">{fmt_pts(r["e_fam"])}</span></div>'
+
+    rows_html += '<div class="emr-row" style="padding-bottom:0;border-bottom:none;"><span><strong>Health Conditions</strong></span></div>'
+    for c, pts in r["h_brk"].items():
+        if pts != 0:
+            rows_html += f'<div class="emr-row emr-sub" style="padding-left:16px;opacity:.8;"><span>{CL.get(c,c)}</span><span class="ep pos-pt">{fmt_pts(pts)}</span></div>'
+    if r["co_m"] > 0:
+        rows_html += f'<div class="emr-row" style="padding-left:16px;font-style:italic;"><span>↳ Co-morbidity extra</span><span class="ep pos-pt">{fmt_pts(r["co_m"])}</span></div>'
+
+    rows_html += '<div class="emr-row" style="padding-bottom:0;border-bottom:none;margin-top:6px;"><span><strong>Personal Habits</strong></span></div>'
+    for h, pts in r["hab_brk"].items():
+        if pts != 0:
+            rows_html += f'<div class="emr-row" style="padding-left:16px;opacity:.8;"><span>{HL.get(h,h)}</span><span class="ep pos-pt">{fmt_pts(pts)}</span></div>'
+    if r["hab_c"] > 0:
+        rows_html += f'<div class="emr-row" style="padding-left:16px;font-style:italic;"><span>↳ Co-existence extra</span><span class="ep pos-pt">{fmt_pts(r["hab_c"])}</span></div>'
+
+    emr_c = "#d93251" if r["EMR"] > 175 else "#cc7a00" if r["EMR"] > 85 else "#008f7c"
+    rows_html += f'<div class="emr-row" style="border-top:2px solid #dce3ee;margin-top:8px;padding-top:12px;font-weight:700;"><span>TOTAL EMR</span><span class="ep" style="font-size:16px;font-weight:700;color:{emr_c};">{fmt_pts(r["EMR"])}</span></div>'
+
+    return panel_title("📊 EMR Breakdown") + f'<div style="background:#f8f9fc;border:1px solid #dce3ee;border-radius:6px;padding:16px 18px;">{rows_html}</div>'
+
+def trace_html(f: dict) -> str:
+    # The rule, predicate and facts that raised the flag
+    if not f.get("trace"):
+        return ""
+    return (f'<div style="font-family:\'JetBrains Mono\',monospace;font-size:10px;color:#6b7fa3;margin-top:2px;">'
+            f'{html.escape(trace_text(f["trace"]))}</div>')
+
+def flags_html(r: dict) -> str:
+    if not r["flags"]:
+        return panel_title("🚩 UW Flags & Edge Cases") + '<div style="color:#6b7fa3;font-size:13px;padding:8px 0;">No underwriting flags raised.</div>'
+    items = "".join(f"""
+    <div class="flag-item flag-{f['s']}">
+      <div style="font-size:16px;flex-shrink:0;">{FLAG_ICO.get(f['s'],'⚪')}</div>
+      <div>
+        <div style="font-family:'JetBrains Mono',monospace;font-size:9px;letter-spacing:1px;text-transform:uppercase;color:{FLAG_COLOR.get(f['s'], '#6b7fa3')};margin-bottom:2px;">{f['s']}</div>
+        <div style="font-size:12px;">{f['m']}</div>
+        {trace_html(f)}
+      </div>
+    </div>""" for f in r["flags"])
+    return panel_title("🚩 UW Flags & Edge Cases") + items
+
+def premium_html(r: dict, covers: dict) -> str:
+    lB, aB, cB = r["l_B"], r["a_B"], r["c_B"]
+    out = panel_title("💰 Premium Breakdown")
+    if lB.get("total"):
+        out += f"""
+    <div class="prem-block">
+      <div class="prem-head"><span>🏦 Life Insurance (Term)</span><span style="color:#6b7fa3;">{fmt_inr(covers.get('base_cover',0))}</span></div>
+      <div class="prem-line"><span>Base (₹{lB['rate']}/mille)</span><span style="{MONO}">{fmt_inr(lB['base'])}</span></div>
+      <div class="prem-line"><span>Class {lB.get('cls','—')}, loading</span><span style="{MONO}">{fmt_inr(lB['load'])}</span></div>
+      <div class="prem-line"><span>Occupational extra</span><span style="{MONO}">{fmt_inr(lB['occ'])}</span></div>
+      <div class="prem-line prem-total"><span>Life Total</span><span style="{MONO}">{fmt_inr(lB['total'])}</span></div>
+    </div>"""
+    if aB.get("total"):
+        out += f"""
+    <div class="prem-block">
+      <div class="prem-head"><span>🚑 Accident Rider</span><span style="color:#6b7fa3;">{fmt_inr(covers.get('accident_cover',0))}</span></div>
+      <div class="prem-line"><span>Base (₹{aB['rate']}/mille)</span><span style="{MONO}">{fmt_inr(aB['base'])}</span></div>
+      <div class="prem-line"><span>Occupational extra</span><span style="{MONO}">{fmt_inr(aB['occ'])}</span></div>
+      <div class="prem-line prem-total"><span>Accident Total</span><span style="{MONO}">{fmt_inr(aB['total'])}</span></div>
+    </div>"""
+    if cB.get("declined"):
+        out += f"""
+    <div class="prem-block">
+      <div class="prem-head"><span>🏥 CIR</span></div>
+      <div class="prem-line" style="color:#d93251;font-style:italic;">⚠️ {cB['reason']}</div>
+    </div>"""
+    elif cB.get("total"):
+        out += f"""
+    <div class="prem-block">
+      <div class="prem-head"><span>🏥 Critical Illness Rider</span><span style="color:#6b7fa3;">{fmt_inr(covers.get('cir_cover',0))}</span></div>
+      <div class="prem-line"><span>Base (₹{cB['rate']}/mille)</span><span style="{MONO}">{fmt_inr(cB['base'])}</span></div>
+      <div class="prem-line"><span>Class {cB.get('cls','—')}, loading</span><span style="{MONO}">{fmt_inr(cB['load'])}</span></div>
+      <div class="prem-line prem-total"><span>CIR Total</span><span style="{MONO}">{fmt_inr(cB['total'])}</span></div>
+    </div>"""
+    return out
+
+def grand_html(r: dict, name: str, today_str: str) -> str:
+    return f"""
+    <div class="grand-total">
+      <div>
+        <div class="gt-name">{name}</div>
+        <div class="gt-label">Grand Total Annual Premium</div>
+      </div>
+      <div>
+        <div class="gt-amount">{fmt_inr(r['grand'])}</div>
+        <div class="gt-sub">per annum · all covers · {today_str}</div>
+      </div>
+    </div>
+    <div style='margin-top:24px;'></div>
+    """
+
+@lru_cache(maxsize=512)
+def _render(r: UnderwritingResult, name: str, covers: tuple, today_str: str) -> dict:
+    rd = r.to_dict()
+    return {
+        "summary": summary_html(rd, name),
+        "emr": emr_html(rd),
+        "flags": flags_html(rd),
+        "premium": premium_html(rd, dict(covers)),
+        "grand": grand_html(rd, name, today_str),
+    }
+
+def results_html(r: UnderwritingResult, p: Proposal, today: date = None) -> dict:
+    # The models are frozen and hashable, so they key the cache directly
+    today_str = (today or date.today()).strftime("%-d %b %Y")
+    covers = (("base_cover", p.base_cover), ("accident_cover", p.accident_cover), ("cir_cover", p.cir_cover))
+    return _render(r, p.name, covers, today_str)
@@ -0,0 +1,124 @@
+import json
+import time
+from typing import Optional
+
+import numpy as np
+
+from aegis import engine
+from aegis.batch import batch_row, compute_underwriting_batch, proposals_to_columns
+from aegis.quotes import QuoteStore, new_quote_no
+from aegis.tables import Change, RatingTables, archive, diff_tables
+
+# ─── RE-RATING ──────────────────────────────────────────────────
+# Brings stored quotes up to the active rating tables. For each older table
+# version in the store, diff_tables() says which rows changed, and each change
+# becomes an SQL condition on the stored quote: the rated age / BMI / EMR for
+# band tables, the proposal inputs for keyed tables. Only quotes matching one
+# of them are re-rated (batch engine, at the age and BMI they were rated at),
+# and only those whose result actually changed are appended to the store as
+# new quotes superseding the old. A version whose table file is no longer
+# available cannot be diffed, so all of its quotes are re-rated.
+BAND_SQL = {"A": "json_extract(result, '$.A')", "B": "json_extract(result, '$.B')",
+            "EMR": "json_extract(result, '$.EMR')"}
+
+def _in(expr: str, values) -> tuple:
+    values = list(values)
+    return f"{expr} IN ({', '.join('?' * len(values))})", tuple(values)
+
+def _count(expr: str, k: int) -> tuple:
+    # CO_M / HAB_C key 3 covers three or more
+    return (f"{expr} >= ?" if k == 3 else f"{expr} = ?"), (k,)
+
+def change_sql(c: Change) -> tuple:
+    # (condition, args) matching the stored quotes a Change can affect
+    if c.field in BAND_SQL:
+        x, parts, args = BAND_SQL[c.field], [], []
+        for lo, hi, li, hi_i in c.match:
+            parts.append(f"({x} {'>=' if li else '>'} ? AND {x} {'<=' if hi_i else '<'} ?)")
+            args += [lo, hi]
+        return " OR ".join(parts), tuple(args)
+    if c.field == "family":
+        return _in("json_extract(proposal, '$.parent_health_status')", c.match)
+    if c.field == "condition":
+        parts, args = [], []
+        for cond, sev in c.match:
+            parts.append(f"CAST(json_extract(proposal, '$.health_conditions.\"{cond}\"') AS INTEGER) = ?")
+            args.append(sev)
+        return " OR ".join(parts), tuple(args)
+    if c.field == "habit":
+        parts, args = [], []
+        for h, lvl in c.match:
+            parts.append(f"json_extract(proposal, '$.habits.\"{h}\"') = ?")
+            args.append(lvl)
+        return " OR ".join(parts), tuple(args)
+    if c.field == "conditions":
+        sql = [_count("json_extract(result, '$.n_active_conds')", k) for k in c.match]
+    elif c.field == "habits":
+        sql = [_count("(SELECT COUNT(*) FROM json_each(result, '$.hab_brk') WHERE value > 0)", k) for k in c.match]
+    elif c.field == "occupation":
+        cond, args = _in("value", c.match)
+        return f"EXISTS (SELECT 1 FROM json_each(proposal, '$.risky_occupations') WHERE {cond})", args
+    else:
+        raise ValueError(f"no SQL for table change on {c.field!r}")
+    return " OR ".join(s for s, _ in sql), tuple(a for _, args in sql for a in args)
+
+def affected_sql(changes: list) -> tuple:
+    parts = [change_sql(c) for c in changes]
+    return " OR ".join(f"({s})" for s, _ in parts) or "0", tuple(a for _, args in parts for a in args)
+
+def _untraced(r: dict) -> dict:
+    return {**r, "flags": [{"s": f["s"], "m": f["m"]} for f in r.get("flags", [])]}
+
+def _same(stored: dict, result: dict) -> bool:
+    # Compared as stored: the batch engine gives floats where the scalar one gave ints (5.0 == 5).
+    # Flag traces are left out, so quotes stored before flags carried them are not re-saved for that alone.
+    return _untraced(json.loads(json.dumps(result, default=str))) == _untraced(stored)
+
+def rerate_quotes(quotes: list, tables: RatingTables) -> list:
+    # New results for stored quotes, at the age and BMI they were rated at
+    if not quotes:
+        return []
+    cols = proposals_to_columns([q["proposal"] for q in quotes])
+    cols["age"] = np.asarray([q["result"]["A"] for q in quotes], dtype=np.int64)
+    cols["bmi"] = np.asarray([q["result"]["B"] for q in quotes], dtype=np.float64)
+    res = compute_underwriting_batch(cols, tables=tables)
+    return [batch_row(res, i) for i in range(len(quotes))]
+
+def rerate(store: QuoteStore, tables: Optional[RatingTables] = None, dry_run: bool = False,
+           chunk: int = 2000, log=None) -> dict:
+    # version -> {label, quotes, examined, changed, changes}; changed quotes are saved unless dry_run
+    log = log or (lambda msg: None)
+    new = tables or engine.TABLES
+    known = archive()
+    report = {}
+    for version, n in sorted(store.versions().items()):
+        if version == new.version:
+            continue
+        t0 = time.perf_counter()
+        old = known.get(version)
+        changes = diff_tables(old, new) if old else None
+        if changes is None:
+            where, args = "1", ()
+        else:
+            where, args = affected_sql(changes)
+        # Quotes already superseded were re-rated before; their successors are examined instead
+        quotes = store.select(f"tables = ? AND NOT EXISTS (SELECT 1 FROM quotes s WHERE s.supersedes = quotes.quote_no) "
+                              f"AND ({where})", (version, *args))
+        changed = 0
+        for i in range(0, len(quotes), chunk):
+            part = quotes[i:i + chunk]
+            for q, r in zip(part, rerate_quotes(part, new)):
+                if _same(q["result"], r):
+                    continue
+                changed += 1
+                if not dry_run:
+                    store.save(new_quote_no(), q["proposal"], r, source="rerate", tables=new.version,
+                               supersedes=q["quote_no"])
+        report[version] = {"label": old.label if old else "", "quotes": n, "examined": len(quotes),
+                           "changed": changed,
+                           "changes": [c.describe() for c in changes] if changes is not None else ["table file not found: all quotes"]}
+        log(f"{old.label if old else version}: {len(quotes)} of {n} quotes examined, {changed} changed "
+            f"({time.perf_counter() - t0:.2f}s)")
+    if not dry_run:
+        store.flush()
+    return report
@@ -0,0 +1,189 @@
+from datetime import date
+from typing import Callable, NamedTuple, Optional, Union
+
+from aegis import engine
+from aegis.engine import CL, HL
+from aegis.templates import parse_choice, parse_date, parse_number, parse_severity
+
+# ─── EXTRACTION SCHEMA ──────────────────────────────────────────
+# One spec per proposal field, keyed like the form templates ("habits.smoking").
+# It is sent to Gemini as the response schema (types, enums and required keys:
+# the API has no ranges), and compiled into the validator that checks every
+# response, ranges included, before the proposal reaches the review step.
+# The ranges are the review form's widget bounds (app.py builds its widgets
+# from them), so a value the form could not show is repaired or cleared and
+# noted here rather than replaced by a widget default.
+HABIT_LEVELS = ["none", "occasionally", "moderate", "high"]
+
+class Field(NamedTuple):
+    kind: str                       # text, number, date, choice, severity, occupations
+    label: str
+    choices: tuple = ()
+    lo: Optional[Union[float, date]] = None      # dates for date fields
+    hi: Optional[Union[float, date]] = None
+    required: bool = True
+
+FIELDS = {
+    "name": Field("text", "applicant's full name"),
+    "gender": Field("choice", "gender", ("Male", "Female")),
+    "dob": Field("date", "date of birth, YYYY-MM-DD", lo=date(1940, 1, 1), hi=date(2010, 1, 1)),
+    "height_cm": Field("number", "height in cm", lo=100, hi=250),
+    "weight_kg": Field("number", "weight in kg", lo=30, hi=250),
+    "yearly_income": Field("number", "yearly income in ₹", lo=0, hi=1e11),
+    "source_of_income": Field("choice", "source of income", ("salary", "business", "profession", "other")),
+    "base_cover": Field("number", "life (base) cover in ₹", lo=0, hi=1e11),
+    "cir_cover": Field("number", "critical illness rider cover in ₹", lo=0, hi=1e11),
+    "accident_cover": Field("number", "accident cover in ₹", lo=0, hi=1e11),
+    "parent_health_status": Field("choice", "parents' ages / health", tuple(engine.FAM_E)),
+    **{f"health_conditions.{c}": Field("severity", f"{label} severity: 0 = not present, 1-4 = sev1-sev4", lo=0, hi=4)
+       for c, label in CL.items()},
+    **{f"habits.{h}": Field("choice", f"{label} frequency", tuple(HABIT_LEVELS)) for h, label in HL.items()},
+    "risky_occupations": Field("occupations", "risky occupations declared", tuple(engine.OCC_E)),
+    "extraction_notes": Field("text", "anything unclear or illegible on the form", required=False),
+}
+CHOICE_ALIASES = {"gender": "gender", "source_of_income": "source_of_income",
+                  "parent_health_status": "parent_health_status", **{f"habits.{h}": "habit" for h in HL}}
+
+_TYPES = {"text": "string", "number": "number", "date": "string", "choice": "string", "severity": "integer"}
+# Top-level fields the model attributes to a page (aegis/pages.py)
+PAGE_FIELDS = [k for k in dict.fromkeys(k.split(".")[0] for k in FIELDS) if k != "extraction_notes"]
+SOURCES = {"type": "array", "description": "the page (1 = first page of this PDF) each field was read from",
+           "items": {"type": "object", "required": ["field", "page"],
+                     "properties": {"field": {"type": "string", "enum": PAGE_FIELDS}, "page": {"type": "integer"}}}}
+
+def _field_schema(f: Field, nullable: bool) -> dict:
+    if f.kind == "occupations":
+        s = {"type": "array", "description": f.label, "items": {"type": "string", "enum": list(f.choices)}}
+    else:
+        s = {"type": _TYPES[f.kind], "description": f.label}
+        if f.choices:
+            s["enum"] = list(f.choices)
+    if nullable:
+        s["nullable"] = True
+    return s
+
+def response_schema(keys: Optional[list] = None, sources: bool = False, partial: bool = False) -> dict:
+    # Gemini response schema for all fields, or only `keys` (nested as in the proposal dict).
+    # sources adds the per-field page attribution; partial makes every field optional and nullable.
+    root = {"type": "object", "properties": {}, "required": []}
+    for k in keys or FIELDS:
+        f = FIELDS[k]
+        node, parts = root, k.split(".")
+        for p in parts[:-1]:
+            if p not in node["properties"]:
+                node["properties"][p] = {"type": "object", "properties": {}, "required": []}
+                node["required"].append(p)
+            node = node["properties"][p]
+        node["properties"][parts[-1]] = _field_schema(f, partial)
+        if f.required and not partial:
+            node["required"].append(parts[-1])
+    if sources:
+        root["properties"]["sources"] = SOURCES
+        root["required"].append("sources")
+    return root
+
+RESPONSE_SCHEMA = response_schema(sources=True)
+PAGES_SCHEMA = response_schema(sources=True, partial=True)
+
+# ─── VALIDATION ─────────────────────────────────────────────────
+# compile_validator() turns FIELDS into one checker per field, built once.
+# Each returns the clean value or raises ValueError with the reason. Loose but
+# unambiguous answers are normalised with the form-template parsers ("12 lakh",
+# "sev2", "Occasional"); anything else is reported against its field.
+class Validation(NamedTuple):
+    data: dict          # the proposal with every valid field normalised
+    errors: dict        # field -> reason, for missing or invalid fields
+
+def _checker(key: str, f: Field) -> Callable:
+    def in_range(v):
+        if f.lo is not None and v < f.lo or f.hi is not None and v > f.hi:
+            raise ValueError(f"{v:g} is outside {f.lo:g}–{f.hi:g}")
+        return v
+
+    if f.kind == "text":
+        def text(v):
+            if not isinstance(v, str) or f.required and not v.strip():
+                raise ValueError("empty")
+            return v.strip()
+        return text
+    if f.kind == "number":
+        def number(v):
+            if isinstance(v, bool):
+                raise ValueError(f"not a number: {v!r}")
+            return in_range(v if isinstance(v, (int, float)) else parse_number(str(v), {}))
+        return number
+    if f.kind == "severity":
+        def severity(v):
+            if isinstance(v, bool):
+                raise ValueError(f"not a severity: {v!r}")
+            if isinstance(v, (int, float)) and float(v).is_integer():
+                return int(in_range(int(v)))
+            return parse_severity(str(v), {})
+        return severity
+    if f.kind == "date":
+        def dob(v):
+            d = date.fromisoformat(parse_date(str(v), {}))
+            if f.lo is not None and d < f.lo or f.hi is not None and d > f.hi:
+                raise ValueError(f"{d} is outside {f.lo}–{f.hi}")
+            return d.isoformat()
+        return dob
+    if f.kind == "choice":
+        spec = {"choices": CHOICE_ALIASES[key]}
+        allowed = set(f.choices)
+        def choice(v):
+            v = v if v in allowed else parse_choice(str(v), spec)
+            if v not in allowed:
+                raise ValueError(f"{v!r} is not one of {', '.join(f.choices)}")
+            return v
+        return choice
+    if f.kind == "occupations":
+        allowed = set(f.choices)
+        def occupations(v):
+            if not isinstance(v, list):
+                raise ValueError(f"not a list: {v!r}")
+            out = [str(o).strip().lower().replace(" ", "_") for o in v]
+            bad = [o for o in out if o not in allowed]
+            if bad:
+                raise ValueError(f"unknown {', '.join(bad)}")
+            return list(dict.fromkeys(out))
+        return occupations
+    raise ValueError(f"{key}: unknown field kind {f.kind!r}")
+
+def compile_validator(fields: dict = FIELDS) -> Callable[[dict], Validation]:
+    checks = [(k, tuple(k.split(".")), f.required, _checker(k, f)) for k, f in fields.items()]
+
+    def validate(data: dict) -> Validation:
+        # Fields nest one level deep; lists are rebuilt by their checker
+        out = {k: dict(v) if isinstance(v, dict) else v for k, v in data.items()} if isinstance(data, dict) else {}
+        errors = {}
+        for key, path, required, check in checks:
+            node = out
+            for p in path[:-1]:
+                if node.get(p) is None:
+                    node[p] = {}
+                node = node[p] if isinstance(node[p], dict) else None
+                if node is None:
+                    break
+            if node is None:
+                errors[key] = f"{path[0]} is not an object"
+                continue
+            v = node.get(path[-1])
+            if v is None:
+                if required:
+                    errors[key] = "missing"
+                continue
+            try:
+                node[path[-1]] = check(v)
+            except (ValueError, TypeError) as e:
+                errors[key] = str(e)
+        return Validation(out, errors)
+    return validate
+
+validate = compile_validator()
+
+def field_prompt(errors: dict) -> str:
+    # Follow-up request for only the fields the first answer got wrong
+    lines = [f"- {k}: {FIELDS[k].label} — previous answer {reason}" for k, reason in errors.items()]
+    return ("Re-read this life insurance proposal form. An earlier extraction left the fields below missing "
+            "or invalid. Return a JSON object with ONLY these fields, read carefully from the form "
+            "(dotted names are nested keys):\n" + "\n".join(lines))
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from aegis.memo import compute_underwriting_cached
+from aegis.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, request_trace
+from aegis.spool import BUDGET, PDF, SpooledPDF
+from aegis.tables import TableWatcher
+
+# ─── QUOTING API ────────────────────────────────────────────────
+#   POST /quote     one proposal JSON            -> underwriting result
+#   POST /quotes    {"proposals": [...]}         -> {"results": [...]}
+#   POST /extract   raw PDF body (?quote=1)      -> {"data": ..., "result": ...}
+#   GET  /metrics   latency histograms per endpoint and per stage (JSON, or
+#                   Prometheus text with ?format=prometheus / Accept: text/plain)
+#   GET  /health
+# HTTP/1.1 keep-alive; compute runs on a thread or process pool, and
+# concurrent single /quote calls are coalesced into micro-batches. Rating
+# table files are watched and hot-swapped in the server and in every process
+# pool worker.
+MAX_BODY = 20 * 1024 * 1024
+
+log = logging.getLogger("aegis.server")
+
+def quote_many(proposals: list) -> list:
+    out = []
+    for d in proposals:
+        try:
+            out.append({"ok": True, "result": compute_underwriting_cached(d)})
+        except Exception as e:
+            out.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+    return out
+
+class QuoteBatcher:
+    # Collects /quote calls arriving within max_wait into one pool task
+    def __init__(self, pool, max_batch: int = 64, max_wait: float = 0.002):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.q = queue.Queue()
+        self.batches = REGISTRY.histogram("aegis_quote_batch_size", "Proposals per coalesced /quote batch",
+                                          buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+        threading.Thread(target=self._loop, daemon=True, name="quote-batcher").start()
+
+    def submit(self, d: dict) -> Future:
+        fut = Future()
+        self.q.put((d, fut))
+        return fut
+
+    def _loop(self):
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=left))
+                except queue.Empty:
+                    break
+            self.batches.observe(len(batch))
+            task = self.pool.submit(quote_many, [d for d, _ in batch])
+            task.add_done_callback(lambda t, futs=[f for _, f in batch]: self._resolve(t, futs))
+
+    @staticmethod
+    def _resolve(task: Future, futs: list):
+        try:
+            results = task.result()
+        except Exception as e:
+            for f in futs:
+                f.set_exception(e)
+            return
+        for f, r in zip(futs, results):
+            f.set_result(r)
+
+def _watch_tables():
+    # Process pool initializer: each worker holds its own copy of the engine tables
+    TableWatcher().start()
+
+class QuoteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, workers: int = 4, pool: str = "thread", chunk: int = 256,
+                 extractor: Optional[Callable[[PDF], dict]] = None):
+        super().__init__(addr, QuoteHandler)
+        if pool == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_watch_tables)
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.tables = TableWatcher(log=log.info).start()
+        self.batcher = QuoteBatcher(self.pool)
+        self.chunk = chunk
+        self.extractor = extractor or default_extractor()
+
+    def observe(self, route: str, seconds: float):
+        REGISTRY.histogram("aegis_http_request_seconds", "API latency per route", route=route).observe(seconds)
+
+    def server_close(self):
+        super().server_close()
+        self.tables.stop()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def default_extractor() -> Callable[[PDF], dict]:
+    # One extraction cache (a SQLite connection) per server, shared by the handler threads
+    from aegis.cache import ExtractionCache
+
+    cache = ExtractionCache()
+
+    def extract(pdf: PDF) -> dict:
+        from aegis.extract import extract_from_pdf
+        return extract_from_pdf(pdf, cache=cache)
+    return extract
+
+def stub_extractor(path: str) -> Callable[[PDF], dict]:
+    # Serve a fixed pre-extracted proposal for every upload (local testing without Gemini)
+    with open(path) as f:
+        data = json.load(f)
+    return lambda pdf: dict(data)
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024  # headers + body leave in one send; flushed after each request
+    server: QuoteServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code: int, payload):
+        # str payloads are sent as Prometheus text, anything else as JSON
+        if isinstance(payload, str):
+            body, ctype = payload.encode(), PROMETHEUS_CONTENT_TYPE
+        else:
+            body, ctype = json.dumps(payload, default=str).encode(), "application/json"
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _length(self) -> int:
+        # A body that is refused is left unread, so the connection is closed rather than
+        # parsing the next request out of it
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            n = -1
+        if not 0 <= n <= MAX_BODY:
+            self.close_connection = True
+            raise ValueError(f"body of {n} bytes exceeds {MAX_BODY}" if n > 0 else "bad Content-Length")
+        return n
+
+    def _body(self) -> bytes:
+        body = self.rfile.read(self._length())
+        self.body_read = True
+        return body
+
+    def _json_object(self) -> dict:
+        d = json.loads(self._body())
+        if not isinstance(d, dict):
+            raise ValueError(f"expected a JSON object, got {type(d).__name__}")
+        return d
+
+    def _fail(self, code: int, payload):
+        # An error before the body was read leaves it on the socket: close instead of reusing the connection
+        if not self.body_read and self.headers.get("Content-Length") not in (None, "0"):
+            self.close_connection = True
+        self._send(code, payload)
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        route = f"{method} {url.path}"
+        t0 = time.perf_counter()
+        self.body_read = False
+        try:
+            handler = ROUTES.get(route)
+            if handler is None:
+                self._fail(404, {"error": f"no route {route}"})
+            else:
+                with request_trace(route):
+                    code, payload = handler(self, parse_qs(url.query))
+                self._send(code, payload)
+        except (ValueError, json.JSONDecodeError) as e:
+            self._fail(400, {"error": str(e)})
+        except Exception as e:
+            self._fail(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            self.server.observe(route if route in ROUTES else "other", time.perf_counter() - t0)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+def _quote(h: QuoteHandler, qs) -> tuple:
+    r = h.server.batcher.submit(h._json_object()).result()
+    return (200, r["result"]) if r["ok"] else (422, {"error": r["error"]})
+
+def _quotes(h: QuoteHandler, qs) -> tuple:
+    proposals = h._json_object().get("proposals") or []
+    if not isinstance(proposals, list):
+        raise ValueError("proposals must be a list")
+    n = h.server.chunk
+    futs = [h.server.pool.submit(quote_many, proposals[i:i + n]) for i in range(0, len(proposals), n)]
+    return 200, {"results": [r for f in futs for r in f.result()]}
+
+def _extract(h: QuoteHandler, qs) -> tuple:
+    # The PDF is spooled to disk in chunks rather than read into memory
+    n = h._length()
+    if n == 0:
+        raise ValueError("empty body: expected a PDF")
+    with SpooledPDF.from_stream(h.rfile, n, MAX_BODY) as pdf:
+        h.body_read = True
+        data = h.server.extractor(pdf)
+    out = {"data": data}
+    if qs.get("quote", ["0"])[0] not in ("0", "false", ""):
+        out.update(h.server.pool.submit(quote_many, [data]).result()[0])
+    return 200, out
+
+def _metrics(h: QuoteHandler, qs) -> tuple:
+    accept = h.headers.get("Accept") or ""
+    if qs.get("format", [""])[0] == "prometheus" or "text/plain" in accept or "openmetrics" in accept:
+        return 200, REGISTRY.prometheus()
+    lat = {k[0][1]: v.snapshot() for k, v in REGISTRY.family("aegis_http_request_seconds").items()}
+    stages = {k[0][1]: v.snapshot() for k, v in REGISTRY.family("aegis_stage_seconds").items()}
+    return 200, {"latency_seconds": lat, "stage_seconds": stages,
+                 "quote_batch_size": h.server.batcher.batches.snapshot(), "memory_budget": BUDGET.stats(),
+                 "tables": h.server.tables.stats()}
+
+ROUTES = {
+    "POST /quote": _quote,
+    "POST /quotes": _quotes,
+    "POST /extract": _extract,
+    "GET /metrics": _metrics,
+    "GET /health": lambda h, qs: (200, {"status": "ok"}),
+}
+
+def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = os.cpu_count() or 1, pool: str = "thread",
+          extractor: Optional[Callable[[PDF], dict]] = None):
+    srv = QuoteServer((host, port), workers=workers, pool=pool, extractor=extractor)
+    print(f"Aegis quoting API on http://{host}:{srv.server_address[1]} ({pool} pool, {workers} workers)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
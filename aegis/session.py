@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# ─── SESSION STORE ──────────────────────────────────────────────
+# Heavy per-session objects (underwriting result, live-preview rater) kept
+# outside st.session_state, so that sessions idle for longer than idle_ttl, or
+# beyond max_sessions, can be dropped by whichever session touches the store
+# next. Everything kept here must be rebuildable from the small proposal
+# still held in session_state.
+class SessionStore:
+    def __init__(self, idle_ttl: float = 900.0, max_sessions: int = 500):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self._data = OrderedDict()      # sid -> {name: object}, least recently seen first
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _touch(self, sid: str, now: float) -> dict:
+        slot = self._data.get(sid)
+        if slot is None:
+            slot = self._data[sid] = {}
+        self._data.move_to_end(sid)
+        self._seen[sid] = now
+        while self._data:
+            oldest = next(iter(self._data))
+            if oldest == sid or (now - self._seen[oldest] <= self.idle_ttl and len(self._data) <= self.max_sessions):
+                break
+            del self._data[oldest], self._seen[oldest]
+            self.evictions += 1
+        return slot
+
+    def get(self, sid: str, name: str, factory: Optional[Callable] = None):
+        with self._lock:
+            slot = self._touch(sid, time.monotonic())
+            v = slot.get(name)
+            if v is None and factory is not None:
+                v = slot[name] = factory()
+            return v
+
+    def put(self, sid: str, name: str, value):
+        with self._lock:
+            self._touch(sid, time.monotonic())[name] = value
+
+    def drop(self, sid: str, name: Optional[str] = None):
+        with self._lock:
+            if name is None:
+                self._data.pop(sid, None)
+                self._seen.pop(sid, None)
+            elif sid in self._data:
+                self._data[sid].pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._data), "objects": sum(len(s) for s in self._data.values()),
+                    "evictions": self.evictions}
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Optional, Union
+
+# ─── UPLOAD SPOOLING ────────────────────────────────────────────
+# Uploads are copied to a temp file in fixed-size chunks and hashed on the way
+# through, so no stage needs the whole PDF in memory just to get a cache key.
+# Local parsing reads from the file, and the model gets a file reference where
+# the backend supports one.
+SPOOL_DIR = os.environ.get("AEGIS_SPOOL_DIR") or None      # None: system temp dir
+CHUNK = 1024 * 1024
+
+class SpooledPDF:
+    def __init__(self, path: str, size: int, sha256, owned: bool):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256      # hashlib object fed every byte of the file
+        self.owned = owned        # temp file to delete on close()
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, length: Optional[int] = None, limit: Optional[int] = None) -> "SpooledPDF":
+        # Reads `length` bytes (or to EOF) from stream; ValueError past `limit`
+        h = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(prefix="aegis-", suffix=".pdf", dir=SPOOL_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while length is None or size < length:
+                    chunk = stream.read(CHUNK if length is None else min(CHUNK, length - size))
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if limit is not None and size > limit:
+                        raise ValueError(f"upload exceeds {limit} bytes")
+                    h.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        if length is not None and size < length:
+            os.unlink(path)
+            raise ValueError(f"upload truncated at {size} of {length} bytes")
+        return cls(path, size, h, owned=True)
+
+    @classmethod
+    def from_path(cls, path: str) -> "SpooledPDF":
+        # An existing file: hashed in chunks, left in place on close()
+        h = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                h.update(chunk)
+                size += len(chunk)
+        return cls(str(path), size, h, owned=False)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        if self.owned:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.owned = False
+
+    def __enter__(self) -> "SpooledPDF":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+PDF = Union[bytes, SpooledPDF]
+
+def pdf_stream(pdf: PDF):
+    # What pypdf's PdfReader should open: the spool file by path, or the bytes in memory
+    return pdf.path if isinstance(pdf, SpooledPDF) else io.BytesIO(pdf)
+
+def pdf_bytes(pdf: PDF) -> bytes:
+    return pdf.read() if isinstance(pdf, SpooledPDF) else pdf
+
+# ─── MEMORY BUDGET ──────────────────────────────────────────────
+# Caps the PDF bytes held in memory across concurrent extractions in this
+# process. Each extraction reserves FOOTPRINT x its size (parsed pages, the
+# base64 request body) and waits when the budget is spent. A single upload
+# larger than the whole budget runs on its own. Threads wait in acquire();
+# coroutines wait in acquire_async() without holding an executor thread, since
+# the jobs that would release the budget need those threads to finish.
+FOOTPRINT = 3
+DEFAULT_BUDGET = int(os.environ.get("AEGIS_MEMORY_BUDGET", 512 * 1024 * 1024))
+
+class MemoryBudget:
+    def __init__(self, limit: int = DEFAULT_BUDGET):
+        self.limit = limit
+        self.in_use = self.peak = 0
+        self.waiting = self.waits = 0
+        self._cv = threading.Condition()
+        self._futures = []          # (loop, future) of coroutines waiting in acquire_async
+
+    def cost(self, pdf: PDF) -> int:
+        return min(self.limit, FOOTPRINT * len(pdf))
+
+    def acquire(self, n: int) -> float:
+        # Blocks until n bytes fit; returns the seconds spent waiting
+        t0 = time.perf_counter()
+        with self._cv:
+            if self.in_use + n > self.limit:
+                self.waits += 1
+                self.waiting += 1
+                try:
+                    self._cv.wait_for(lambda: self.in_use + n <= self.limit)
+                finally:
+                    self.waiting -= 1
+            self.in_use += n
+            self.peak = max(self.peak, self.in_use)
+        return time.perf_counter() - t0
+
+    async def acquire_async(self, n: int) -> float:
+        # acquire() for coroutines: waits on the event loop, not on a thread
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        waiting = False
+        try:
+            while True:
+                with self._cv:
+                    if self.in_use + n <= self.limit:
+                        self.in_use += n
+                        self.peak = max(self.peak, self.in_use)
+                        return time.perf_counter() - t0
+                    if not waiting:
+                        self.waits += 1
+                        self.waiting += 1
+                        waiting = True
+                    fut = loop.create_future()
+                    self._futures.append((loop, fut))
+                await fut
+        finally:
+            if waiting:
+                with self._cv:
+                    self.waiting -= 1
+
+    def release(self, n: int):
+        with self._cv:
+            self.in_use -= n
+            self._cv.notify_all()
+            futures, self._futures = self._futures, []
+        for loop, fut in futures:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    @contextmanager
+    def reserve(self, pdf: PDF):
+        n = self.cost(pdf)
+        waited = self.acquire(n)
+        try:
+            yield waited
+        finally:
+            self.release(n)
+
+    def stats(self) -> dict:
+        with self._cv:
+            return {"limit": self.limit, "in_use": self.in_use, "peak": self.peak,
+                    "waiting": self.waiting, "waits": self.waits}
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+BUDGET = MemoryBudget()
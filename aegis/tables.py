@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from aegis.rating import BandIndex, RateCard
+
+# ─── RATING TABLE FILES ─────────────────────────────────────────
+# The underwriting tables live in versioned JSON files, one complete set per
+# file: {"version": "2025.1", "note": ..., "tables": {"BMI_T": [...], ...}}.
+# The packaged files are in aegis/rating_tables/. Deployments can add more in
+# AEGIS_TABLES_DIR. The highest version wins, unless AEGIS_TABLES names a
+# file. Older files stay as the archive that re-rating diffs against.
+#
+# A set is identified by its fingerprint (TABLES_VERSION): a hash of the
+# table contents, which memo keys and stored quotes record.
+TABLES_DIR = Path(__file__).resolve().parent / "rating_tables"
+TABLE_NAMES = ["BMI_T", "FAM_E", "H_E", "CO_M", "HAB_E", "HAB_C", "OCC_E", "L_RAT", "C_RAT", "P_RAT", "FIN_T"]
+# Band tables: name -> (grid step, dense age index, values per row)
+BANDS = {"BMI_T": (1, False, 1), "L_RAT": (5, False, 2), "C_RAT": (1, False, 2), "P_RAT": (1, True, 3), "FIN_T": (1, True, 1)}
+COUNT_TABLES = ("CO_M", "HAB_C")      # keyed by a count of conditions / habits (2, 3+)
+
+def table_dirs() -> list:
+    extra = os.environ.get("AEGIS_TABLES_DIR")
+    return [TABLES_DIR] + ([Path(extra)] if extra else [])
+
+def version_key(label: str) -> tuple:
+    # "2025.10" sorts after "2025.9"
+    return tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in str(label).replace("-", ".").split("."))
+
+def fingerprint(tables: dict) -> str:
+    return hashlib.sha256(json.dumps([tables[n] for n in TABLE_NAMES], sort_keys=True).encode()).hexdigest()[:16]
+
+class RatingTables:
+    # One validated, compiled table set. Immutable once built: the engine swaps whole sets
+    def __init__(self, tables: dict, label: str = "", source: str = "", like: Optional["RatingTables"] = None):
+        missing = [n for n in TABLE_NAMES if n not in tables]
+        extra = [n for n in tables if n not in TABLE_NAMES]
+        if missing or extra:
+            raise ValueError(f"tables {label}: missing {missing or '-'}, unknown {extra or '-'}")
+        t = {n: tables[n] for n in TABLE_NAMES}
+        for n in COUNT_TABLES:
+            t[n] = {int(k): v for k, v in t[n].items()}
+        for n, (step, dense, width) in BANDS.items():
+            t[n] = [tuple(r) for r in t[n]]
+            bad = [r for r in t[n] if len(r) != 2 + width]
+            if bad:
+                raise ValueError(f"tables {label}: {n} rows need {2 + width} columns, got {list(bad[0])}")
+        for c, pts in t["H_E"].items():
+            if len(pts) != 4:
+                raise ValueError(f"tables {label}: H_E.{c} needs points for severities 1-4")
+        for n in ("CO_M", "HAB_C"):
+            if set(t[n]) != {2, 3}:
+                raise ValueError(f"tables {label}: {n} needs keys 2 and 3")
+        if like is not None:
+            # A revision may change values and bands, not the schema the prompt and UI are built on
+            for n in ("FAM_E", "H_E", "HAB_E", "OCC_E"):
+                if set(t[n]) != set(like.tables[n]):
+                    raise ValueError(f"tables {label}: {n} keys {sorted(t[n])} differ from {sorted(like.tables[n])}")
+
+        self.tables = t
+        self.label = label
+        self.source = source
+        self.version = fingerprint(t)
+        # Compiled once per set; raises ValueError if a band table has gaps or overlaps
+        self.BMI_IDX = BandIndex("BMI_T", t["BMI_T"], step=BANDS["BMI_T"][0])
+        self.L_IDX = BandIndex("L_RAT", t["L_RAT"], step=BANDS["L_RAT"][0])
+        self.C_IDX = BandIndex("C_RAT", t["C_RAT"], step=BANDS["C_RAT"][0])
+        self.P_IDX = BandIndex("P_RAT", t["P_RAT"], dense=True)
+        self.FIN_IDX = BandIndex("FIN_T", t["FIN_T"], dense=True)
+        self.RATE_CARD = RateCard(self.P_IDX, self.L_IDX, self.C_IDX)
+
+    @classmethod
+    def from_file(cls, path, like: Optional["RatingTables"] = None) -> "RatingTables":
+        d = json.loads(Path(path).read_text())
+        return cls(d["tables"], str(d.get("version") or Path(path).stem), str(path), like)
+
+    def names(self) -> dict:
+        # Module globals the engine exposes for this set
+        return {**self.tables, "BMI_IDX": self.BMI_IDX, "L_IDX": self.L_IDX, "C_IDX": self.C_IDX,
+                "P_IDX": self.P_IDX, "FIN_IDX": self.FIN_IDX, "RATE_CARD": self.RATE_CARD,
+                "TABLES": self, "TABLES_VERSION": self.version}
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["tables"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        return f"RatingTables({self.label!r}, {self.version})"
+
+def table_files() -> list:
+    return [p for d in table_dirs() if d.is_dir() for p in sorted(d.glob("*.json"))]
+
+LOAD_ERRORS = (ValueError, KeyError, TypeError, OSError, json.JSONDecodeError)
+
+def _file_version(p: Path) -> tuple:
+    try:
+        return version_key(json.loads(p.read_text()).get("version") or p.stem)
+    except LOAD_ERRORS:
+        return version_key(p.stem)
+
+def load_active(like: Optional[RatingTables] = None, skipped: Optional[list] = None) -> RatingTables:
+    # The highest-version table file that validates, unless AEGIS_TABLES pins one.
+    # Files that fail are appended to `skipped` as (path, error).
+    pinned = os.environ.get("AEGIS_TABLES")
+    if pinned:
+        return RatingTables.from_file(pinned, like)
+    errors = skipped if skipped is not None else []
+    for p in sorted(table_files(), key=_file_version, reverse=True):
+        try:
+            return RatingTables.from_file(p, like)
+        except LOAD_ERRORS as e:
+            errors.append((p, f"{type(e).__name__}: {e}"))
+    raise ValueError(f"no valid rating table file in {', '.join(map(str, table_dirs()))}: "
+                     + "; ".join(f"{p.name}: {e}" for p, e in errors))
+
+def archive() -> dict:
+    # fingerprint -> RatingTables for every readable table file
+    out = {}
+    for p in table_files():
+        try:
+            t = RatingTables.from_file(p)
+        except LOAD_ERRORS:
+            continue
+        out.setdefault(t.version, t)
+    return out
+
+# ─── DIFF ───────────────────────────────────────────────────────
+# Which proposals a revision can affect. A band table change becomes ranges of
+# the value it is looked up by: BMI for BMI_T, age for P_RAT / FIN_T, EMR for
+# L_RAT / C_RAT. A keyed table change becomes the inputs that select the key.
+# Anything outside these rated the same under both sets.
+BAND_FIELD = {"BMI_T": ("BMI_IDX", "B"), "P_RAT": ("P_IDX", "A"), "FIN_T": ("FIN_IDX", "A"),
+              "L_RAT": ("L_IDX", "EMR"), "C_RAT": ("C_IDX", "EMR")}
+
+class Change(NamedTuple):
+    table: str
+    field: str          # B / A / EMR, or the keyed input: family, condition, conditions, habit, habits, occupation
+    match: tuple        # ranges (lo, hi, lo_inclusive, hi_inclusive) for band fields, else key values
+
+    def describe(self) -> str:
+        if self.field in ("A", "B", "EMR"):
+            name = {"A": "age", "B": "BMI", "EMR": "EMR"}[self.field]
+            return f"{self.table}: {name} " + ", ".join(
+                f"{'[' if li else '('}{lo:g}–{hi:g}{']' if hi_i else ')'}" for lo, hi, li, hi_i in self.match)
+        return f"{self.table}: {self.field} " + ", ".join(map(str, self.match))
+
+def band_ranges(old: BandIndex, new: BandIndex) -> list:
+    # Ranges of x where old.values(x) != new.values(x). Both tables are constant
+    # between consecutive band edges (either end of a band), so each edge point
+    # and each open interval between edges is tested once.
+    edges = sorted({*old.los, *new.los, *old.his, *new.his})
+    regions = [(edges[0], edges[0], True, True)]
+    for a, b in zip(edges, edges[1:]):
+        regions += [(a, b, False, False), (b, b, True, True)]
+    out = []
+    for lo, hi, li, hi_i in regions:
+        x = lo if li else (lo + hi) / 2
+        if old.values(x) == new.values(x):
+            continue
+        if out and out[-1][1] == lo and (out[-1][3] or li):
+            out[-1] = (out[-1][0], hi, out[-1][2], hi_i)
+        else:
+            out.append((lo, hi, li, hi_i))
+    return out
+
+def diff_tables(old: RatingTables, new: RatingTables) -> list:
+    changes = []
+    for n, (idx, field) in BAND_FIELD.items():
+        ranges = band_ranges(getattr(old, idx), getattr(new, idx))
+        if ranges:
+            changes.append(Change(n, field, tuple(ranges)))
+    o, w = old.tables, new.tables
+    keys = [k for k in o["FAM_E"] if o["FAM_E"][k] != w["FAM_E"][k]]
+    if keys:
+        changes.append(Change("FAM_E", "family", tuple(keys)))
+    keys = [(c, s + 1) for c in o["H_E"] for s in range(4) if o["H_E"][c][s] != w["H_E"][c][s]]
+    if keys:
+        changes.append(Change("H_E", "condition", tuple(keys)))
+    keys = [(h, lvl) for h in o["HAB_E"] for lvl in sorted(set(o["HAB_E"][h]) | set(w["HAB_E"][h]))
+            if o["HAB_E"][h].get(lvl, 0) != w["HAB_E"][h].get(lvl, 0)]
+    if keys:
+        changes.append(Change("HAB_E", "habit", tuple(keys)))
+    for n, field in (("CO_M", "conditions"), ("HAB_C", "habits")):
+        keys = [k for k in (2, 3) if o[n][k] != w[n][k]]
+        if keys:
+            changes.append(Change(n, field, tuple(keys)))
+    keys = [k for k in o["OCC_E"] if o["OCC_E"][k] != w["OCC_E"][k]]
+    if keys:
+        changes.append(Change("OCC_E", "occupation", tuple(keys)))
+    return changes
+
+# ─── HOT RELOAD ─────────────────────────────────────────────────
+# Polls the table directories. When a file is added or edited, the active set
+# is loaded, validated against the running one and swapped into the engine.
+# A file that fails validation is reported and skipped: the highest version
+# that does validate is used, and if that is the running set nothing changes.
+class TableWatcher:
+    def __init__(self, interval: float = 2.0, log=None):
+        self.interval = interval
+        self.log = log or (lambda msg: None)
+        self.reloads = self.failures = 0
+        self.error = ""
+        self._seen = self._signature()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _signature() -> tuple:
+        files = table_files()
+        pinned = os.environ.get("AEGIS_TABLES")
+        if pinned and Path(pinned).exists():
+            files.append(Path(pinned))
+        return tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+
+    def check(self) -> bool:
+        # Reloads if any table file changed since the last check; True when a new set was installed
+        from aegis import engine
+
+        sig = self._signature()
+        if sig == self._seen:
+            return False
+        self._seen = sig
+        skipped = []
+        try:
+            t = load_active(like=engine.TABLES, skipped=skipped)
+        except LOAD_ERRORS as e:
+            skipped.append(("", f"{type(e).__name__}: {e}"))
+            t = None
+        self.error = "; ".join(f"{Path(p).name}: {e}" if p else e for p, e in skipped)
+        if skipped:
+            self.failures += 1
+            self.log(f"rating table files rejected: {self.error}")
+        if t is None:
+            return False
+        if t.version == engine.TABLES_VERSION:
+            return False
+        old = engine.TABLES
+        engine.install_tables(t)
+        self.reloads += 1
+        self.log(f"rating tables {old.label} ({old.version}) -> {t.label} ({t.version})")
+        return True
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:      # keep watching whatever goes wrong
+                self.failures += 1
+                self.error = f"{type(e).__name__}: {e}"
+
+    def start(self) -> "TableWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="table-watcher")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        from aegis import engine
+        return {"label": engine.TABLES.label, "version": engine.TABLES_VERSION, "reloads": self.reloads,
+                "failures": self.failures, "error": self.error}
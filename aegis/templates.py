@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from aegis.spool import PDF, pdf_stream
+
+# ─── TEMPLATE FAST PATH ─────────────────────────────────────────
+# Known proposal form layouts are described by JSON templates that map
+# AcroForm field names, or text regions (page, x0, y0, x1, y1 in PDF points,
+# origin bottom-left), onto the extraction schema. A digitally filled form that
+# matches a template is read locally. Anything below the match / per-field
+# confidence thresholds goes to the model as before.
+TEMPLATE_DIR = Path(__file__).resolve().parent / "form_templates"
+
+MATCH_MIN = 0.9        # share of a template's anchors that must be present
+FIELD_MIN = 0.75       # lowest acceptable per-field confidence
+ACRO_CONF = 1.0        # value typed into a form field
+REGION_CONF = 0.8      # value read from positioned page text
+
+SCHEMA_KEYS = [
+    "name", "gender", "dob", "height_cm", "weight_kg", "yearly_income", "source_of_income",
+    "base_cover", "cir_cover", "accident_cover", "parent_health_status",
+    "health_conditions.thyroid", "health_conditions.asthma", "health_conditions.hypertension",
+    "health_conditions.diabetes", "health_conditions.gut_disorder",
+    "habits.smoking", "habits.alcohol", "habits.tobacco", "risky_occupations",
+]
+
+CHOICES = {
+    "gender": {"male": "Male", "m": "Male", "female": "Female", "f": "Female"},
+    "source_of_income": {v: v for v in ("salary", "business", "profession", "other")}
+                        | {"salaried": "salary", "self_employed": "business", "professional": "profession"},
+    "parent_health_status": {v: v for v in ("both_above_65", "one_above_65", "both_below_65")},
+    "habit": {v: v for v in ("none", "occasionally", "moderate", "high")}
+             | {"no": "none", "never": "none", "nil": "none", "occasional": "occasionally", "heavy": "high"},
+}
+UNITS = {"lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "l": 1e5, "crore": 1e7, "crores": 1e7, "cr": 1e7}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %b %Y", "%d %B %Y")
+CHECKED = {"/yes", "/on", "yes", "on", "true", "1", "x", "/1"}
+
+# ─── VALUE PARSERS ──────────────────────────────────────────────
+# Each returns the schema value or raises ValueError
+def parse_text(raw: str, spec: dict):
+    v = " ".join(raw.split())
+    if not v:
+        raise ValueError("empty")
+    return v
+
+def parse_number(raw: str, spec: dict):
+    m = re.fullmatch(r"(?:₹|rs\.?|inr)?\s*([\d,]*\.?\d+)\s*([a-z]*)\.?", raw.strip().lower())
+    if not m or (m.group(2) and m.group(2) not in UNITS):
+        raise ValueError(f"not a number: {raw!r}")
+    v = float(m.group(1).replace(",", "")) * UNITS.get(m.group(2), 1)
+    return int(v) if v.is_integer() else v
+
+def parse_date(raw: str, spec: dict):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw.strip(), fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"not a date: {raw!r}")
+
+def parse_choice(raw: str, spec: dict):
+    table = CHOICES[spec["choices"]]
+    v = re.sub(r"[\s\-]+", "_", raw.strip().lower().lstrip("/"))
+    v = spec.get("map", {}).get(v, v)
+    if v not in table:
+        raise ValueError(f"unknown {spec['choices']}: {raw!r}")
+    return table[v]
+
+def parse_severity(raw: str, spec: dict):
+    v = raw.strip().lower().lstrip("/")
+    v = {"": "0", "no": "0", "none": "0", "nil": "0"}.get(v, v.removeprefix("sev").strip())
+    if v not in {"0", "1", "2", "3", "4"}:
+        raise ValueError(f"not a severity: {raw!r}")
+    return int(v)
+
+PARSERS = {"text": parse_text, "number": parse_number, "date": parse_date,
+           "choice": parse_choice, "severity": parse_severity}
+
+# ─── TEMPLATES ──────────────────────────────────────────────────
+@dataclass
+class FormTemplate:
+    name: str
+    fields: dict                                         # schema key -> spec
+    anchors: list = field(default_factory=list)          # AcroForm field names that identify the layout
+    text_anchors: list = field(default_factory=list)     # regexes that must appear on page 1
+    defaults: dict = field(default_factory=dict)         # schema values the layout does not ask for
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FormTemplate":
+        for key, spec in d["fields"].items():
+            if key not in SCHEMA_KEYS:
+                raise ValueError(f"template {d['name']}: unknown schema key {key!r}")
+            if "checkboxes" not in spec and "field" not in spec and "region" not in spec:
+                raise ValueError(f"template {d['name']}: {key} needs 'field', 'region' or 'checkboxes'")
+            if spec.get("type", "text") not in PARSERS:
+                raise ValueError(f"template {d['name']}: {key} has unknown type {spec['type']!r}")
+        missing = [k for k in SCHEMA_KEYS if k not in d["fields"] and k not in d.get("defaults", {})]
+        if missing:
+            raise ValueError(f"template {d['name']}: no mapping or default for {', '.join(missing)}")
+        return cls(d["name"], d["fields"], d.get("anchors", []), d.get("text_anchors", []), d.get("defaults", {}))
+
+class FastPathResult(NamedTuple):
+    template: Optional[str]
+    match: float
+    data: Optional[dict]          # None when the model has to be called
+    confidence: dict              # schema key -> confidence
+    seconds: float
+    reason: str = ""
+
+    @property
+    def low_fields(self) -> list:
+        return [k for k, c in self.confidence.items() if c < FIELD_MIN]
+
+class PageText:
+    # Positioned text fragments of a PDF, collected lazily per page
+    def __init__(self, reader):
+        self.reader = reader
+        self._pages = {}
+
+    def fragments(self, i: int) -> list:
+        if i not in self._pages:
+            frags = []
+
+            def visit(text, cm, tm, font, size):
+                if text.strip():
+                    frags.append((cm[4] + tm[4], cm[5] + tm[5], text))
+
+            self.reader.pages[i].extract_text(visitor_text=visit)
+            self._pages[i] = frags
+        return self._pages[i]
+
+    def page(self, i: int) -> str:
+        return "".join(t for _, _, t in self.fragments(i))
+
+    def region(self, i: int, x0: float, y0: float, x1: float, y1: float) -> str:
+        inside = [(y, x, t) for x, y, t in self.fragments(i) if x0 <= x <= x1 and y0 <= y <= y1]
+        return " ".join(t.strip() for _, _, t in sorted(inside, key=lambda f: (-f[0], f[1])))
+
+def _field_value(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, list):
+        v = v[0] if v else ""
+    return str(v)
+
+def _set(data: dict, key: str, value):
+    head, _, tail = key.partition(".")
+    if tail:
+        data.setdefault(head, {})[tail] = value
+    else:
+        data[key] = value
+
+def apply_template(tpl: FormTemplate, acro: dict, text: Optional[PageText]) -> tuple:
+    # Returns (data, confidence); unreadable fields get confidence 0
+    data, conf = {}, {}
+    for key, value in tpl.defaults.items():
+        _set(data, key, value)
+        conf[key] = ACRO_CONF
+    for key, spec in tpl.fields.items():
+        try:
+            if "checkboxes" in spec:
+                value = [occ for occ, name in spec["checkboxes"].items()
+                         if _field_value(acro.get(name)).lower() in CHECKED]
+                c = ACRO_CONF if all(n in acro for n in spec["checkboxes"].values()) else 0.0
+            elif "field" in spec:
+                if spec["field"] not in acro:
+                    raise ValueError("field missing")
+                value, c = PARSERS[spec.get("type", "text")](_field_value(acro[spec["field"]]), spec), ACRO_CONF
+            else:
+                value, c = PARSERS[spec.get("type", "text")](text.region(*spec["region"]), spec), REGION_CONF
+        except (ValueError, KeyError, IndexError):
+            value, c = None, 0.0
+        _set(data, key, value)
+        conf[key] = c
+    data["extraction_notes"] = f"Read locally with form template {tpl.name}"
+    return data, conf
+
+class TemplateRegistry:
+    def __init__(self, templates: Optional[list] = None):
+        self.templates = list(templates or [])
+
+    @classmethod
+    def from_dirs(cls, *dirs) -> "TemplateRegistry":
+        templates = []
+        for d in dirs:
+            if d and Path(d).is_dir():
+                for p in sorted(Path(d).glob("*.json")):
+                    templates.append(FormTemplate.from_dict(json.loads(p.read_text())))
+        return cls(templates)
+
+    def register(self, tpl: FormTemplate):
+        self.templates.append(tpl)
+
+    def extract(self, pdf_bytes: PDF) -> FastPathResult:
+        t0 = time.perf_counter()
+
+        def miss(reason: str, name=None, match=0.0, conf=None) -> FastPathResult:
+            return FastPathResult(name, match, None, conf or {}, time.perf_counter() - t0, reason)
+
+        if not self.templates:
+            return miss("no templates")
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return miss("pypdf not installed")
+        try:
+            reader = PdfReader(pdf_stream(pdf_bytes))
+            acro = {k: f.get("/V") for k, f in (reader.get_fields() or {}).items()}
+            text = PageText(reader)
+
+            best, best_match = None, 0.0
+            for tpl in self.templates:
+                checks = [a in acro for a in tpl.anchors]
+                checks += [re.search(a, text.page(0), re.I) is not None for a in tpl.text_anchors]
+                match = sum(checks) / len(checks) if checks else 0.0
+                if match > best_match:
+                    best, best_match = tpl, match
+            if best is None or best_match < MATCH_MIN:
+                return miss("no matching template", best.name if best else None, best_match)
+            data, conf = apply_template(best, acro, text)
+        except Exception as e:
+            return miss(f"unreadable: {type(e).__name__}")
+
+        res = FastPathResult(best.name, best_match, data, conf, time.perf_counter() - t0)
+        if res.low_fields:
+            return miss(f"low confidence: {', '.join(res.low_fields)}", best.name, best_match, conf)
+        return res
+
+_registry = None
+
+def get_registry() -> TemplateRegistry:
+    # Bundled templates plus any in AEGIS_TEMPLATE_DIR, loaded once per process
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry.from_dirs(TEMPLATE_DIR, os.environ.get("AEGIS_TEMPLATE_DIR"))
+    return _registry
@@ -0,0 +1,132 @@
+import io
+import re
+import time
+from typing import NamedTuple
+
+from aegis.spool import PDF, pdf_stream
+
+# ─── PDF TRIAGE ─────────────────────────────────────────────────
+# Runs locally before extraction. It keeps only the pages whose text layer
+# mentions the fields in PROMPT and re-encodes oversized scanned images, so
+# less is uploaded to the model. pypdf (and Pillow for images) are optional.
+# Without them, or for a PDF they cannot parse, the original bytes are sent.
+FIELD_TERMS = {
+    "name": r"\bname\b",
+    "gender": r"\b(gender|sex)\b",
+    "dob": r"date of birth|\bd\.?o\.?b\b|\bbirth\b",
+    "height": r"\bheight\b",
+    "weight": r"\bweight\b",
+    "income": r"\bincome\b|\bsalary\b|\bbusiness\b",
+    "cover": r"\bcover\b|sum assured|\brider\b",
+    "cir": r"critical illness",
+    "accident": r"\baccident",
+    "family": r"\bparent|\bfather\b|\bmother\b|family history",
+    "health": r"thyroid|asthma|hypertension|blood pressure|diabet|\bgut\b|gastr",
+    "habits": r"smok|alcohol|tobacco|cigarette",
+    "occupation": r"occupation|pilot|athlete|driver|merchant navy|\boil\b|\bgas\b",
+}
+_TERMS = [re.compile(p, re.I) for p in FIELD_TERMS.values()]
+
+MIN_TERMS = 2          # distinct field terms a page needs to be kept
+MIN_TEXT = 40          # characters below which a page counts as scanned (no text layer)
+MAX_IMAGE_PX = 1600    # longest side of a re-encoded page image
+MIN_IMAGE_PX = 600     # smaller images are left untouched
+JPEG_QUALITY = 70
+
+class TriageReport(NamedTuple):
+    pages_in: int
+    pages_kept: int
+    images_recompressed: int
+    bytes_in: int
+    bytes_out: int
+    seconds: float
+    note: str = ""
+    pages: tuple = ()       # indexes of the pages kept, in order; empty when sent as-is
+
+    @property
+    def saved(self) -> float:
+        return 1 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+
+    def summary(self) -> str:
+        if self.note:
+            return f"sent as-is ({self.note})"
+        return (f"{self.pages_kept}/{self.pages_in} pages · {self.bytes_in / 1024:.0f} KB → "
+                f"{self.bytes_out / 1024:.0f} KB ({self.saved:.0%} smaller)")
+
+def page_score(text: str) -> int:
+    return sum(1 for t in _TERMS if t.search(text))
+
+def select_pages(texts: list) -> list:
+    # Text pages are kept when they mention enough schema fields. Pages without a
+    # text layer are scans: if no page has text the form itself is scanned and
+    # every page is kept, otherwise they are treated as attachments.
+    scanned = [len(t.strip()) < MIN_TEXT for t in texts]
+    if all(scanned):
+        return list(range(len(texts)))
+    keep = [i for i, t in enumerate(texts) if not scanned[i] and page_score(t) >= MIN_TERMS]
+    return keep or list(range(len(texts)))
+
+def _shrink_images(page) -> int:
+    from PIL import Image
+
+    n = 0
+    for img in page.images:
+        try:
+            pil = img.image
+        except Exception:
+            continue  # unsupported filter / colour space: leave it alone
+        side = max(pil.size) if pil is not None else 0
+        if side < MIN_IMAGE_PX or side <= MAX_IMAGE_PX and (img.name or "").lower().endswith((".jpg", ".jpeg")):
+            continue  # logos / signatures, or scans already within budget
+        if pil.mode not in ("RGB", "L"):
+            pil = pil.convert("RGB")
+        if max(pil.size) > MAX_IMAGE_PX:
+            pil.thumbnail((MAX_IMAGE_PX, MAX_IMAGE_PX), Image.LANCZOS)
+        img.replace(pil, quality=JPEG_QUALITY)
+        n += 1
+    return n
+
+def triage_pdf(pdf_bytes: PDF, recompress: bool = True) -> tuple:
+    # Returns (what to send, TriageReport): trimmed bytes, or the input unchanged.
+    # Never raises on a bad or unsupported PDF.
+    t0 = time.perf_counter()
+
+    def passthrough(note: str, pages: int = 0) -> tuple:
+        n = len(pdf_bytes)
+        return pdf_bytes, TriageReport(pages, pages, 0, n, n, time.perf_counter() - t0, note)
+
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        return passthrough("pypdf not installed")
+
+    try:
+        reader = PdfReader(pdf_stream(pdf_bytes))
+        if reader.is_encrypted:
+            return passthrough("encrypted", len(reader.pages))
+        texts = [p.extract_text() or "" for p in reader.pages]
+        keep = select_pages(texts)
+
+        writer = PdfWriter()
+        for i in keep:
+            writer.add_page(reader.pages[i])
+        n_img = 0
+        if recompress:
+            try:
+                for page in writer.pages:
+                    n_img += _shrink_images(page)
+            except ImportError:
+                pass  # Pillow missing: pages are still trimmed
+        for page in writer.pages:
+            page.compress_content_streams()
+        writer.compress_identical_objects()
+        buf = io.BytesIO()
+        writer.write(buf)
+        out = buf.getvalue()
+    except Exception as e:
+        return passthrough(f"unreadable: {type(e).__name__}")
+
+    if len(out) >= len(pdf_bytes):
+        return passthrough("no reduction", len(texts))
+    return out, TriageReport(len(texts), len(keep), n_img, len(pdf_bytes), len(out), time.perf_counter() - t0,
+                             pages=tuple(keep))
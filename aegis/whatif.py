@@ -0,0 +1,205 @@
+import time
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from aegis.batch import compute_underwriting_batch, proposals_to_columns
+from aegis.engine import HAB_E, calc_bmi, fmt_inr, proposal_age
+from aegis.models import Proposal
+
+# ─── WHAT-IF GRID ───────────────────────────────────────────────
+# Re-rates one proposal over a grid of life cover x age x BMI x one habit's
+# level in a single compute_underwriting_batch call. Everything else in the
+# proposal is held fixed. The page then shows 2-D slices of the grid; moving
+# between slices does not recompute anything. Cells where the decision, the
+# L_RAT / C_RAT class or the FIN_T financial limit changes from the
+# neighbouring cell are marked as boundaries.
+AXES = ("cover", "age", "bmi", "habit")
+AXIS_LABELS = {"cover": "Life cover", "age": "Age", "bmi": "BMI", "habit": "Habit"}
+HABIT_LEVELS = ("none", "occasionally", "moderate", "high")
+METRICS = {"grand": "Annual premium (₹)", "EMR": "EMR (points)"}
+KEEP = ["EMR", "grand", "l_total", "a_total", "c_total", "life_idx", "cir_idx", "life_cls", "cir_cls",
+        "dcl", "priced", "c_declined", "f_fin_limit", "fin_limit", "fin_mult", "n_flags"]
+
+# Boundary kinds, highest priority first: name -> what identifies a cell's side of it
+BOUNDARIES = {
+    "decision": lambda g: g["dcl"],
+    "life class": lambda g: g["life_idx"],
+    "financial limit": lambda g: g["f_fin_limit"],
+    "CIR class": lambda g: np.where(g["c_declined"] | ~g["priced"], -2, g["cir_idx"]),
+}
+BOUNDARY_COLORS = {"decision": "#d93251", "life class": "#1a2236", "financial limit": "#c88a00", "CIR class": "#2b76cc"}
+
+LAKH = 1e5
+
+def fmt_cover(v: float) -> str:
+    if v >= 1e7:
+        return f"₹{v / 1e7:.2f}".rstrip("0").rstrip(".") + " Cr"
+    return f"₹{v / LAKH:.1f}".rstrip("0").rstrip(".") + " L"
+
+def axis_label(axis: str, v) -> str:
+    if axis == "cover":
+        return fmt_cover(float(v))
+    if axis == "bmi":
+        return f"{float(v):.1f}"
+    return str(v)
+
+def default_habit(d: dict) -> str:
+    # The habit the applicant rates highest on, else smoking
+    habs = d.get("habits") or {}
+    return max(HAB_E, key=lambda h: HABIT_LEVELS.index(habs[h]) if habs.get(h) in HABIT_LEVELS else 0)
+
+def default_axes(d: dict, A: int, B: float) -> dict:
+    base = float(d.get("base_cover") or 0) or 100 * LAKH
+    covers = np.unique(np.round(np.r_[base * np.linspace(0.25, 3.0, 23), base] / LAKH) * LAKH)
+    ages = np.arange(max(16, A - 12), min(70, A + 12) + 1)
+    bmis = np.unique(np.round(np.r_[np.arange(max(14.0, B - 8), B + 8.01, 0.5), B], 1))
+    return {"cover": covers, "age": ages, "bmi": bmis, "habit": np.asarray(HABIT_LEVELS, dtype=object)}
+
+@dataclass
+class WhatIfGrid:
+    axes: dict          # axis -> 1-D values, in AXES order
+    habit: str          # the habit the "habit" axis varies
+    res: dict           # KEEP columns of the batch result, each shaped like the grid
+    at: dict            # the proposal's own position on each axis
+    seconds: float
+
+    @property
+    def size(self) -> int:
+        return int(np.prod([len(v) for v in self.axes.values()]))
+
+def build_grid(d: dict, axes: Optional[dict] = None, habit: Optional[str] = None,
+               as_of: Optional[date] = None) -> WhatIfGrid:
+    t0 = time.perf_counter()
+    A = proposal_age(d["dob"]) if as_of is None else _age_on(d["dob"], as_of)
+    B = calc_bmi(d["weight_kg"], d["height_cm"])
+    habit = habit or default_habit(d)
+    axes = {**default_axes(d, A, B), **(axes or {})}
+    axes = {a: np.asarray(axes[a]) for a in AXES}
+    shape = tuple(len(v) for v in axes.values())
+    n = int(np.prod(shape))
+
+    cols = {k: np.broadcast_to(v, (n,)) for k, v in proposals_to_columns([d]).items()}
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    cols["base_cover"] = mesh[0].ravel().astype(np.float64)
+    cols["age"] = mesh[1].ravel().astype(np.int64)
+    cols["bmi"] = mesh[2].ravel().astype(np.float64)
+    cols[f"hab_{habit}"] = mesh[3].ravel()
+    res = compute_underwriting_batch(cols)
+
+    current = (d.get("habits") or {}).get(habit) or "none"
+    at = {"cover": _nearest(axes["cover"], float(d.get("base_cover") or 0)), "age": _nearest(axes["age"], A),
+          "bmi": _nearest(axes["bmi"], B),
+          "habit": HABIT_LEVELS.index(current) if current in HABIT_LEVELS else 0}
+    return WhatIfGrid(axes, habit, {k: res[k].reshape(shape) for k in KEEP}, at, time.perf_counter() - t0)
+
+def _age_on(dob, as_of: date) -> int:
+    dob = date.fromisoformat(dob) if isinstance(dob, str) else dob
+    return as_of.year - dob.year - ((as_of.month, as_of.day) < (dob.month, dob.day))
+
+def _nearest(values, v) -> int:
+    return int(np.argmin(np.abs(np.asarray(values, dtype=np.float64) - v)))
+
+@lru_cache(maxsize=16)
+def proposal_grid(p: Proposal, today: date, tables: str) -> WhatIfGrid:
+    # today and the rating table version are part of the key: ages move with the date, rates with the tables
+    return build_grid(p.to_dict(), as_of=today)
+
+# ─── SLICES ─────────────────────────────────────────────────────
+def _plane(g: WhatIfGrid, x: str, y: str, fixed: dict) -> dict:
+    # 2-D views of every result column over (x, y), the other axes held at `fixed`
+    idx = tuple(slice(None) if a in (x, y) else fixed.get(a, g.at[a]) for a in AXES)
+    flip = AXES.index(x) > AXES.index(y)
+    return {k: (v[idx].T if flip else v[idx]) for k, v in g.res.items()}
+
+def _edges(plane: dict) -> np.ndarray:
+    # Boundary kind of each cell: set where it differs from its lower-x or lower-y neighbour
+    shape = plane["EMR"].shape
+    kind = np.full(shape, "", dtype=object)
+    for name in reversed(BOUNDARIES):      # later assignments win: highest priority last
+        v = BOUNDARIES[name](plane)
+        edge = np.zeros(shape, dtype=bool)
+        edge[1:, :] |= v[1:, :] != v[:-1, :]
+        edge[:, 1:] |= v[:, 1:] != v[:, :-1]
+        kind[edge] = name
+    return kind
+
+def _cir_label(p: dict) -> np.ndarray:
+    cls = np.where(p["cir_cls"] == None, "—", p["cir_cls"])  # noqa: E711
+    return np.where(p["c_declined"] | ~p["priced"], "not offered", cls).astype(object)
+
+def slice_frame(g: WhatIfGrid, x: str, y: str, fixed: Optional[dict] = None):
+    import pandas as pd
+
+    if x == y:
+        raise ValueError("x and y must be different axes")
+    p = _plane(g, x, y, fixed or {})
+    kind = _edges(p)
+    xs, ys = g.axes[x], g.axes[y]
+    xi, yi = np.meshgrid(np.arange(len(xs)), np.arange(len(ys)), indexing="ij")
+    xl = np.asarray([axis_label(x, v) for v in xs], dtype=object)
+    yl = np.asarray([axis_label(y, v) for v in ys], dtype=object)
+    cir = _cir_label(p)
+    return pd.DataFrame({
+        "x": xl[xi].ravel(), "y": yl[yi].ravel(), "xi": xi.ravel(), "yi": yi.ravel(),
+        "grand": p["grand"].ravel().round(0), "EMR": p["EMR"].ravel(),
+        "decision": p["dcl"].ravel(), "life": np.where(p["life_cls"] == None, "—", p["life_cls"]).ravel(),  # noqa: E711
+        "cir": cir.ravel(),
+        "over_limit": p["f_fin_limit"].ravel(), "flags": p["n_flags"].ravel(), "boundary": kind.ravel(),
+    })
+
+def crossings(g: WhatIfGrid, axis: str) -> list:
+    # Boundaries met moving along one axis through the proposal's own position:
+    # (kind, from value, to value, label before, label after)
+    idx = tuple(slice(None) if a == axis else g.at[a] for a in AXES)
+    line = {k: v[idx] for k, v in g.res.items()}
+    desc = {
+        "decision": line["dcl"],
+        "life class": np.where(line["life_cls"] == None, "—", line["life_cls"]),  # noqa: E711
+        "financial limit": np.where(line["f_fin_limit"], "over limit", "within limit"),
+        "CIR class": _cir_label(line),
+    }
+    out = []
+    vals = g.axes[axis]
+    for name, key in BOUNDARIES.items():
+        v = key(line)
+        for i in np.flatnonzero(v[1:] != v[:-1]):
+            out.append((name, axis_label(axis, vals[i]), axis_label(axis, vals[i + 1]),
+                        str(desc[name][i]), str(desc[name][i + 1])))
+    return out
+
+def limit_note(g: WhatIfGrid) -> str:
+    at = tuple(g.at[a] for a in AXES)
+    mult, limit = int(g.res["fin_mult"][at]), float(g.res["fin_limit"][at])
+    return f"Financial UW limit at age {g.axes['age'][g.at['age']]}: {fmt_inr(limit)} ({mult}× income)"
+
+# ─── CHART ──────────────────────────────────────────────────────
+def heatmap(frame, x: str, y: str, metric: str, g: WhatIfGrid, fixed: Optional[dict] = None):
+    # Altair layer chart: metric surface, boundary outlines, the proposal's own cell
+    import altair as alt
+
+    fixed = fixed or {}
+    enc = dict(
+        x=alt.X("x:O", sort=[axis_label(x, v) for v in g.axes[x]], title=AXIS_LABELS[x] if x != "habit" else g.habit.title(),
+                axis=alt.Axis(labelOverlap=True, labelAngle=-45)),
+        y=alt.Y("y:O", sort=[axis_label(y, v) for v in reversed(g.axes[y])], title=AXIS_LABELS[y] if y != "habit" else g.habit.title(),
+                axis=alt.Axis(labelOverlap=True)),
+    )
+    tooltip = [alt.Tooltip("x:O", title=AXIS_LABELS[x]), alt.Tooltip("y:O", title=AXIS_LABELS[y]),
+               alt.Tooltip("grand:Q", title="Premium", format=",.0f"), alt.Tooltip("EMR:Q", format=".1f"),
+               alt.Tooltip("decision:N"), alt.Tooltip("life:N", title="Life class"), alt.Tooltip("cir:N", title="CIR class"),
+               alt.Tooltip("over_limit:N", title="Over financial limit"), alt.Tooltip("boundary:N")]
+    surface = alt.Chart(frame).mark_rect().encode(
+        **enc, color=alt.Color(f"{metric}:Q", title=METRICS[metric], scale=alt.Scale(scheme="goldorange")), tooltip=tooltip)
+    edges = alt.Chart(frame[frame["boundary"] != ""]).mark_rect(fill=None, strokeWidth=1.5).encode(
+        **enc, stroke=alt.Stroke("boundary:N", title="Boundary crossed",
+                                 scale=alt.Scale(domain=list(BOUNDARY_COLORS), range=list(BOUNDARY_COLORS.values()))),
+        tooltip=tooltip)
+    layers = [surface, edges]
+    if all(fixed.get(a, g.at[a]) == g.at[a] for a in AXES if a not in (x, y)):
+        here = frame[(frame["xi"] == g.at[x]) & (frame["yi"] == g.at[y])]
+        layers.append(alt.Chart(here).mark_point(shape="cross", size=120, color="#1a2236", filled=True).encode(**enc))
+    return alt.layer(*layers).properties(height=420)
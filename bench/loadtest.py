@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing as mp
+import pickle
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.synth import generate  # noqa: E402
+
+# ─── MULTI-SESSION LOAD TEST ────────────────────────────────────
+# Drives N concurrent headless sessions of app.py through Streamlit's AppTest:
+#   step 1 render -> (stub extraction) -> step 3 review + one edit -> compute -> step 4 + reruns
+# AppTest keeps a process-wide mock runtime, so each session runs in its own
+# process; all sessions warm up, then start the timed walk together on a barrier.
+# AppTest cannot drive st.file_uploader, so extraction is stubbed the way the
+# upload handler finishes: a synthetic proposal lands in session_state and the
+# session moves to step 3. Reports per-rerun wall time, peak memory per session
+# (RSS growth over the warmed-up process) and how both scale with concurrency.
+APP = str(ROOT / "app.py")
+
+def stub_extract(i: int) -> dict:
+    # The review form's date picker stops at 2010-01-01, so skip under-age synthetic proposals
+    return next(p for p in generate(20, seed=1000 + i) if p["dob"] <= "2010-01-01")
+
+def click(at, text: str):
+    next(b for b in at.button if text in b.label).click()
+
+def rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def session(i: int, reruns: int, barrier, out):
+    import logging
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    from streamlit.testing.v1 import AppTest
+
+    AppTest.from_file(APP, default_timeout=120).run()  # warm imports and caches
+    base_rss = rss_kib()
+    times = {}
+    at = AppTest.from_file(APP, default_timeout=120)
+
+    def timed(label, fn):
+        t = time.perf_counter()
+        fn()
+        times.setdefault(label, []).append(time.perf_counter() - t)
+        if at.exception:
+            raise RuntimeError(f"session {i} {label}: {at.exception[0].value}")
+
+    try:
+        barrier.wait()
+        timed("step1", at.run)
+        at.session_state["data"] = stub_extract(i)
+        at.session_state["step"] = 3
+        timed("step3", at.run)
+        at.number_input[1].set_value(int(at.number_input[1].value) + 3)
+        timed("step3_edit", at.run)
+        click(at, "Compute Underwriting")
+        timed("compute", at.run)
+        for _ in range(reruns):
+            timed("step4", at.run)
+        state = {k: at.session_state[k] for k in ("data", "result", "step") if k in at.session_state}
+        out.put({"times": times, "rss_kib": rss_kib() - base_rss, "state_bytes": len(pickle.dumps(state))})
+    except Exception as e:
+        out.put({"error": f"{type(e).__name__}: {e}"})
+
+def level(n: int, reruns: int) -> dict:
+    ctx = mp.get_context("spawn")
+    barrier, out = ctx.Barrier(n + 1), ctx.Queue()
+    procs = [ctx.Process(target=session, args=(i, reruns, barrier, out)) for i in range(n)]
+    for p in procs:
+        p.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    res = [out.get() for _ in procs]
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    errors = [r["error"] for r in res if "error" in r]
+    if errors:
+        raise RuntimeError("; ".join(errors))
+
+    runs = {}
+    for r in res:
+        for k, v in r["times"].items():
+            runs.setdefault(k, []).extend(v)
+    all_runs = sorted(t for v in runs.values() for t in v)
+    pct = lambda s, q: s[min(len(s) - 1, int(q * len(s)))] * 1000
+    return {
+        "sessions": n, "wall_s": wall, "reruns": len(all_runs), "reruns_per_s": len(all_runs) / wall,
+        "p50_ms": pct(all_runs, .5), "p95_ms": pct(all_runs, .95), "max_ms": all_runs[-1] * 1000,
+        "per_step_p50_ms": {k: statistics.median(v) * 1000 for k, v in runs.items()},
+        "peak_mem_per_session_kib": max(r["rss_kib"] for r in res),
+        "session_state_bytes": statistics.mean(r["state_bytes"] for r in res),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-c", "--concurrency", default="1,2,4,8,16", help="comma-separated session counts")
+    ap.add_argument("--reruns", type=int, default=5, help="extra reruns on step 4 per session")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    levels = [level(int(n), args.reruns) for n in args.concurrency.split(",")]
+    if args.json:
+        print(json.dumps(levels, indent=2))
+        return
+    print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'peak +KiB/session':>17} {'state B':>8}  per-step p50 ms")
+    for r in levels:
+        steps = " ".join(f"{k}={v:.0f}" for k, v in r["per_step_p50_ms"].items())
+        print(f"{r['sessions']:>8} {r['reruns_per_s']:>9.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['max_ms']:>8.1f} "
+              f"{r['peak_mem_per_session_kib']:>17.0f} {r['session_state_bytes']:>8.0f}  {steps}")
+    base = levels[0]
+    for r in levels[1:]:
+        print(f"  x{r['sessions'] / base['sessions']:.0f} sessions: p50 rerun x{r['p50_ms'] / base['p50_ms']:.2f}, "
+              f"throughput x{r['reruns_per_s'] / base['reruns_per_s']:.2f}")
+
+if __name__ == "__main__":
+    main()
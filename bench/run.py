@@ -0,0 +1,190 @@
+import argparse
+import copy
+import hashlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from aegis.batch import compute_underwriting_batch, proposals_to_columns  # noqa: E402
+from aegis.engine import (compute_underwriting, lookup_bmi_points, lookup_cir_rating, lookup_financial_multiple,  # noqa: E402
+                          lookup_life_rating, lookup_premium_rates)
+from aegis.extract import FieldScanner, parse_response  # noqa: E402
+from aegis.memo import UnderwritingMemo  # noqa: E402
+from aegis.models import Proposal, UnderwritingResult  # noqa: E402
+from aegis.schema import validate  # noqa: E402
+from aegis.whatif import build_grid  # noqa: E402
+from bench.synth import generate  # noqa: E402
+
+# ─── BENCHMARK SUITE ────────────────────────────────────────────
+#   python bench/run.py                    run, compare with golden + baseline
+#   python bench/run.py --update-golden    after an intended rating change
+#   python bench/run.py --update-baseline  record throughput on this machine
+# Exits 1 if any result drifts from bench/golden.json or a benchmark's
+# throughput falls more than --threshold below bench/baseline.json.
+GOLDEN = ROOT / "bench" / "golden.json"
+BASELINE = ROOT / "bench" / "baseline.json"
+GOLDEN_N, GOLDEN_SEED = 2000, 42
+
+# Branches the synthetic corpus must exercise: name -> predicate on a result
+BRANCHES = {
+    "standard": lambda r: r["dcl"] == "standard",
+    "loading": lambda r: r["dcl"] == "loading",
+    "decline": lambda r: r["dcl"] == "decline",
+    "cir_declined_over_60": lambda r: r["c_B"].get("declined") and r["A"] > 60,
+    "cir_declined_emr": lambda r: r["c_B"].get("declined") and r["A"] <= 60,
+    "four_plus_conditions": lambda r: r["n_active_conds"] >= 4,
+    "co_morbidity": lambda r: r["co_m"] > 0,
+    "multiple_habits": lambda r: r["hab_c"] > 0,
+    "occupational_extra": lambda r: r["l_B"].get("occ", 0) > 0,
+    "multiple_occupations": lambda r: any("Multiple risky" in f["m"] for f in r["flags"]),
+    "financial_limit": lambda r: any("financial UW limit" in f["m"] for f in r["flags"]),
+    "bmi_flag": lambda r: any(f["m"].startswith("BMI") for f in r["flags"]),
+    "severity_4": lambda r: any("Severity Level 4" in f["m"] for f in r["flags"]),
+}
+
+def digest(r: dict) -> str:
+    return hashlib.sha256(json.dumps(r, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def time_each(fn, items) -> list:
+    out = []
+    pc = time.perf_counter_ns
+    for x in items:
+        t = pc()
+        fn(x)
+        out.append(pc() - t)
+    return out
+
+def bench(name: str, fn, items, repeat: int, items_per_call: int = 1) -> dict:
+    # Throughput from the fastest pass (least disturbed by machine noise); percentiles over all passes
+    passes = [time_each(fn, items) for _ in range(repeat)]
+    best = min(sum(p) for p in passes) / 1e9
+    s = sorted(ns for p in passes for ns in p)
+    pct = lambda q: s[min(len(s) - 1, int(q * len(s)))] / 1e3
+    return {"name": name, "calls": len(s), "per_sec": len(items) * items_per_call / best if best else 0.0,
+            "p50_us": pct(.5), "p90_us": pct(.9), "p99_us": pct(.99), "max_us": s[-1] / 1e3}
+
+def allocations(fn, items) -> dict:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    for x in items:
+        fn(x)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return {"retained_bytes": sum(st.size_diff for st in stats), "peak_bytes": peak,
+            "allocs_per_call": sum(max(st.count_diff, 0) for st in stats) / max(1, len(items))}
+
+def model_responses(proposals: list) -> list:
+    return [f"```json\n{json.dumps(p, indent=2)}\n```" for p in proposals]
+
+def scan(raw: str):
+    sc = FieldScanner()
+    for i in range(0, len(raw), 64):
+        sc.feed(raw[i:i + 64])
+
+def run(n: int, seed: int, repeat: int) -> tuple:
+    props = generate(n, seed)
+    for p in props:  # warm-up
+        compute_underwriting(p)
+    report = [bench("compute_underwriting", compute_underwriting, props, repeat)]
+
+    memo = UnderwritingMemo(maxsize=n)
+    for p in props:
+        memo.compute(p)
+    report.append(bench("memo_hit", memo.compute, props, repeat))
+
+    emrs = [r * 0.5 for r in range(-40, 1200)]
+    report.append(bench("lookups", lambda e: (lookup_bmi_points(e / 20), lookup_life_rating(e), lookup_cir_rating(e),
+                                              lookup_premium_rates(int(e) % 100), lookup_financial_multiple(int(e) % 100)),
+                        emrs, repeat))
+
+    raws = model_responses(props[:min(n, 2000)])
+    report.append(bench("parse_response", parse_response, raws, repeat))
+    report.append(bench("stream_scan", scan, raws, repeat))
+    report.append(bench("validate", validate, props[:min(n, 2000)], repeat))
+
+    cols = proposals_to_columns(props)
+    report.append(bench("compute_underwriting_batch", compute_underwriting_batch, [cols], max(5, repeat), items_per_call=n))
+    # One what-if grid per call (~75k scenarios: cover x age x BMI x habit level)
+    report.append(bench("whatif_grid", build_grid, props[:20], max(3, repeat // 2)))
+    report.append({"name": "allocations/compute_underwriting", **allocations(compute_underwriting, props[:2000])})
+
+    # Per-session footprint: what a session holds for one proposal + result, as dicts vs typed models
+    held = [(p, compute_underwriting(p)) for p in props[:2000]]
+    report.append({"name": "session/dicts", **allocations(
+        lambda pr, keep=[]: keep.append(copy.deepcopy(pr)), held)})
+    report.append({"name": "session/models", **allocations(
+        lambda pr, keep=[]: keep.append((Proposal.from_dict(pr[0]), UnderwritingResult.from_dict(pr[1]))), held)})
+    return props, report
+
+def check_branches(props: list) -> list:
+    rs = [compute_underwriting(p) for p in props]
+    hits = {name: sum(1 for r in rs if pred(r)) for name, pred in BRANCHES.items()}
+    print("branch coverage: " + ", ".join(f"{k}={v}" for k, v in hits.items()))
+    return [f"branch '{k}' not exercised by the synthetic corpus" for k, v in hits.items() if not v]
+
+def check_golden(update: bool) -> list:
+    props = generate(GOLDEN_N, GOLDEN_SEED)
+    digests = [digest(compute_underwriting(p)) for p in props]
+    if update or not GOLDEN.exists():
+        GOLDEN.write_text(json.dumps({"n": len(props), "digests": digests}) + "\n")
+        print(f"golden corpus written: {len(digests)} results")
+        return []
+    golden = json.loads(GOLDEN.read_text())
+    drift = [i for i, (a, b) in enumerate(zip(digests, golden["digests"])) if a != b]
+    return [f"result drift on {len(drift)} of {len(props)} golden proposals (first: #{drift[0]})"] if drift else []
+
+def check_baseline(report: list, threshold: float, update: bool) -> list:
+    current = {r["name"]: r["per_sec"] for r in report if "per_sec" in r}
+    if update or not BASELINE.exists():
+        BASELINE.write_text(json.dumps({"machine": platform.platform(), "python": platform.python_version(),
+                                        "per_sec": current}, indent=2) + "\n")
+        print("baseline written")
+        return []
+    base = json.loads(BASELINE.read_text())["per_sec"]
+    fails = []
+    for name, v in current.items():
+        if name in base and v < base[name] * (1 - threshold):
+            fails.append(f"{name}: {v:,.0f}/s is {100 * (1 - v / base[name]):.0f}% below baseline {base[name]:,.0f}/s")
+    return fails
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5000, help="synthetic proposals to time")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--threshold", type=float, default=0.30, help="allowed throughput drop vs baseline (default 0.30)")
+    ap.add_argument("--update-golden", action="store_true")
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    props, report = run(args.n, args.seed, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in report:
+            if "per_sec" in r:
+                print(f"{r['name']:<28} {r['per_sec']:>14,.0f}/s   p50 {r['p50_us']:>9.1f}µs   p90 {r['p90_us']:>9.1f}µs   p99 {r['p99_us']:>9.1f}µs")
+            else:
+                print(f"{r['name']:<28} peak {r['peak_bytes'] / 1024:,.1f} KiB · retained {r['retained_bytes']:,} B "
+                      f"· {r['allocs_per_call']:.2f} live blocks/call")
+
+    fails = check_branches(props)
+    fails += check_golden(args.update_golden)
+    fails += check_baseline(report, args.threshold, args.update_baseline)
+    for f in fails:
+        print(f"FAIL {f}")
+    return 1 if fails else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,45 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# ─── STARTUP / RERUN TIMING ─────────────────────────────────────
+# Cold import time of the engine (fresh interpreter per sample) and
+# wall time of one Streamlit script rerun on each step, via AppTest.
+ROOT = Path(__file__).resolve().parent.parent
+
+def import_time(module: str, n: int) -> list:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return [float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout)
+            for _ in range(n)]
+
+def rerun_times(n: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=60).run()
+    out = {}
+    for step, action in [(1, None), (3, "Enter Details Manually"), (4, "Compute Underwriting")]:
+        if action:
+            next(b for b in at.button if action in b.label).click().run()
+        samples = []
+        for _ in range(n):
+            t = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - t)
+        out[step] = samples
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20)
+    ap.add_argument("--module", default="aegis.engine")
+    args = ap.parse_args()
+
+    t = import_time(args.module, max(3, args.n // 4))
+    print(f"import {args.module}: median {statistics.median(t) * 1000:.1f} ms")
+    for step, s in rerun_times(args.n).items():
+        print(f"rerun step {step}: median {statistics.median(s) * 1000:.1f} ms · p90 {sorted(s)[int(len(s) * .9)] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
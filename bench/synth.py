@@ -0,0 +1,77 @@
+import random
+from datetime import date
+
+from aegis.engine import FAM_E, H_E, HAB_E, OCC_E
+
+# ─── SYNTHETIC PROPOSALS ────────────────────────────────────────
+# Seeded generator covering every branch of compute_underwriting. Dates of
+# birth are placed so the computed age is exact on any run date, which keeps
+# results reproducible for the golden corpus.
+# (Total EMR tops out around 240 with the current tables, so the EMR > 550
+# decline is unreachable; declines come from the age limits.)
+SCENARIOS = {
+    "standard": 20, "loading": 25, "decline_age_low": 4, "decline_age_high": 4, "cir_over_60": 8,
+    "four_plus_conds": 8, "multi_habit": 10, "multi_occ": 8, "over_financial_limit": 8, "bmi_edge": 5,
+}
+HABIT_LEVELS = ["occasionally", "moderate", "high"]
+
+def dob_for_age(age: int, today: date) -> str:
+    try:
+        dob = today.replace(year=today.year - age)
+    except ValueError:  # 29 Feb
+        dob = today.replace(year=today.year - age, day=28)
+    return dob.strftime("%Y-%m-%d")
+
+def proposal(rng: random.Random, scenario: str, today: date) -> dict:
+    age = rng.randint(22, 58)
+    height = rng.randint(150, 190)
+    bmi = rng.uniform(19, 30)
+    conds = {c: 0 for c in H_E}
+    habits = {h: "none" for h in HAB_E}
+    occs = []
+    income = rng.choice([600000, 1000000, 2500000, 5000000])
+    base = income * rng.choice([5, 8, 10, 12])
+
+    if scenario == "loading":
+        for c in rng.sample(list(H_E), rng.randint(1, 3)):
+            conds[c] = rng.randint(1, 3)
+        if rng.random() < .5:
+            habits[rng.choice(list(HAB_E))] = rng.choice(HABIT_LEVELS)
+        bmi = rng.uniform(24, 37)
+    elif scenario == "decline_age_low":
+        age = rng.randint(10, 17)
+    elif scenario == "decline_age_high":
+        age = rng.randint(66, 80)
+    elif scenario == "cir_over_60":
+        age = rng.randint(61, 65)
+        conds[rng.choice(list(H_E))] = rng.randint(1, 4)
+    elif scenario == "four_plus_conds":
+        for c in rng.sample(list(H_E), rng.randint(4, 5)):
+            conds[c] = rng.randint(1, 4)
+    elif scenario == "multi_habit":
+        for h in rng.sample(list(HAB_E), rng.randint(2, 3)):
+            habits[h] = rng.choice(HABIT_LEVELS)
+    elif scenario == "multi_occ":
+        occs = rng.sample(list(OCC_E), rng.randint(2, 4))
+    elif scenario == "over_financial_limit":
+        base = income * rng.choice([30, 40, 60])
+    elif scenario == "bmi_edge":
+        bmi = rng.choice([rng.uniform(13, 18.6), rng.uniform(37.5, 48)])
+    if scenario not in ("multi_occ", "decline_age_low") and rng.random() < .15:
+        occs = [rng.choice(list(OCC_E))]
+
+    return {
+        "name": f"Synthetic {scenario}", "gender": rng.choice(["Male", "Female"]),
+        "dob": dob_for_age(age, today), "height_cm": height, "weight_kg": round(bmi * (height / 100) ** 2),
+        "yearly_income": income, "source_of_income": "salary",
+        "base_cover": base, "cir_cover": rng.choice([0, 1000000, 2000000, 5000000]),
+        "accident_cover": rng.choice([0, 1000000, 2000000]),
+        "parent_health_status": rng.choice(list(FAM_E)),
+        "health_conditions": conds, "habits": habits, "risky_occupations": occs, "extraction_notes": "",
+    }
+
+def generate(n: int, seed: int = 42, today: date = None) -> list:
+    rng = random.Random(seed)
+    today = today or date.today()
+    names, weights = list(SCENARIOS), list(SCENARIOS.values())
+    return [proposal(rng, rng.choices(names, weights)[0], today) for _ in range(n)]
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from aegis.tables import RatingTables
+
+# ─── TEST FIXTURES ──────────────────────────────────────────────
+# Shared by tests/. Model calls are answered by StubClient; nothing here needs
+# network access or a Gemini key.
+PROPOSAL = {
+    "name": "Ravi Kumar", "gender": "Male", "dob": "1985-02-01", "height_cm": 172, "weight_kg": 80,
+    "yearly_income": 1200000, "source_of_income": "salary", "base_cover": 10000000, "cir_cover": 2000000,
+    "accident_cover": 2000000, "parent_health_status": "both_above_65",
+    "health_conditions": {"thyroid": 0, "asthma": 0, "hypertension": 0, "diabetes": 0, "gut_disorder": 0},
+    "habits": {"smoking": "none", "alcohol": "none", "tobacco": "none"},
+    "risky_occupations": [], "extraction_notes": "",
+}
+
+class StubClient:
+    # Answers model calls from `answers`: a list of response texts, or a callable (pdf, prompt, schema) -> text
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def generate(self, pdf, prompt=None, schema=None):
+        self.calls.append((pdf, prompt, schema))
+        if callable(self.answers):
+            return self.answers(pdf, prompt, schema)
+        return self.answers[min(len(self.calls), len(self.answers)) - 1]
+
+    async def generate_async(self, pdf, prompt=None, schema=None):
+        return self.generate(pdf, prompt, schema)
+
+    def generate_stream(self, pdf, prompt=None, schema=None):
+        yield self.generate(pdf, prompt, schema)
+
+TABLES_2025_1 = Path(__file__).parent / "aegis" / "rating_tables" / "2025.1.json"
+
+@pytest.fixture
+def tables() -> RatingTables:
+    # The 2025.1 table set, whatever set is active
+    return RatingTables.from_file(TABLES_2025_1)
+
+@pytest.fixture
+def proposal():
+    return json.loads(json.dumps(PROPOSAL))
+
+@pytest.fixture
+def revise(tmp_path, monkeypatch):
+    # revise(label, mutate): writes the 2025.1 tables, changed by mutate(tables), as table
+    # version `label` in AEGIS_TABLES_DIR. The tables active before the test are reinstalled after it.
+    from aegis import engine
+
+    active = engine.TABLES
+    d = tmp_path / "tables"
+    d.mkdir()
+    monkeypatch.setenv("AEGIS_TABLES_DIR", str(d))
+
+    def write(label: str, mutate) -> Path:
+        doc = json.loads(TABLES_2025_1.read_text())
+        doc["version"] = label
+        mutate(doc["tables"])
+        p = d / f"{label}.json"
+        p.write_text(json.dumps(doc))
+        return p
+
+    yield write
+    engine.install_tables(active)
@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+
+from aegis.cache import ExtractionCache
+from aegis.extract import PAGE_SALT, PAGES_PROMPT, PROMPT, Document, extract_from_pdf, extraction, run_extraction, stream_extract
+from aegis.pages import plan_pages
+from aegis.templates import FastPathResult
+from conftest import PROPOSAL, StubClient
+
+def run(answers) -> tuple:
+    # (proposal, requests) for a model answering `answers` in turn
+    client, reqs = StubClient(answers), []
+    def call(req):
+        reqs.append(req)
+        return client.generate(req.load(), *req.args)
+    data, _ = run_extraction(extraction(Document(b"%PDF-stub", False)), call)
+    return data, reqs
+
+# ─── FIELD REPAIR ───────────────────────────────────────────────
+def test_follow_up_asks_only_for_bad_fields():
+    first = {**PROPOSAL, "dob": "not a date", "weight_kg": None}
+    data, reqs = run([json.dumps(first), json.dumps({"dob": "1985-02-01", "weight_kg": 80})])
+    assert [r.kind for r in reqs] == ["full", "fields"]
+    assert sorted(reqs[1].fields) == ["dob", "weight_kg"]
+    assert not data["extraction_notes"] and data["dob"] == "1985-02-01" and data["weight_kg"] == 80
+    assert data["name"] == PROPOSAL["name"]
+
+def test_follow_ups_stop_after_retries():
+    first = {**PROPOSAL, "weight_kg": None}
+    data, reqs = run([json.dumps(first), "{}"])
+    assert [r.kind for r in reqs] == ["full", "fields", "fields"]
+    assert data["weight_kg"] is None and "weight_kg: missing" in data["extraction_notes"]
+
+def test_unusable_answer_retries_whole_document():
+    data, reqs = run([json.dumps({"name": "Ravi Kumar"}), json.dumps(PROPOSAL)])
+    assert [r.kind for r in reqs] == ["full", "full"]
+    assert not data["extraction_notes"] and data["base_cover"] == PROPOSAL["base_cover"]
+
+def test_no_usable_fields_raises():
+    with pytest.raises(ValueError, match="no usable"):
+        run(["not json", "{}"])
+
+# ─── TEMPLATE FAST PATH ─────────────────────────────────────────
+class Registry:
+    def __init__(self, data):
+        self.data = data
+    def extract(self, pdf):
+        return FastPathResult("stub_v1", 1.0, dict(self.data), {}, 0.0)
+
+@pytest.mark.parametrize("bad", [{"height_cm": 5000}, {"dob": "1900-01-01"}, {"gender": "?"}])
+def test_template_read_is_validated(monkeypatch, bad):
+    monkeypatch.setattr("aegis.extract.get_registry", lambda: Registry({**PROPOSAL, **bad}))
+    client = StubClient([json.dumps(PROPOSAL)])
+    assert extract_from_pdf(b"%PDF-stub", client=client, triage=False) == PROPOSAL
+    events = list(stream_extract(b"%PDF-stub", client=client, triage=False))
+    [template] = [p for kind, _, p in events if kind == "template"]
+    assert template.data is None and template.reason == "failed validation"
+    assert events[-1][2] == PROPOSAL and len(client.calls) == 2
+
+def test_valid_template_read_skips_the_model(monkeypatch):
+    monkeypatch.setattr("aegis.extract.get_registry", lambda: Registry({**PROPOSAL, "source_of_income": "Salaried"}))
+    client = StubClient([])
+    assert extract_from_pdf(b"%PDF-stub", client=client, triage=False)["source_of_income"] == "salary"
+    assert not client.calls
+
+# ─── PAGE-INCREMENTAL MERGE ─────────────────────────────────────
+def form(hypertension: str, producer: str = "test") -> bytes:
+    pypdf = pytest.importorskip("pypdf")
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+    w = pypdf.PdfWriter()
+    font = w._add_object(DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                                           NameObject("/BaseFont"): NameObject("/Helvetica")}))
+    pages = [["Name of life assured: Ravi Kumar", "Date of birth: 1985-02-01"], ["Annual income 1200000 salary"],
+             [f"Medical history: hypertension {hypertension}"]] + [[f"Declaration {i}"] for i in range(5)]
+    for lines in pages:
+        page = w.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        s = DecodedStreamObject()
+        s.set_data(("BT /F1 11 Tf 50 740 Td 14 TL " + " ".join(f"({l}) '" for l in lines) + " ET").encode())
+        page[NameObject("/Contents")] = w._add_object(s)
+    w.add_metadata({"/Producer": producer})
+    b = io.BytesIO()
+    w.write(b)
+    return b.getvalue()
+
+PAGE_OF = {"name": 1, "gender": 1, "dob": 1, "height_cm": 1, "weight_kg": 1, "yearly_income": 2, "source_of_income": 2,
+           "base_cover": 2, "cir_cover": 2, "accident_cover": 2, "parent_health_status": 3, "health_conditions": 3,
+           "habits": 3, "risky_occupations": 3}
+
+def answer(pdf, prompt, schema) -> str:
+    from pypdf import PdfReader
+    if prompt is None or prompt is PROMPT:
+        return json.dumps({**PROPOSAL, "sources": [{"field": f, "page": p} for f, p in PAGE_OF.items()]})
+    assert prompt is PAGES_PROMPT
+    # The changed page is the third: it answers for every field read from it
+    text = PdfReader(io.BytesIO(pdf)).pages[0].extract_text()
+    part = {f: PROPOSAL[f] for f, p in PAGE_OF.items() if p == 3}
+    part["health_conditions"] = {**PROPOSAL["health_conditions"], "hypertension": 2 if "sev2" in text else 0}
+    return json.dumps({"name": None, **part, "sources": [{"field": f, "page": 1} for f in part]})
+
+def test_revised_pdf_sends_only_changed_pages(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    client = StubClient(answer)
+    first = extract_from_pdf(form("none"), cache=cache, client=client, triage=False, templates=False)
+    assert first["health_conditions"]["hypertension"] == 0
+    client.calls.clear()
+    revised = extract_from_pdf(form("sev2", "rev2"), cache=cache, client=client, triage=False, templates=False)
+    [(pdf, prompt, _)] = client.calls
+    from pypdf import PdfReader
+    assert prompt is PAGES_PROMPT and len(PdfReader(io.BytesIO(pdf)).pages) == 1
+    # The changed page's answer is merged over the fields cached for the others
+    assert revised["health_conditions"] == {**PROPOSAL["health_conditions"], "hypertension": 2}
+    assert revised["name"] == PROPOSAL["name"] and revised["base_cover"] == PROPOSAL["base_cover"]
+    assert "sources" not in revised
+
+def test_pages_cached_from_the_whole_document_retry(tmp_path):
+    # The rejected first answer attributes every field to the last page; the retry's attribution is cached
+    cache = ExtractionCache(tmp_path)
+    pdf = form("none")
+    first = {"name": "Ravi Kumar", "sources": [{"field": f, "page": 8} for f in PAGE_OF]}
+    retry = {**PROPOSAL, "sources": [{"field": f, "page": p} for f, p in PAGE_OF.items()]}
+    client = StubClient([json.dumps(first), json.dumps(retry)])
+    assert extract_from_pdf(pdf, cache=cache, client=client, triage=False, templates=False) == PROPOSAL
+    known = plan_pages(pdf, cache, PAGE_SALT).known
+    assert {i: sorted(f) for i, f in known.items() if f} == {
+        p - 1: sorted(f for f, q in PAGE_OF.items() if q == p) for p in (1, 2, 3)}
@@ -0,0 +1,20 @@
+from aegis.batch import batch_row, compute_underwriting_batch, proposals_to_columns
+from aegis.engine import CL, compute_underwriting
+from conftest import PROPOSAL
+
+def sev4(result) -> list:
+    return [f["trace"]["rule"] for f in result["flags"] if f["trace"]["rule"].startswith("sev4_")]
+
+def test_sev4_flags_follow_condition_table_order():
+    # Raised in CL order whatever order the proposal declares its conditions in
+    conds = dict(reversed([(c, 4) for c in CL]))
+    p = {**PROPOSAL, "health_conditions": conds}
+    assert sev4(compute_underwriting(p)) == [f"sev4_{c}" for c in CL]
+    res = compute_underwriting_batch(proposals_to_columns([p]))
+    assert batch_row(res, 0)["flags"] == compute_underwriting(p)["flags"]
+
+def test_flags_in_rule_order():
+    p = {**PROPOSAL, "height_cm": 150, "weight_kg": 95, "base_cover": 9e8,
+         "health_conditions": {"diabetes": 4, "thyroid": 4}}
+    rules = [f["trace"]["rule"] for f in compute_underwriting(p)["flags"]]
+    assert rules == ["bmi_high", "sev4_thyroid", "sev4_diabetes", "fin_limit"]
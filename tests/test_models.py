@@ -0,0 +1,22 @@
+from aegis.engine import compute_underwriting
+from aegis.models import Proposal, UnderwritingResult
+from conftest import PROPOSAL
+
+def test_proposal_round_trip():
+    assert Proposal.from_dict(PROPOSAL).to_dict() == PROPOSAL
+
+def test_missing_fields_stay_none():
+    d = Proposal.from_dict({"name": "A", "habits": {"smoking": "high"}}).to_dict()
+    for k in ("gender", "dob", "height_cm", "weight_kg", "yearly_income", "source_of_income",
+              "base_cover", "cir_cover", "accident_cover", "parent_health_status"):
+        assert d[k] is None, k
+    assert d["health_conditions"]["thyroid"] == 0 and d["habits"] == {"smoking": "high", "alcohol": "none", "tobacco": "none"}
+
+def test_zero_covers_are_kept():
+    d = Proposal.from_dict({**PROPOSAL, "cir_cover": 0}).to_dict()
+    assert d["cir_cover"] == 0
+
+def test_result_round_trip_keeps_flag_traces():
+    r = compute_underwriting({**PROPOSAL, "height_cm": 150, "weight_kg": 95, "base_cover": 9e8})
+    assert r["flags"] and all("trace" in f for f in r["flags"])
+    assert UnderwritingResult.from_dict(r).to_dict() == r
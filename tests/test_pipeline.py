@@ -0,0 +1,43 @@
+import asyncio
+import json
+import os
+
+from aegis.pipeline import ExtractionPipeline, PipelineConfig
+from aegis.spool import MemoryBudget
+from conftest import PROPOSAL, StubClient
+
+def run(pipeline, items, timeout=20):
+    async def main():
+        return [r async for r in pipeline.run(items)]
+    return asyncio.run(asyncio.wait_for(main(), timeout))
+
+def test_budget_pressure_with_more_workers_than_executor_threads():
+    # Waiting for the budget must not hold executor threads the budget holders need
+    workers = min(32, (os.cpu_count() or 1) + 4) + 8
+    budget = MemoryBudget(limit=100)
+    p = ExtractionPipeline(StubClient([json.dumps(PROPOSAL)]), PipelineConfig(workers=workers, rpm=60000, burst=100),
+                           triage=False, templates=False, budget=budget)
+    out = run(p, [(i, b"%%PDF-%03d" % i * 4) for i in range(workers * 2)])
+    assert len(out) == workers * 2
+    assert all(err is None for _, _, err in out)
+    stats = budget.stats()
+    assert stats["in_use"] == 0 and stats["waiting"] == 0
+    assert stats["waits"] > 0 and stats["peak"] <= 100
+
+def test_budget_released_when_extraction_fails():
+    budget = MemoryBudget(limit=100)
+    p = ExtractionPipeline(StubClient(lambda *a: "not json"), PipelineConfig(workers=4, rpm=60000, burst=100),
+                           triage=False, templates=False, budget=budget)
+    out = run(p, [(i, b"%PDF-x" * 5) for i in range(6)])
+    assert all(err is not None for _, _, err in out)
+    assert budget.stats()["in_use"] == 0
+
+def test_template_read_failing_validation_goes_to_the_model(monkeypatch):
+    from aegis.templates import FastPathResult
+    read = FastPathResult("stub_v1", 1.0, {**PROPOSAL, "height_cm": 5000}, {}, 0.0)
+    monkeypatch.setattr("aegis.pipeline.get_registry", lambda: type("R", (), {"extract": lambda self, pdf: read})())
+    client = StubClient([json.dumps(PROPOSAL)])
+    p = ExtractionPipeline(client, PipelineConfig(workers=2, rpm=60000, burst=100), triage=False)
+    [(_, data, err)] = run(p, [(0, b"%PDF-stub")])
+    assert err is None and data["height_cm"] == PROPOSAL["height_cm"] and len(client.calls) == 1
+    assert p.stats()["local"] == 0
@@ -0,0 +1,45 @@
+import pytest
+
+from aegis.engine import compute_underwriting
+from aegis.quotes import QuoteStore
+from conftest import PROPOSAL
+
+def test_save_flush_get(tmp_path):
+    store = QuoteStore(tmp_path / "quotes.sqlite")
+    r = compute_underwriting(PROPOSAL)
+    store.save("PQ-1", PROPOSAL, r)
+    store.flush(timeout=10)
+    q = store.get("PQ-1")
+    assert q["proposal"] == PROPOSAL and q["grand"] == r["grand"]
+    assert store.stats()["written"] == 1 and "failed" not in store.stats()
+
+def test_unopenable_store_raises_instead_of_hanging(tmp_path):
+    (tmp_path / "file").write_text("")
+    store = QuoteStore(tmp_path / "file" / "quotes.sqlite")     # parent is a file
+    r = compute_underwriting(PROPOSAL)
+    store.save("PQ-1", PROPOSAL, r)
+    with pytest.raises(RuntimeError, match="not writable"):
+        store.flush(timeout=10)
+    with pytest.raises(RuntimeError):
+        store.save("PQ-2", PROPOSAL, r)
+    assert isinstance(store.failed, OSError) and store._q.unfinished_tasks == 0
+
+def test_writer_error_mid_run_stops_the_store(tmp_path, monkeypatch):
+    store = QuoteStore(tmp_path / "quotes.sqlite")
+    r = compute_underwriting(PROPOSAL)
+    store.save("PQ-1", PROPOSAL, r)
+    store.flush(timeout=10)
+    def boom(db, rows):
+        raise OSError("disk gone")
+    monkeypatch.setattr(store, "_write", boom)
+    store.save("PQ-2", PROPOSAL, r)
+    with pytest.raises(RuntimeError, match="disk gone"):
+        store.flush(timeout=10)
+    assert store.errors == 1 and store.written == 1
+
+def test_flush_times_out(tmp_path):
+    store = QuoteStore(tmp_path / "quotes.sqlite")
+    store._writer = object()        # no writer thread takes the queue
+    store.save("PQ-1", PROPOSAL, compute_underwriting(PROPOSAL))
+    with pytest.raises(TimeoutError):
+        store.flush(timeout=0.2)
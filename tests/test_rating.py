@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from aegis.batch import _band_index
+from aegis.rating import BandIndex
+
+# (value, expected) at and around every edge of the 2025.1 tables; None = no band, the lookup default applies.
+# A value matches a band only within [lo, hi], as the linear scans over the tables did.
+BMI_EDGES = [(0, 10), (18, 10), (18.1, None), (18.5, None), (19, 0), (23, 0), (23.2, None), (24, 5), (28.9, None),
+             (38, 15), (38.5, None), (39, 20), (9999, 20), (10000, None)]
+LIFE_EDGES = [(19.5, None), (20, "I"), (35, "I"), (36, None), (37.5, None), (39, None), (40, "II"), (60, "II"),
+              (61, None), (64, None), (65, "III"), (89, None), (90, "IV"), (120, "IV"), (121, None), (550, "X"),
+              (550.5, None)]
+CIR_EDGES = [(-0.5, None), (0, "Std"), (20, "Std"), (20.5, None), (21, "I"), (35.5, None), (36, "II"), (60, "II"),
+             (60.5, None), (100, "IV"), (100.5, None)]
+
+def scan(rows, x):
+    # The baseline lookup: first band with lo <= x <= hi
+    for lo, hi, *v in rows:
+        if lo <= x <= hi:
+            return tuple(v)
+    return None
+
+def values(bi: BandIndex, x, col=0):
+    v = bi.values(x)
+    return v[col] if v else None
+
+@pytest.mark.parametrize("x,pts", BMI_EDGES)
+def test_bmi_bands(tables, x, pts):
+    assert values(tables.BMI_IDX, x) == pts
+
+@pytest.mark.parametrize("emr,cls", LIFE_EDGES)
+def test_life_bands(tables, emr, cls):
+    assert values(tables.L_IDX, emr) == cls
+
+@pytest.mark.parametrize("emr,cls", CIR_EDGES)
+def test_cir_bands(tables, emr, cls):
+    assert values(tables.C_IDX, emr) == cls
+
+@pytest.mark.parametrize("name,edges", [("BMI_IDX", BMI_EDGES), ("L_IDX", LIFE_EDGES), ("C_IDX", CIR_EDGES)])
+def test_batch_index_matches_scalar(tables, name, edges):
+    bi = getattr(tables, name)
+    xs = np.asarray([x for x, _ in edges], dtype=np.float64)
+    assert _band_index(xs, bi).tolist() == [bi.index(x) for x, _ in edges]
+
+@pytest.mark.parametrize("name,idx", [("BMI_T", "BMI_IDX"), ("L_RAT", "L_IDX"), ("C_RAT", "C_IDX"),
+                                      ("P_RAT", "P_IDX"), ("FIN_T", "FIN_IDX")])
+def test_index_matches_linear_scan(tables, name, idx):
+    rows, bi = tables.tables[name], getattr(tables, idx)
+    xs = [x / 10 for x in range(-20, 6000)] + list(range(-2, 10002))
+    assert [bi.values(x) for x in xs] == [scan(rows, x) for x in xs]
+    want = [-1 if scan(rows, x) is None else bi.index(x) for x in xs]
+    assert _band_index(np.asarray(xs, dtype=np.float64), bi).tolist() == want
+
+def test_dense_age_index(tables):
+    assert [tables.FIN_IDX.values(a) for a in (0, 35, 36, 45, 46, 999)] == [(25,), (25,), (20,), (20,), (15,), (10,)]
+    assert tables.FIN_IDX.index(1000) == -1 and tables.P_IDX.index(tables.P_IDX.lo - 1) == -1
+
+@pytest.mark.parametrize("rows,step,error", [
+    ([(0, 10, 1), (12, 20, 2)], 1, "gap"),
+    ([(0, 10, 1), (10, 20, 2)], 1, "overlaps"),
+    ([(0, 35, 1), (36, 60, 2)], 5, "gap"),
+    ([(5, 0, 1)], 1, "lo > hi"),
+    ([], 1, "empty"),
+])
+def test_bad_tables_fail_to_compile(rows, step, error):
+    with pytest.raises(ValueError, match=error):
+        BandIndex("T", rows, step=step)
@@ -0,0 +1,55 @@
+from aegis import engine
+from aegis.quotes import QuoteStore, new_quote_no
+from aegis.rerate import _same, rerate, rerate_quotes
+from aegis.tables import TableWatcher
+from bench.synth import generate
+
+def rated_store(tmp_path, n: int = 1500) -> QuoteStore:
+    store = QuoteStore(tmp_path / "quotes.sqlite")
+    for d in generate(n, seed=7):
+        store.save(new_quote_no(), d, engine.compute_underwriting(d))
+    store.flush(timeout=30)
+    return store
+
+def changed_by_full_scan(store: QuoteStore, version: str) -> set:
+    # Quotes whose result differs under the active tables, found by re-rating every one
+    quotes = store.select("tables = ?", (version,))
+    return {q["quote_no"] for q, r in zip(quotes, rerate_quotes(quotes, engine.TABLES)) if not _same(q["result"], r)}
+
+def revise_and_install(revise, mutate):
+    w = TableWatcher()
+    revise("2025.2", mutate)
+    assert w.check()
+
+def test_unchanged_tables_rerate_nothing(tmp_path):
+    store = rated_store(tmp_path, 300)
+    quotes = store.select("1")
+    assert all(_same(q["result"], r) for q, r in zip(quotes, rerate_quotes(quotes, engine.TABLES)))
+
+def test_selection_covers_every_changed_quote(tmp_path, revise):
+    store = rated_store(tmp_path)
+    old = engine.TABLES_VERSION
+    def change(t):
+        t["P_RAT"][2][2] = 4.8                  # ages 41-45
+        t["OCC_E"]["pilot"] += 2
+        t["HAB_E"]["alcohol"]["high"] += 5
+        t["CO_M"]["3"] += 5
+        t["BMI_T"][0][2] += 1
+    revise_and_install(revise, change)
+    expected = changed_by_full_scan(store, old)
+    report = rerate(store, dry_run=True)[old]
+    assert report["changed"] == len(expected) > 0
+    assert report["examined"] < report["quotes"]
+    assert len(report["changes"]) == 5
+
+def test_rerate_saves_superseding_quotes_once(tmp_path, revise):
+    store = rated_store(tmp_path, 600)
+    old = engine.TABLES_VERSION
+    revise_and_install(revise, lambda t: t["OCC_E"].update(pilot=t["OCC_E"]["pilot"] + 2))
+    expected = changed_by_full_scan(store, old)
+    assert rerate(store)[old]["changed"] == len(expected) > 0
+    successors = store.select("tables = ?", (engine.TABLES_VERSION,))
+    assert {q["supersedes"] for q in successors} == expected
+    assert all(q["source"] == "rerate" for q in successors)
+    # Superseded quotes are not examined again
+    assert rerate(store)[old]["examined"] == 0
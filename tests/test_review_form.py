@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from aegis.extract import Document, extraction, run_extraction
+from aegis.models import Proposal
+from aegis.schema import validate
+from conftest import PROPOSAL, StubClient
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+def partly_invalid_extraction() -> dict:
+    # The model misses height and family history and answers a source of income the form has no option for,
+    # in the first answer and in every follow-up
+    bad = {**PROPOSAL, "height_cm": None, "source_of_income": "pension", "parent_health_status": None}
+    client = StubClient(lambda pdf, prompt, schema: json.dumps(bad))
+    data, _ = run_extraction(extraction(Document(b"%PDF-stub", False)), lambda req: client.generate(req.load(), *req.args))
+    return data
+
+def review(data: dict, tmp_path, monkeypatch) -> AppTest:
+    monkeypatch.setenv("AEGIS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("AEGIS_QUOTE_DB", str(tmp_path / "quotes.sqlite"))
+    at = AppTest.from_file("../app.py", default_timeout=30)
+    at.session_state.step = 3
+    at.session_state.data = Proposal.from_dict(data)
+    return at.run()
+
+def test_invalid_fields_are_cleared_and_noted():
+    data = partly_invalid_extraction()
+    assert data["height_cm"] is None and data["source_of_income"] is None and data["parent_health_status"] is None
+    for k in ("height_cm", "source_of_income", "parent_health_status"):
+        assert k in data["extraction_notes"]
+
+def test_review_step_renders_partly_invalid_extraction(tmp_path, monkeypatch):
+    at = review(partly_invalid_extraction(), tmp_path, monkeypatch)
+    assert not at.exception, at.exception
+    assert any("height_cm" in w.value for w in at.warning)
+    [b for b in at.button if "Compute" in b.label][0].click().run()
+    assert not at.exception, at.exception
+    assert at.session_state.step == 4
+
+def test_review_step_ignores_values_widgets_reject(tmp_path, monkeypatch):
+    data = {**PROPOSAL, "height_cm": 20, "weight_kg": 900, "dob": "1901-01-01", "gender": "X", "source_of_income": "salaried", "parent_health_status": "",
+            "health_conditions": {"thyroid": 9}, "habits": {"smoking": "daily"}}
+    at = review(data, tmp_path, monkeypatch)
+    assert not at.exception, at.exception
+    [note] = [w.value for w in at.warning if "replaced by the default" in w.value]
+    for k in ("height_cm", "weight_kg", "dob", "gender", "source_of_income", "health_conditions.thyroid"):
+        assert k in note, k
+
+def test_validator_rejects_what_the_form_cannot_show():
+    # Out of the widget bounds: repaired, else cleared and noted, never silently defaulted
+    data = {**PROPOSAL, "dob": "1938-05-01", "height_cm": 95, "weight_kg": 260}
+    _, errors = validate(data)
+    assert sorted(errors) == ["dob", "height_cm", "weight_kg"]
+    _, errors = validate({**PROPOSAL, "dob": "1940-01-01", "height_cm": 250, "weight_kg": 30})
+    assert not errors
+
+def test_review_step_uses_form_defaults_for_missing_fields(tmp_path, monkeypatch):
+    data = {k: v for k, v in PROPOSAL.items() if k not in ("height_cm", "parent_health_status", "source_of_income")}
+    at = review(data, tmp_path, monkeypatch)
+    assert not at.exception, at.exception
+    assert [n.value for n in at.number_input if n.label == "Height (cm)"] == [170]
+    assert at.radio[0].value == "both_above_65"
+    assert [s.value for s in at.selectbox if s.label == "Income Source"] == ["salary"]
+
+def test_unsaved_quote_is_reported(monkeypatch, request):
+    from aegis.quotes import QuoteStore
+    def unwritable(self):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(QuoteStore, "_connect", unwritable)
+    import streamlit as st
+    st.cache_resource.clear()       # the quote store is opened once per process
+    request.addfinalizer(st.cache_resource.clear)
+    at = AppTest.from_file("../app.py", default_timeout=30)
+    at.session_state.step = 3
+    at.session_state.data = Proposal.from_dict(PROPOSAL)
+    at.run()
+    [b for b in at.button if "Compute" in b.label][0].click().run()
+    assert not at.exception, at.exception
+    assert at.session_state.step == 4
+    assert any("was not saved" in w.value for w in at.warning)
@@ -0,0 +1,94 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from aegis import server as server_mod
+from aegis.server import MAX_BODY, QuoteServer
+from conftest import PROPOSAL
+
+@pytest.fixture
+def srv():
+    s = QuoteServer(("127.0.0.1", 0), workers=2, extractor=lambda pdf: dict(PROPOSAL))
+    threading.Thread(target=s.serve_forever, daemon=True).start()
+    yield s
+    s.shutdown()
+    s.server_close()
+
+def post(srv, path, body):
+    req = urllib.request.Request(f"http://127.0.0.1:{srv.server_address[1]}{path}", body, method="POST")
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def raw(srv, data: bytes) -> bytes:
+    with socket.create_connection(srv.server_address, timeout=5) as s:
+        s.sendall(data)
+        out = b""
+        while chunk := s.recv(65536):
+            out += chunk
+    return out
+
+def test_quote(srv):
+    code, r = post(srv, "/quote", json.dumps(PROPOSAL).encode())
+    assert code == 200 and r["dcl"] in ("standard", "loading", "decline")
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"x"', b'{"proposals": {"a": 1}}'])
+def test_quotes_rejects_non_objects(srv, body):
+    code, r = post(srv, "/quotes", body)
+    assert code == 400 and "error" in r
+
+def test_oversize_body_closes_the_connection(srv):
+    # A request smuggled inside the refused body must not be served
+    inner = b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n"
+    out = raw(srv, b"POST /quote HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % (MAX_BODY + 1) + inner)
+    assert out.startswith(b"HTTP/1.1 400") and out.count(b"HTTP/1.1 ") == 1
+
+def test_unknown_route_with_body_closes_the_connection(srv):
+    inner = b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n"
+    out = raw(srv, b"POST /nope HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(inner) + inner)
+    assert out.startswith(b"HTTP/1.1 404") and out.count(b"HTTP/1.1 ") == 1
+
+def test_keep_alive_after_a_good_request(srv):
+    body = json.dumps(PROPOSAL).encode()
+    req = b"POST /quote HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(body) + body
+    health = b"GET /health HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+    out = raw(srv, req + health)
+    assert out.count(b"HTTP/1.1 200") == 2
+
+def test_default_extractor_opens_one_cache(monkeypatch, tmp_path):
+    import aegis.cache
+    import aegis.extract
+
+    opened = []
+    monkeypatch.setattr(aegis.cache, "ExtractionCache", lambda: opened.append(1) or object())
+    monkeypatch.setattr(aegis.extract, "extract_from_pdf", lambda pdf, cache: {"cache": id(cache)})
+    extract = server_mod.default_extractor()
+    assert extract(b"a") == extract(b"b")
+    assert len(opened) == 1
+
+def test_extract_rejects_empty_body(monkeypatch):
+    calls = []
+    s = QuoteServer(("127.0.0.1", 0), workers=2, extractor=lambda pdf: calls.append(pdf) or dict(PROPOSAL))
+    threading.Thread(target=s.serve_forever, daemon=True).start()
+    try:
+        code, r = post(s, "/extract", b"")
+        assert code == 400 and "empty" in r["error"] and not calls
+    finally:
+        s.shutdown()
+        s.server_close()
+
+def test_extract_quote_runs_on_the_pool(srv, monkeypatch):
+    threads = []
+    def quote_many(proposals):
+        threads.append(threading.current_thread().name)
+        return [{"ok": True, "result": {"dcl": "standard"}}]
+    monkeypatch.setattr(server_mod, "quote_many", quote_many)
+    code, r = post(srv, "/extract?quote=1", b"%PDF-stub")
+    assert code == 200 and r["result"] == {"dcl": "standard"} and r["data"] == PROPOSAL
+    assert threads and threads[0].startswith("ThreadPoolExecutor")
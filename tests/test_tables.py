@@ -0,0 +1,41 @@
+from aegis import engine
+from aegis.memo import UnderwritingMemo, proposal_key
+from aegis.tables import TableWatcher
+
+def raise_premiums(t):
+    for row in t["P_RAT"]:
+        row[2] += 1
+
+def test_watcher_installs_a_new_version(revise, proposal):
+    w = TableWatcher()
+    before = engine.compute_underwriting(proposal)
+    revise("2025.2", raise_premiums)
+    assert w.check() and engine.TABLES.label == "2025.2"
+    assert engine.compute_underwriting(proposal)["l_B"]["rate"] == before["l_B"]["rate"] + 1
+    assert not w.check()
+
+def test_watcher_keeps_tables_on_a_bad_file(revise):
+    w = TableWatcher()
+    active = engine.TABLES_VERSION
+    revise("2025.2", lambda t: t.pop("P_RAT"))
+    assert not w.check() and engine.TABLES_VERSION == active
+    assert "2025.2.json" in w.error and w.failures == 1
+
+def test_memo_key_changes_with_tables(revise, proposal):
+    w = TableWatcher()
+    key = proposal_key(proposal)
+    revise("2025.2", raise_premiums)
+    assert w.check()
+    assert proposal_key(proposal) != key
+    assert proposal_key({**proposal, "name": "Someone Else"}) == proposal_key(proposal)
+
+def test_memo_recomputes_after_reload(revise, proposal):
+    memo = UnderwritingMemo()
+    w = TableWatcher()
+    r = memo.compute(proposal)
+    assert memo.compute(proposal) is r and memo.hits == 1
+    revise("2025.2", raise_premiums)
+    assert w.check()
+    r2 = memo.compute(proposal)
+    assert r2["l_B"]["rate"] == r["l_B"]["rate"] + 1
+    assert memo.stats()["tables"] == engine.TABLES_VERSION and memo.stats()["size"] == 1 and memo.misses == 2